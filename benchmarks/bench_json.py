@@ -0,0 +1,80 @@
+"""Benchmark the JSON backends used by ``SamPrompter.postprocess``.
+
+Builds a mask-heavy payload (noisy masks with many RLE runs), checks that
+the orjson and stdlib backends of ``_json_dumps`` produce byte-identical
+output, and reports the serialization time of each.
+
+Usage::
+
+    uv run python benchmarks/bench_json.py
+"""
+
+import argparse
+import json
+import time
+from collections.abc import Callable
+
+import numpy as np
+
+import sam_prompter
+from sam_prompter import _encode_mask_entries, _json_dumps
+
+
+def _payload(num_masks: int, height: int, width: int) -> dict:
+    rng = np.random.default_rng(0)
+    masks = rng.random((num_masks, height, width)) > 0.5  # noqa: PLR2004
+    entries = _encode_mask_entries(masks, None, "rle")
+    return {
+        "image": "/gradio_api/file=/tmp/gradio/image.webp",
+        "imageId": "0" * 64,
+        "width": width,
+        "height": height,
+        "masks": [{**entry, "color": [255, 107, 107], "alpha": 0.4} for entry in entries],
+    }
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--masks", type=int, default=8)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if sam_prompter.orjson is None:
+        parser.error("orjson is not installed; nothing to compare")
+
+    payload = _payload(args.masks, args.height, args.width)
+    fast_backend = sam_prompter.orjson
+
+    fast = _json_dumps(payload)
+    fast_time = _best_of(lambda: _json_dumps(payload), args.repeat)
+    sam_prompter.orjson = None
+    try:
+        stdlib = _json_dumps(payload)
+        stdlib_time = _best_of(lambda: _json_dumps(payload), args.repeat)
+    finally:
+        sam_prompter.orjson = fast_backend
+
+    if fast != stdlib:
+        msg = "orjson and stdlib output differ"
+        raise SystemExit(msg)
+    assert json.loads(fast) == json.loads(stdlib)
+
+    print(f"payload: {len(fast) / 1e6:.1f} MB, {args.masks} masks of {args.width}x{args.height}")
+    print(f"stdlib json: {stdlib_time * 1e3:8.1f} ms")
+    print(f"orjson:      {fast_time * 1e3:8.1f} ms  ({stdlib_time / fast_time:.1f}x)")
+    print("output: byte-identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 import json
+import tempfile
+from pathlib import Path
 from typing import Any
 
 import gradio as gr
@@ -6,7 +8,15 @@ import numpy as np
 import spaces
 import torch
 from PIL import Image
-from sam_prompter import SamPrompter
+from sam_prompter import (
+    DecodedImage,
+    EmbeddingCache,
+    EmbeddingStore,
+    ObjectMaskCache,
+    ResultCache,
+    SamPrompter,
+    decode_image,
+)
 from transformers import SamModel, SamProcessor
 
 MODEL_ID = "facebook/sam-vit-base"
@@ -19,12 +29,36 @@ processor: SamProcessor = SamProcessor.from_pretrained(MODEL_ID)
 model: SamModel = SamModel.from_pretrained(MODEL_ID, torch_dtype=dtype).to(device).eval()
 print("Model loaded.")  # noqa: T201
 
+# Embeddings by image content; concurrent requests for the same image share one computation.
+embedding_cache: EmbeddingCache[torch.Tensor] = EmbeddingCache(max_bytes=512 * 1024**2)
+# On-disk copy shared by worker processes and kept across restarts.
+embedding_store = EmbeddingStore(
+    Path(tempfile.gettempdir()) / "sam-prompter-embeddings" / MODEL_ID.replace("/", "--"),
+    max_bytes=4 * 1024**3,
+)
+# Last mask per (image, object id, revision): unchanged objects are not re-inferred.
+object_masks: ObjectMaskCache[np.ndarray | None] = ObjectMaskCache()
+# Mask per (image pixels, prompts): undo, repeated clicks and other users' identical prompts skip the decoder.
+mask_results: ResultCache[np.ndarray | None] = ResultCache(max_bytes=256 * 1024**2)
 
-def _compute_image_embeddings(image: Image.Image) -> torch.Tensor:
-    """Compute image embeddings (no caching — safe for concurrent requests)."""
-    inputs = processor(images=image, return_tensors="pt").to(device=device, dtype=dtype)
-    with torch.no_grad():
-        return model.get_image_embeddings(inputs["pixel_values"])
+
+def _compute_image_embeddings(decoded: DecodedImage) -> torch.Tensor:
+    """Return image embeddings, computed once per image and then served from ``embedding_cache``.
+
+    On a memory miss the on-disk ``embedding_store`` is checked before running the image encoder.
+    """
+
+    def compute() -> torch.Tensor:
+        stored = embedding_store.get(decoded.digest)
+        if stored is not None:
+            return torch.tensor(stored, device=device, dtype=dtype)
+        inputs = processor(images=decoded.image, return_tensors="pt").to(device=device, dtype=dtype)
+        with torch.no_grad():
+            embeddings = model.get_image_embeddings(inputs["pixel_values"])
+        embedding_store.put(decoded.digest, embeddings.cpu().numpy())
+        return embeddings
+
+    return embedding_cache.get_or_compute(decoded.digest, compute)
 
 
 def _predict_mask_for_object(
@@ -90,6 +124,13 @@ def _predict_mask_for_object(
     return (best_mask > 0).cpu().numpy().astype(np.uint8)
 
 
+@spaces.GPU
+def warm_up(data: dict | None) -> None:
+    """Compute the embeddings of a freshly uploaded image before the first click."""
+    if data and data.get("imagePath"):
+        _compute_image_embeddings(decode_image(data["imagePath"]))
+
+
 @spaces.GPU
 def segment(
     data: dict | None,
@@ -107,26 +148,28 @@ def segment(
     if not image_path:
         return None, None, None, json.dumps(data, indent=2)
 
-    image = Image.open(image_path).convert("RGB")
+    decoded = decode_image(image_path)
+    image = decoded.image
     prompts = data.get("prompts", [])
 
     if not prompts:
         return (image, []), None, None, json.dumps(data, indent=2)
 
-    image_embeddings = _compute_image_embeddings(image)
+    def predict(obj: dict[str, Any]) -> np.ndarray | None:
+        # Embeddings come from embedding_cache, so only the first object pays for them.
+        return mask_results.get_or_compute(
+            decoded.digest, obj, lambda: _predict_mask_for_object(obj, image, _compute_image_embeddings(decoded))
+        )
 
     masks: list[dict[str, Any]] = []
     cutout_image: Image.Image | None = None
     mask_image: Image.Image | None = None
 
-    for obj in prompts:
-        mask = _predict_mask_for_object(obj, image, image_embeddings)
+    for mask in object_masks.resolve(data, predict):
         if mask is not None:
             masks.append({"mask": mask})
 
-            image_rgba = np.array(image.convert("RGBA"))
-            image_rgba[mask == 0] = [0, 0, 0, 0]
-            cutout_image = Image.fromarray(image_rgba)
+            cutout_image = Image.fromarray(np.dstack([decoded.array * mask[..., None], mask * 255]))
 
             mask_image = Image.fromarray(mask * 255)
 
@@ -151,6 +194,8 @@ with gr.Blocks(title="SAM Demo") as demo:
         inputs=prompter,
         outputs=[prompter, cutout_output, mask_output, debug_json],
     )
+    # Fired once the upload finishes; a click arriving meanwhile waits on the same computation.
+    prompter.upload(fn=warm_up, inputs=prompter, outputs=None, show_progress="hidden")
 
 
 if __name__ == "__main__":
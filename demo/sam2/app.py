@@ -1,4 +1,7 @@
 import json
+import tempfile
+from collections.abc import Iterator
+from pathlib import Path
 from typing import Any
 
 import gradio as gr
@@ -6,7 +9,15 @@ import numpy as np
 import spaces
 import torch
 from PIL import Image
-from sam_prompter import SamPrompter
+from sam_prompter import (
+    DecodedImage,
+    EmbeddingCache,
+    EmbeddingStore,
+    ObjectMaskCache,
+    ResultCache,
+    SamPrompter,
+    decode_image,
+)
 from transformers import Sam2Model, Sam2Processor
 
 MODEL_ID = "facebook/sam2.1-hiera-small"
@@ -19,12 +30,36 @@ processor: Sam2Processor = Sam2Processor.from_pretrained(MODEL_ID)
 model: Sam2Model = Sam2Model.from_pretrained(MODEL_ID, torch_dtype=dtype).to(device).eval()
 print("Model loaded.")  # noqa: T201
 
+# Embeddings by image content; concurrent requests for the same image share one computation.
+embedding_cache: EmbeddingCache[list[torch.Tensor]] = EmbeddingCache(max_bytes=512 * 1024**2)
+# On-disk copy shared by worker processes and kept across restarts.
+embedding_store = EmbeddingStore(
+    Path(tempfile.gettempdir()) / "sam-prompter-embeddings" / MODEL_ID.replace("/", "--"),
+    max_bytes=4 * 1024**3,
+)
+# Last mask per (image, object id, revision): unchanged objects are not re-inferred.
+object_masks: ObjectMaskCache[np.ndarray | None] = ObjectMaskCache()
+# Mask per (image pixels, prompts): undo, repeated clicks and other users' identical prompts skip the decoder.
+mask_results: ResultCache[np.ndarray | None] = ResultCache(max_bytes=256 * 1024**2)
 
-def _compute_image_embeddings(image: Image.Image) -> list[torch.Tensor]:
-    """Compute image embeddings (no caching — safe for concurrent requests)."""
-    inputs = processor(images=image, return_tensors="pt").to(device=device, dtype=dtype)
-    with torch.no_grad():
-        return model.get_image_embeddings(inputs["pixel_values"])
+
+def _compute_image_embeddings(decoded: DecodedImage) -> list[torch.Tensor]:
+    """Return image embeddings, computed once per image and then served from ``embedding_cache``.
+
+    On a memory miss the on-disk ``embedding_store`` is checked before running the image encoder.
+    """
+
+    def compute() -> list[torch.Tensor]:
+        stored = embedding_store.get(decoded.digest)
+        if stored is not None:
+            return [torch.tensor(a, device=device, dtype=dtype) for a in stored]
+        inputs = processor(images=decoded.image, return_tensors="pt").to(device=device, dtype=dtype)
+        with torch.no_grad():
+            embeddings = model.get_image_embeddings(inputs["pixel_values"])
+        embedding_store.put(decoded.digest, [e.cpu().numpy() for e in embeddings])
+        return embeddings
+
+    return embedding_cache.get_or_compute(decoded.digest, compute)
 
 
 def _predict_mask_for_object(
@@ -93,50 +128,74 @@ def _predict_mask_for_object(
     return (best_mask > 0).cpu().numpy().astype(np.uint8)
 
 
+@spaces.GPU
+def warm_up(data: dict | None) -> None:
+    """Compute the embeddings of a freshly uploaded image before the first click."""
+    if data and data.get("imagePath"):
+        _compute_image_embeddings(decode_image(data["imagePath"]))
+
+
 @spaces.GPU
 def segment(
     data: dict | None,
-) -> tuple[
-    tuple[Image.Image, list[dict[str, Any]]] | None,
-    list[Image.Image],
-    list[Image.Image],
-    str,
+) -> Iterator[
+    tuple[
+        tuple[Image.Image, list[dict[str, Any]]] | None,
+        list[Image.Image],
+        list[Image.Image],
+        str,
+    ]
 ]:
     """Run SAM2 inference on the current prompts."""
     empty: tuple[None, list, list, str] = (None, [], [], "{}")
 
     if data is None:
-        return empty
+        yield empty
+        return
 
     image_path = data.get("imagePath")
     if not image_path:
-        return None, [], [], json.dumps(data, indent=2)
+        yield None, [], [], json.dumps(data, indent=2)
+        return
 
-    image = Image.open(image_path).convert("RGB")
+    decoded = decode_image(image_path)
+    image = decoded.image
     prompts = data.get("prompts", [])
 
     if not prompts:
-        return (image, []), [], [], json.dumps(data, indent=2)
+        yield (image, []), [], [], json.dumps(data, indent=2)
+        return
 
-    image_embeddings = _compute_image_embeddings(image)
+    ran_decoder = False
+
+    def decode(obj: dict[str, Any]) -> np.ndarray | None:
+        nonlocal ran_decoder
+        ran_decoder = True
+        # Embeddings come from embedding_cache, so only the first object pays for them.
+        return _predict_mask_for_object(obj, image, _compute_image_embeddings(decoded))
+
+    def predict(obj: dict[str, Any]) -> np.ndarray | None:
+        return mask_results.get_or_compute(decoded.digest, obj, lambda: decode(obj))
 
     masks: list[dict[str, Any]] = []
     cutout_images: list[Image.Image] = []
     mask_images: list[Image.Image] = []
-    image_rgba = np.array(image.convert("RGBA"))
 
-    for obj in prompts:
-        mask = _predict_mask_for_object(obj, image, image_embeddings)
+    for i, mask in enumerate(object_masks.iter_resolve(data, predict)):
+        fresh, ran_decoder = ran_decoder, False
         if mask is not None:
             masks.append({"mask": mask})
 
-            cutout = image_rgba.copy()
-            cutout[mask == 0] = [0, 0, 0, 0]
-            cutout_images.append(Image.fromarray(cutout))
+            cutout_images.append(Image.fromarray(np.dstack([decoded.array * mask[..., None], mask * 255])))
 
             mask_images.append(Image.fromarray(mask * 255))
 
-    return (image, masks), cutout_images, mask_images, json.dumps(data, indent=2)
+            if fresh and i < len(prompts) - 1:
+                # Show a freshly decoded mask before the next object is decoded.  Unchanged objects come
+                # from the caches at once and arrive with the final yield, like the galleries.
+                yield SamPrompter.partial({i: {"mask": mask}}), gr.skip(), gr.skip(), gr.skip()
+
+    yield (image, masks), cutout_images, mask_images, json.dumps(data, indent=2)
 
 
 with gr.Blocks(title="SAM2 Demo") as demo:
@@ -157,6 +216,8 @@ with gr.Blocks(title="SAM2 Demo") as demo:
         inputs=prompter,
         outputs=[prompter, cutout_gallery, mask_gallery, debug_json],
     )
+    # Fired once the upload finishes; a click arriving meanwhile waits on the same computation.
+    prompter.upload(fn=warm_up, inputs=prompter, outputs=None, show_progress="hidden")
 
 
 if __name__ == "__main__":
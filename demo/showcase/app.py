@@ -4,7 +4,7 @@ from collections.abc import Callable
 import gradio as gr
 import numpy as np
 from PIL import Image, ImageDraw
-from sam_prompter import SamPrompter
+from sam_prompter import SamPrompter, decode_image
 
 MOCK_MASK_RADIUS = 50
 
@@ -125,7 +125,7 @@ def mock_inference(
     if not image_path:
         return None, json.dumps(data, indent=2)
 
-    image = Image.open(image_path).convert("RGB")
+    image = decode_image(image_path).image
     prompts = data.get("prompts", [])
     if not prompts:
         return (image, []), json.dumps(data, indent=2)
@@ -1,15 +1,47 @@
 from __future__ import annotations
 
+import base64
+import contextlib
+import hashlib
 import html
 import json
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import gradio as gr
 import numpy as np
 from gradio import processing_utils
+from gradio.components.base import server
+from gradio_client import utils as client_utils
 from PIL import Image
 
+from sam_prompter.cache import _SHA256_HEX, _file_sha256, _upload_index, decode_image
+from sam_prompter.cache import CacheStats as CacheStats
+from sam_prompter.cache import DecodedImage as DecodedImage
+from sam_prompter.cache import DecodedImageCache as DecodedImageCache
+from sam_prompter.cache import EmbeddingCache as EmbeddingCache
+from sam_prompter.cache import EmbeddingStore as EmbeddingStore
+from sam_prompter.cache import ObjectMaskCache as ObjectMaskCache
+from sam_prompter.cache import ResultCache as ResultCache
+from sam_prompter.cache import prompt_key as prompt_key
+from sam_prompter.prompts import PromptBatch
+
+try:
+    import orjson
+except ImportError:  # optional fast JSON backend
+    orjson = None
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Mapping, Sequence
+
 _STATIC_DIR = Path(__file__).parent / "static"
 
 _COLOR_PALETTE = [
@@ -54,7 +86,7 @@ class _ClearPrompts:
 
     def __init__(
         self,
-        value: str | Path | Image.Image | np.ndarray | tuple[Any, list[dict[str, Any]]] | None = None,
+        value: str | Path | Image.Image | np.ndarray | tuple[Any, list[dict[str, Any]]] | _MasksOnly | None = None,
         *,
         max_objects: int | None = None,
     ) -> None:
@@ -62,28 +94,630 @@ class _ClearPrompts:
         self.max_objects = max_objects
 
 
-def _load_image(source: str | Path | Image.Image | np.ndarray) -> Image.Image:
+class _MasksOnly:
+    """Wrapper that sends masks without an image; the frontend keeps its current image."""
+
+    __slots__ = ("masks",)
+
+    def __init__(self, masks: list[dict[str, Any]]) -> None:
+        self.masks = masks
+
+
+class _PartialMasks:
+    """Wrapper that updates the masks of some objects while the request is still running."""
+
+    __slots__ = ("masks",)
+
+    def __init__(self, masks: Mapping[int, dict[str, Any]]) -> None:
+        self.masks = masks
+
+
+class _DeltaMasks:
+    """Wrapper that omits the data of masks the frontend already has (by content hash)."""
+
+    __slots__ = ("known_hashes", "value")
+
+    def __init__(self, value: Any, known_hashes: frozenset[str]) -> None:  # noqa: ANN401 - any postprocess value
+        self.value = value
+        self.known_hashes = known_hashes
+
+
+def _load_image(source: str | Path | Image.Image | np.ndarray, size: tuple[int, int] | None = None) -> Image.Image:
+    if isinstance(source, np.ndarray):
+        source = Image.fromarray(source)
+    elif not isinstance(source, Image.Image):
+        source = Image.open(source)
+        if size is not None:
+            # Let the JPEG decoder downscale by DCT scaling; a no-op for other formats.
+            source.draft("RGB", size)
+    # RGB input is used as-is; converting would only make another copy.
+    img = source if source.mode == "RGB" else source.convert("RGB")
+    if size is not None and img.size != size:
+        img = img.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return img
+
+
+def _display_size(width: int, height: int, max_side: int | None) -> tuple[int, int]:
+    """Return *width* x *height* scaled down so the longer side is at most *max_side*."""
+    longest = max(width, height)
+    if max_side is None or longest <= max_side:
+        return width, height
+    scale = max_side / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _nearest_indices(src: int, dst: int) -> np.ndarray:
+    # Source index of the pixel nearest to the centre of each destination pixel.
+    return (np.arange(dst) * 2 + 1) * src // (2 * dst)
+
+
+# image_format -> (PIL format, file suffix)
+_IMAGE_FORMATS = {
+    "webp": ("WEBP", ".webp"),
+    "jpeg": ("JPEG", ".jpg"),
+    "png": ("PNG", ".png"),
+}
+
+_MASK_ENCODINGS = ("rle", "bitmap", "auto", "coco")
+_REQUEST_MODES = ("lock", "pipelined", "manual")
+
+# A packed, base64'd bitmap costs ~1/6 byte per pixel before deflate and a
+# JSON run length costs a few bytes, so beyond one run per this many pixels
+# the bitmap is the smaller transport.
+_AUTO_BITMAP_PIXELS_PER_RUN = 48
+
+# File types every major browser decodes natively (for image_format="original").
+_BROWSER_IMAGE_SUFFIXES = frozenset({".avif", ".bmp", ".gif", ".jpeg", ".jpg", ".png", ".webp"})
+
+
+def _save_image_to_cache(img: Image.Image, target: Path, quality: int | None = None) -> None:
+    pil_format = next(fmt for fmt, suffix in _IMAGE_FORMATS.values() if suffix == target.suffix)
+    if pil_format == "PNG":
+        # Favour encode speed over file size; PNG is only chosen for lossless output.
+        params: dict[str, Any] = {"compress_level": 1}
+    else:
+        params = {} if quality is None else {"quality": quality}
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temp file and rename so concurrent readers never see a partial file.
+    with tempfile.NamedTemporaryFile(dir=target.parent, suffix=target.suffix, delete=False) as f:
+        img.save(f, format=pil_format, **params)
+    Path(f.name).replace(target)
+
+
+def _copy_file_to_cache(source: Path, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # A private temp directory gives a name unique across threads and
+    # processes; link (or copy) into it, then rename into place.
+    with tempfile.TemporaryDirectory(dir=target.parent, prefix=".tmp-") as tmp_dir:
+        tmp = Path(tmp_dir) / target.name
+        try:
+            os.link(source, tmp)
+        except OSError:
+            shutil.copyfile(source, tmp)
+        tmp.replace(target)
+
+
+class _CachedImage:
+    """URL, content ID and size of an image already written to the Gradio cache.
+
+    ``full_path`` is the full-resolution file in the cache when ``path`` is
+    a downscaled display copy of a file source, else ``None``.
+    """
+
+    __slots__ = ("full_path", "height", "image_id", "path", "url", "width")
+
+    def __init__(self, path: Path, image_id: str, width: int, height: int, full_path: Path | None = None) -> None:
+        self.path = path
+        self.url = f"/gradio_api/file={path}"
+        self.image_id = image_id
+        self.width = width
+        self.height = height
+        self.full_path = full_path
+
+
+class _DisplayImageCache:
+    """Thread-safe LRU mapping image keys to already-encoded display images."""
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self._maxsize = maxsize
+        self._entries: OrderedDict[str, _CachedImage] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> _CachedImage | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+        # Gradio's delete_cache may have removed the files meanwhile.
+        if not entry.path.exists() or (entry.full_path is not None and not entry.full_path.exists()):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: _CachedImage) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+
+_display_cache = _DisplayImageCache()
+
+
+_encode_pools: dict[int, ThreadPoolExecutor] = {}
+_encode_pools_lock = threading.Lock()
+
+
+def _encode_pool(workers: int) -> ThreadPoolExecutor:
+    """Return the process-wide encode pool with *workers* threads.
+
+    Pools are shared by every component with the same worker count, so
+    the number of extra threads stays bounded however many users are
+    being served.
+    """
+    with _encode_pools_lock:
+        pool = _encode_pools.get(workers)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sam-prompter-encode")
+            _encode_pools[workers] = pool
+        return pool
+
+
+class _DigestMemo:
+    """Content digests of in-memory images, remembered by object identity.
+
+    Handlers typically return the same image object on every click; this
+    turns the pixel hash of a repeat into a dict lookup plus a cheap
+    *check* (see :func:`_pil_fingerprint`).  Entries hold a weak reference,
+    so a recycled ``id()`` is never mistaken for the old object.
+    """
+
+    def __init__(self, maxsize: int = 64) -> None:
+        self._maxsize = maxsize
+        self._entries: OrderedDict[int, tuple[weakref.ref[Any], str, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source: object, check: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(id(source))
+            if entry is None or entry[0]() is not source or entry[1] != check:
+                return None
+            self._entries.move_to_end(id(source))
+            return entry[2]
+
+    def put(self, source: object, check: str, digest: str) -> None:
+        with self._lock:
+            self._entries[id(source)] = (weakref.ref(source), check, digest)
+            self._entries.move_to_end(id(source))
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+
+_digest_memo = _DigestMemo()
+
+
+def _pil_fingerprint(img: Image.Image) -> str:
+    """Cheap content check for a memoized PIL image that a handler may have drawn on.
+
+    Every pixel contributes through 4x4 box averages (about 7x faster than
+    hashing the full image); modes PIL cannot reduce are checksummed whole.
+    """
+    try:
+        data = img.reduce(4).tobytes() if min(img.size) >= 4 else img.tobytes()  # noqa: PLR2004
+    except ValueError:
+        data = img.tobytes()
+    return f"{zlib.crc32(data):08x}"
+
+
+def _image_digest(source: Image.Image | np.ndarray) -> str:
+    """Content hash of an in-memory image (pixel data plus layout).
+
+    PIL images are memoized by identity plus :func:`_pil_fingerprint`, so
+    drawing on a returned image is noticed on the next call.  Read-only
+    arrays are memoized by identity alone; writeable arrays are often
+    reused buffers and are always hashed.
+    """
+    if isinstance(source, Image.Image):
+        header = f"{source.mode}:{source.size}"
+        check = f"{header}:{_pil_fingerprint(source)}"
+        memoize = True
+    else:
+        header = check = f"{source.dtype.str}:{source.shape}"
+        memoize = not source.flags.writeable
+    if memoize:
+        digest = _digest_memo.get(source, check)
+        if digest is not None:
+            return digest
+    data: Any = source.tobytes() if isinstance(source, Image.Image) else np.ascontiguousarray(source)
+    hasher = hashlib.sha256(header.encode(), usedforsecurity=False)
+    hasher.update(data)
+    digest = hasher.hexdigest()
+    if memoize:
+        _digest_memo.put(source, check, digest)
+    return digest
+
+
+def _image_size(source: str | Path | Image.Image | np.ndarray) -> tuple[int, int]:
     if isinstance(source, Image.Image):
-        return source.convert("RGB")
+        return source.size
     if isinstance(source, np.ndarray):
-        return Image.fromarray(source).convert("RGB")
-    return Image.open(source).convert("RGB")
+        return source.shape[1], source.shape[0]
+    with Image.open(source) as img:
+        return img.size
+
+
+def _link_original_to_cache(path: Path, target_dir: Path) -> Path:
+    # Files Gradio already moved into its cache are served in place.
+    if path.is_relative_to(target_dir.parent):
+        return path
+    target = target_dir / client_utils.strip_invalid_filename_characters(path.name)
+    if not target.exists():
+        _copy_file_to_cache(path, target)
+    return target
 
 
-def _save_image_to_cache(img: Image.Image, cache_dir: str) -> str:
-    cached_path = processing_utils.save_pil_to_cache(img, cache_dir, format="webp")
-    return f"/gradio_api/file={cached_path}"
+def _cache_display_image(
+    source: str | Path | Image.Image | np.ndarray,
+    cache_dir: str,
+    image_format: str = "webp",
+    quality: int | None = None,
+    max_side: int | None = None,
+) -> _CachedImage:
+    """Return the cached display image for *source*, encoding it only on a miss.
+
+    In-memory images are keyed by a hash of their pixels (remembered per
+    object, see :func:`_image_digest`) and files by path, size and mtime,
+    so a hit costs at most a hash and a ``stat`` instead of a decode and
+    encode.  A hit whose file has been deleted from the cache is redone.
+    Files are written under a directory named by the content hash, which
+    keeps the URL stable for identical images.
+
+    With ``image_format="original"``, browser-decodable files are served
+    as they are (files already in *cache_dir* are not even copied); other
+    sources fall back to WebP.
+
+    If *max_side* is given, larger images are downscaled so that their
+    longer side fits; the returned width and height are still those of
+    the original image.  A downscaled file source is also linked into the
+    cache at full resolution (``full_path``), so handlers get a file that
+    matches the prompt coordinates.
+    """
+    if isinstance(source, (Image.Image, np.ndarray)):
+        path = None
+        digest = _image_digest(source)
+        key = f"{cache_dir}:{image_format}:{quality}:{max_side}:{digest}"
+    else:
+        path = Path(source).resolve()
+        stat = path.stat()
+        digest = None
+        key = f"{cache_dir}:{image_format}:{quality}:{max_side}:{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    entry = _display_cache.get(key)
+    if entry is not None:
+        return entry
+
+    if digest is None:
+        digest = processing_utils.hash_file(path)
+    cache_root = Path(cache_dir).resolve()
+    width, height = _image_size(source)
+    display_size = _display_size(width, height, max_side)
+    downscaled = display_size != (width, height)
+    if (
+        image_format == "original"
+        and not downscaled
+        and path is not None
+        and path.suffix.lower() in _BROWSER_IMAGE_SUFFIXES
+    ):
+        target = _link_original_to_cache(path, cache_root / digest)
+    else:
+        suffix = _IMAGE_FORMATS.get(image_format, _IMAGE_FORMATS["webp"])[1]
+        name = f"image_{display_size[0]}x{display_size[1]}" if downscaled else "image"
+        target = cache_root / digest / f"{name}{suffix}"
+        # The file may have been written by an earlier call (or process).
+        if not target.exists():
+            _save_image_to_cache(_load_image(source, display_size), target, quality)
+    full_path = _link_original_to_cache(path, cache_root / digest) if downscaled and path is not None else None
+
+    entry = _CachedImage(target, digest, width, height, full_path)
+    _display_cache.put(key, entry)
+    return entry
 
 
 def _encode_mask_to_rle(mask: np.ndarray) -> dict[str, Any]:
-    h, w = mask.shape[:2]
-    flat = mask.astype(np.uint8).ravel(order="F")
-    change_idx = np.flatnonzero(np.diff(flat))
-    runs = np.diff(np.concatenate([[-1], change_idx, [len(flat) - 1]]))
-    counts = runs.tolist()
-    if flat[0] == 1:
-        counts = [0, *counts]
-    return {"counts": counts, "size": [h, w]}
+    return _encode_masks_to_rle([mask])[0]
+
+
+def _encode_masks_to_rle(
+    masks: np.ndarray | Sequence[np.ndarray | Image.Image], max_side: int | None = None
+) -> list[dict[str, Any]]:
+    """Encode a batch of masks to column-major RLE in a single NumPy pass.
+
+    *masks* is either an ``(N, H, W)`` array or a sequence of 2-D arrays /
+    PIL images.  Any dtype is accepted; pixels ``> 0`` are foreground.
+    Masks of different shapes are grouped and encoded one group at a time.
+    If *max_side* is given, larger masks are nearest-neighbour sampled
+    down to the same size as a display image of their shape would be.
+    """
+    return [
+        {"counts": entry["rle"]["counts"].tolist(), "size": entry["rle"]["size"]}
+        for entry in _encode_mask_entries(masks, max_side, "rle")
+    ]
+
+
+def _encode_mask_entries(
+    masks: np.ndarray | Sequence[np.ndarray | Image.Image],
+    max_side: int | None,
+    encoding: str,
+    *,
+    crop: bool = False,
+    known_hashes: Collection[str] = (),
+) -> list[dict[str, Any]]:
+    """Encode *masks* for the wire as ``{"rle": ...}`` or ``{"bitmap": ...}`` dicts.
+
+    ``"auto"`` picks, per mask, RLE for masks with few runs and a bitmap
+    for masks whose RLE would outgrow the packed bitmap (noisy masks).
+    ``"coco"`` is RLE with pycocotools' compressed string ``counts``.
+
+    With *crop*, each mask is cut to its tight bounding box before encoding
+    and the entry gains ``bbox`` (``[x, y, w, h]``) and ``frame``
+    (``[H, W]`` of the full mask) so the client can place it.
+
+    Every entry carries a content ``hash``.  Masks whose hash is in
+    *known_hashes* are not encoded at all; their entry is just the hash.
+    """
+    groups = _binarize_masks(masks, max_side)
+    encoded: list[dict[str, Any]] = [{} for _ in range(sum(len(indices) for indices, _ in groups))]
+    for all_indices, all_masks in groups:
+        # Hashing the packed bits reads 8x less data than the bool masks;
+        # the bitmap encoding reuses them.
+        all_packed = _pack_bits(all_masks)
+        positions, indices = [], []
+        for j, i in enumerate(all_indices):
+            digest = _mask_hash(all_packed[j], all_masks.shape[1:])
+            encoded[i]["hash"] = digest
+            if digest not in known_hashes:
+                positions.append(j)
+                indices.append(i)
+        if not indices:
+            continue
+        whole = len(indices) == len(all_masks)
+        stack = all_masks if whole else all_masks[positions]
+        if not crop:
+            packed = all_packed if whole else all_packed[positions]
+            for i, entry in zip(indices, _encode_stack(stack, encoding, packed), strict=True):
+                encoded[i].update(entry)
+            continue
+        _, w, h = stack.shape
+        for i, (cropped, bbox) in zip(indices, _crop_to_bbox(stack), strict=True):
+            encoded[i].update(_encode_stack(cropped, encoding)[0], bbox=bbox, frame=[h, w])
+    return encoded
+
+
+def _mask_hash(bits: np.ndarray, shape: tuple[int, ...]) -> str:
+    # *bits* is one packed row of a binarized (W, H) stack; see _pack_bits.
+    digest = hashlib.sha256(f"{shape}".encode(), usedforsecurity=False)
+    digest.update(bits)
+    return digest.hexdigest()[:16]
+
+
+def _encode_stack(stack: np.ndarray, encoding: str, packed: np.ndarray | None = None) -> list[dict[str, Any]]:
+    _, w, h = stack.shape
+    if encoding == "bitmap":
+        rows = _pack_bits(stack) if packed is None else packed
+        return [{"bitmap": _bitmap_payload(bits, h, w)} for bits in rows]
+    if encoding == "coco":
+        return [{"rle": {"counts": counts, "size": [h, w]}} for counts in _coco_strings(_rle_counts(stack))]
+    entries = []
+    for j, counts in enumerate(_rle_counts(stack)):
+        if encoding == "auto" and len(counts) * _AUTO_BITMAP_PIXELS_PER_RUN > h * w:
+            bits = _pack_bits(stack[j : j + 1])[0] if packed is None else packed[j]
+            entries.append({"bitmap": _bitmap_payload(bits, h, w)})
+        else:
+            # Counts stay NumPy arrays; _json_dumps writes them natively.
+            entries.append({"rle": {"counts": counts, "size": [h, w]}})
+    return entries
+
+
+def _crop_to_bbox(stack: np.ndarray) -> list[tuple[np.ndarray, list[int]]]:
+    """Cut each mask of a transposed ``(N, W, H)`` stack to its bounding box.
+
+    Returns ``(cropped, [x, y, w, h])`` pairs, where ``cropped`` is a
+    ``(1, w, h)`` stack.  Empty masks get an empty box at the origin.
+    """
+    # Reduce once per axis for the whole batch instead of per mask.
+    cols = stack.any(axis=2)
+    rows = stack.any(axis=1)
+    width, height = cols.shape[1], rows.shape[1]
+    x0 = cols.argmax(axis=1)
+    x1 = width - cols[:, ::-1].argmax(axis=1)
+    y0 = rows.argmax(axis=1)
+    y1 = height - rows[:, ::-1].argmax(axis=1)
+    crops = []
+    for j in range(stack.shape[0]):
+        if not cols[j, x0[j]]:
+            crops.append((stack[j : j + 1, :0, :0], [0, 0, 0, 0]))
+            continue
+        cropped = np.ascontiguousarray(stack[j : j + 1, x0[j] : x1[j], y0[j] : y1[j]])
+        crops.append((cropped, [int(x0[j]), int(y0[j]), int(x1[j] - x0[j]), int(y1[j] - y0[j])]))
+    return crops
+
+
+def _encode_logits(
+    logits: np.ndarray,
+    frame: tuple[int, int],
+    *,
+    padded: bool = False,
+    known_hashes: Collection[str] = (),
+) -> dict[str, Any]:
+    """Encode a low-resolution logit (or binary) grid for upsampling on the client.
+
+    Float grids are passed through a sigmoid and quantized to ``uint8``;
+    bool/integer grids become 0/255.  The client scales the grid to
+    *frame* (``(H, W)``) with bilinear smoothing and thresholds at 128,
+    i.e. at logit 0.  With *padded*, the grid is SAM's padded square
+    decoder output and only its top-left region covering the image
+    (the frame's aspect ratio) is kept.
+
+    Raises:
+        ValueError: If *logits* holds more than one grid.
+    """
+    arr = np.asarray(logits)
+    if arr.ndim < 2 or arr.size != arr.shape[-1] * arr.shape[-2]:  # noqa: PLR2004
+        msg = (
+            f"logits must hold a single (h, w) grid, optionally with leading size-1 axes; got shape {arr.shape}. "
+            "Select one mask of a multimask output first (e.g. by the best IoU score)."
+        )
+        raise ValueError(msg)
+    arr = arr.reshape(arr.shape[-2:])
+    frame_h, frame_w = frame
+    if padded:
+        longest = max(frame_h, frame_w)
+        arr = arr[: max(1, round(arr.shape[0] * frame_h / longest)), : max(1, round(arr.shape[1] * frame_w / longest))]
+    if arr.dtype == np.bool_ or np.issubdtype(arr.dtype, np.integer):
+        grid = np.where(arr > 0, 255, 0).astype(np.uint8)
+    else:
+        # Clip so exp() cannot overflow; the quantized value saturates long before.
+        x = np.clip(arr.astype(np.float32), -30.0, 30.0)
+        grid = np.rint(255.0 / (1.0 + np.exp(-x))).astype(np.uint8)
+    grid = np.ascontiguousarray(grid)
+    h, w = grid.shape
+    digest = hashlib.sha256(f"logits:{grid.shape}:{frame}".encode(), usedforsecurity=False)
+    digest.update(grid)
+    entry: dict[str, Any] = {"hash": digest.hexdigest()[:16]}
+    if entry["hash"] in known_hashes:
+        return entry
+    # Unlike bitmaps, the grid is an image: row-major, one byte per cell.
+    data = base64.b64encode(zlib.compress(grid.tobytes(), 1)).decode("ascii")
+    entry.update(logits={"data": data, "size": [h, w]}, frame=[frame_h, frame_w])
+    return entry
+
+
+def _coco_strings(counts_list: list[np.ndarray]) -> list[str]:
+    """Compress run lengths into pycocotools' ``counts`` strings, vectorized.
+
+    Each count (minus the count two places earlier, from the fourth on) is
+    written as 5-bit little-endian groups offset by 48, with bit 0x20
+    flagging a continuation and bit 0x10 of the last group carrying the
+    sign -- the same bytes as ``pycocotools.mask.encode``.
+    """
+    if not counts_list:
+        return []
+    lengths = np.array([len(counts) for counts in counts_list])
+    runs = np.concatenate(counts_list).astype(np.int64)
+    starts = np.cumsum(lengths) - lengths
+    position = np.arange(len(runs)) - np.repeat(starts, lengths)
+    x = runs.copy()
+    x[2:] -= np.where(position[2:] > 2, runs[:-2], 0)  # noqa: PLR2004
+
+    # One round per 5-bit group; every value needs at most 13 of them.
+    groups, valid = [], []
+    active = np.ones(len(x), dtype=bool)
+    while active.any():
+        c = x & 0x1F
+        x >>= 5
+        more = np.where(c & 0x10, x != -1, x != 0)
+        groups.append((c | np.where(more, 0x20, 0)) + 48)
+        valid.append(active.copy())
+        active &= more
+    chars = np.stack(groups, axis=1)
+    present = np.stack(valid, axis=1)
+    # Boolean indexing is row-major, so each value's groups stay in order.
+    text = chars[present].astype(np.uint8).tobytes().decode("ascii")
+    ends = np.cumsum(np.add.reduceat(present.sum(axis=1), starts)).tolist()
+    return [text[begin:end] for begin, end in zip([0, *ends[:-1]], ends, strict=True)]
+
+
+def _pack_bits(stack: np.ndarray) -> np.ndarray:
+    # Rows of the transposed stack are column-major, like the RLE counts.
+    return np.packbits(stack.reshape(stack.shape[0], -1), axis=1)
+
+
+def _bitmap_payload(bits: np.ndarray, h: int, w: int) -> dict[str, Any]:
+    data = zlib.compress(bits.tobytes(), 1)
+    return {"data": base64.b64encode(data).decode("ascii"), "size": [h, w]}
+
+
+def _binarize_masks(
+    masks: np.ndarray | Sequence[np.ndarray | Image.Image], max_side: int | None = None
+) -> list[tuple[list[int], np.ndarray]]:
+    """Threshold *masks* into transposed ``(N, W, H)`` bool stacks, one per shape.
+
+    Returns ``(indices, stack)`` pairs, where ``indices`` are the positions
+    of the stacked masks in *masks*.  Each ``stack[j]`` is already in
+    column-major order, which is what every wire encoding uses.
+    """
+    if isinstance(masks, np.ndarray) and masks.ndim == 3:  # noqa: PLR2004
+        n, h, w = masks.shape
+        dw, dh = _display_size(w, h, max_side)
+        if (dh, dw) != (h, w):
+            masks = masks[:, _nearest_indices(h, dh)[:, None], _nearest_indices(w, dw)]
+        stack = np.empty((n, dw, dh), dtype=bool)
+        _threshold_into(masks.transpose(0, 2, 1), stack)
+        return [(list(range(n)), stack)]
+
+    groups: dict[tuple[int, int], list[tuple[int, np.ndarray]]] = {}
+    for i, mask in enumerate(masks):
+        arr = np.asarray(mask)
+        groups.setdefault(arr.shape[:2], []).append((i, arr))
+
+    stacks = []
+    for (h, w), members in groups.items():
+        dw, dh = _display_size(w, h, max_side)
+        rows = _nearest_indices(h, dh)[:, None] if (dh, dw) != (h, w) else None
+        cols = _nearest_indices(w, dw)
+        # Threshold straight into a transposed stack so each row is already
+        # in column-major order; no per-mask temporaries are allocated.
+        stack = np.empty((len(members), dw, dh), dtype=bool)
+        for j, (_, arr) in enumerate(members):
+            src = arr.reshape(h, w)
+            if rows is not None:
+                src = src[rows, cols]
+            _threshold_into(src.T, stack[j])
+        stacks.append(([i for i, _ in members], stack))
+    return stacks
+
+
+def _threshold_into(src: np.ndarray, out: np.ndarray) -> None:
+    if src.dtype == np.bool_:
+        out[...] = src
+    else:
+        np.greater(src, 0, out=out)
+
+
+def _rle_counts(stack: np.ndarray) -> list[np.ndarray]:
+    """Return COCO-style run lengths for each row of a ``(N, W, H)`` bool stack.
+
+    Each ``stack[i]`` is the transposed mask, so its C-order ravel is the
+    column-major (Fortran) order of the original ``(H, W)`` mask.  Runs
+    alternate 0s and 1s and always start with a (possibly empty) run of 0s.
+    """
+    n = stack.shape[0]
+    if n == 0:
+        return []
+    flat = stack.reshape(n, -1)
+    length = flat.shape[1]
+    if length == 0:
+        return [np.zeros(1, dtype=np.intp) for _ in range(n)]
+    # edges[i, j] marks the start of a new run at position j; the extra
+    # trailing column terminates the last run of every mask.
+    edges = np.empty((n, length + 1), dtype=bool)
+    edges[:, 0] = flat[:, 0]
+    np.not_equal(flat[:, 1:], flat[:, :-1], out=edges[:, 1:length])
+    edges[:, length] = True
+    # flatnonzero + divmod is much cheaper than a 2-D np.nonzero here.
+    rows, cols = np.divmod(np.flatnonzero(edges), length + 1)
+    prev = np.empty_like(cols)
+    prev[0] = 0
+    prev[1:] = cols[:-1]
+    prev[np.flatnonzero(np.diff(rows, prepend=-1))] = 0
+    runs = cols - prev
+    return np.split(runs, np.cumsum(np.bincount(rows, minlength=n))[:-1])
 
 
 class SamPrompter(gr.HTML):
@@ -95,11 +729,64 @@ class SamPrompter(gr.HTML):
         max_objects: int = 8,
         point_radius: int = 6,
         mask_alpha: float = 0.4,
+        image_format: str = "webp",
+        image_quality: int | None = None,
+        max_display_side: int | None = None,
+        mask_encoding: str = "rle",
+        crop_masks: bool = False,
+        encode_workers: int = 2,
+        as_arrays: bool = False,
+        decode_images: bool = False,
+        dedupe_uploads: bool = False,
+        max_upload_side: int | None = None,
+        mask_memo: int = 0,
+        request_mode: str = "lock",
+        debounce_ms: int = 0,
         **kwargs: Any,  # noqa: ANN401 - forwarded to gr.HTML
     ) -> None:
+        if image_format != "original" and image_format not in _IMAGE_FORMATS:
+            msg = f"image_format must be one of 'webp', 'jpeg', 'png', 'original'; got {image_format!r}"
+            raise ValueError(msg)
+        if image_quality is not None and not 1 <= image_quality <= 100:  # noqa: PLR2004
+            msg = f"image_quality must be between 1 and 100; got {image_quality!r}"
+            raise ValueError(msg)
+        if max_display_side is not None and max_display_side < 1:
+            msg = f"max_display_side must be a positive integer; got {max_display_side!r}"
+            raise ValueError(msg)
+        if max_upload_side is not None and max_upload_side < 1:
+            msg = f"max_upload_side must be a positive integer; got {max_upload_side!r}"
+            raise ValueError(msg)
+        if request_mode not in _REQUEST_MODES:
+            msg = f"request_mode must be one of 'lock', 'pipelined', 'manual'; got {request_mode!r}"
+            raise ValueError(msg)
+        if debounce_ms < 0:
+            msg = f"debounce_ms must be >= 0; got {debounce_ms!r}"
+            raise ValueError(msg)
+        if mask_memo < 0:
+            msg = f"mask_memo must be >= 0; got {mask_memo!r}"
+            raise ValueError(msg)
+        if encode_workers < 0:
+            msg = f"encode_workers must be >= 0; got {encode_workers!r}"
+            raise ValueError(msg)
+        if mask_encoding not in _MASK_ENCODINGS:
+            msg = f"mask_encoding must be one of 'rle', 'bitmap', 'auto', 'coco'; got {mask_encoding!r}"
+            raise ValueError(msg)
         self.max_objects = max_objects
         self.point_radius = point_radius
         self.mask_alpha = mask_alpha
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.max_display_side = max_display_side
+        self.mask_encoding = mask_encoding
+        self.crop_masks = crop_masks
+        self.encode_workers = encode_workers
+        self.as_arrays = as_arrays
+        self.decode_images = decode_images
+        self.dedupe_uploads = dedupe_uploads
+        self.max_upload_side = max_upload_side
+        self.mask_memo = mask_memo
+        self.request_mode = request_mode
+        self.debounce_ms = debounce_ms
 
         html_template = (_STATIC_DIR / "template.html").read_text(encoding="utf-8")
         css_template = (_STATIC_DIR / "style.css").read_text(encoding="utf-8")
@@ -116,13 +803,76 @@ class SamPrompter(gr.HTML):
             max_objects=max_objects,
             point_radius=point_radius,
             mask_alpha=mask_alpha,
+            dedupe_uploads=dedupe_uploads,
+            max_upload_side=max_upload_side or 0,
+            mask_memo=mask_memo,
+            request_mode=request_mode,
+            debounce_ms=debounce_ms,
             swatches_html=_build_swatches_html(),
             **kwargs,
         )
 
+    @server
+    def upload_challenge(self, image_hash: str) -> str | None:
+        """Return a single-use salt (hex) for :meth:`lookup_upload` to check *image_hash* against.
+
+        Called by the frontend before uploading when ``dedupe_uploads=True``.
+        A salt is issued for every well-formed hash, so the answer does not
+        reveal whether a file with that hash was ever uploaded.
+        """
+        if not self.dedupe_uploads or not isinstance(image_hash, str) or not _SHA256_HEX.fullmatch(image_hash):
+            return None
+        return _upload_index.challenge(image_hash)
+
+    @server
+    def lookup_upload(self, data: dict[str, Any]) -> str | None:
+        """Return the server path of an earlier upload of the same file, if any.
+
+        *data* is ``{"hash": ..., "salt": ..., "proof": ...}`` from the
+        frontend, where ``salt`` comes from :meth:`upload_challenge` and
+        ``proof`` is the SHA-256 (hex) of the salt bytes followed by the
+        file content.  The server recomputes the proof from its own copy,
+        so a client that only knows the plain hash of someone else's upload
+        cannot learn its path (which ``/gradio_api/file=`` would serve).
+        On a hit the file is not uploaded again.
+        """
+        if not self.dedupe_uploads or not isinstance(data, dict):
+            return None
+        claimed, salt, proof = data.get("hash"), data.get("salt"), data.get("proof")
+        if not all(isinstance(v, str) for v in (claimed, salt, proof)) or not _SHA256_HEX.fullmatch(claimed):
+            return None
+        return _upload_index.claim(claimed, salt, proof)
+
+    @server
+    def register_upload(self, data: dict[str, Any]) -> bool:
+        """Record a finished upload so :meth:`lookup_upload` can return it.
+
+        *data* is ``{"hash": ..., "path": ...}`` from the frontend.  Neither
+        is trusted: the path must be a file inside the Gradio cache, and
+        the server hashes it itself, registering it only if the hash
+        matches.  Returns whether the upload was registered.
+        """
+        if not self.dedupe_uploads or not isinstance(data, dict):
+            return False
+        claimed, path = data.get("hash"), data.get("path")
+        if not isinstance(claimed, str) or not _SHA256_HEX.fullmatch(claimed) or not isinstance(path, str):
+            return False
+        resolved = self._cached_file(path)
+        if resolved is None or _file_sha256(resolved) != claimed:
+            return False
+        _upload_index.register(claimed, str(resolved))
+        return True
+
+    def _cached_file(self, path: str) -> Path | None:
+        """Resolve a client-sent *path*, or ``None`` unless it is a file inside the Gradio cache."""
+        resolved = Path(path).resolve()
+        if not resolved.is_relative_to(Path(self.GRADIO_CACHE).resolve()) or not resolved.is_file():
+            return None
+        return resolved
+
     @staticmethod
     def clear(
-        value: str | Path | Image.Image | np.ndarray | tuple[Any, list[dict[str, Any]]] | None = None,
+        value: str | Path | Image.Image | np.ndarray | tuple[Any, list[dict[str, Any]]] | _MasksOnly | None = None,
         *,
         max_objects: int | None = None,
     ) -> _ClearPrompts:
@@ -160,15 +910,90 @@ class SamPrompter(gr.HTML):
         """
         return _ClearPrompts(value, max_objects=max_objects)
 
+    @staticmethod
+    def masks_only(masks: list[dict[str, Any]]) -> _MasksOnly:
+        """Return a value that updates the masks without re-sending the image.
+
+        The frontend keeps the bitmap it is already displaying, and
+        ``postprocess`` skips loading and encoding the image entirely.
+        ``masks`` uses the same format as the ``masks_list`` of an
+        ``(image, masks_list)`` tuple.
+
+        Example usage::
+
+            def segment(data):
+                masks = run_model(data["imagePath"], data["prompts"])
+                return SamPrompter.masks_only([{"mask": m} for m in masks])
+        """
+        return _MasksOnly(masks)
+
+    @staticmethod
+    def partial(masks: Mapping[int, dict[str, Any]]) -> _PartialMasks:
+        """Return a value that shows some masks while a generator handler keeps running.
+
+        *masks* maps object indices (positions in ``data["prompts"]``) to
+        mask dicts in the ``masks_list`` format.  The frontend replaces
+        the masks of those objects and leaves the others as they are.
+        The request stays in progress: the canvas stays locked (in the
+        default ``request_mode``) until the handler yields or returns a
+        value that is not partial, which must follow the partial ones.
+
+        Example usage::
+
+            def segment(data):
+                masks = []
+                for i, obj in enumerate(data["prompts"]):
+                    masks.append({"mask": run_model(data["imagePath"], obj)})
+                    yield SamPrompter.partial({i: masks[-1]})
+                yield SamPrompter.masks_only(masks)
+        """
+        return _PartialMasks(masks)
+
+    @staticmethod
+    def delta(value: Any, data: dict[str, Any] | PromptBatch | None) -> _DeltaMasks:  # noqa: ANN401 - any postprocess value
+        """Return *value* with only the masks the frontend does not have yet.
+
+        Every mask sent to the frontend carries a content hash, and the
+        frontend reports the hashes of the masks it is displaying in
+        ``data["maskHashes"]``.  Masks whose hash it already knows are
+        neither encoded nor sent; the frontend keeps its decoded copy.
+        *data* is the dict (or :class:`PromptBatch`) the event handler
+        received.
+
+        Example usage::
+
+            def segment(data):
+                masks = run_model(data["imagePath"], data["prompts"])
+                return SamPrompter.delta(SamPrompter.masks_only([{"mask": m} for m in masks]), data)
+        """
+        if isinstance(data, PromptBatch):
+            data = data.data
+        known = (data or {}).get("maskHashes") or []
+        return _DeltaMasks(value, frozenset(h for h in known if isinstance(h, str)))
+
     def postprocess(
         self,
-        value: str | Path | Image.Image | np.ndarray | tuple[Any, list[dict[str, Any]]] | _ClearPrompts | None,
+        value: str
+        | Path
+        | Image.Image
+        | np.ndarray
+        | tuple[Any, list[dict[str, Any]]]
+        | _ClearPrompts
+        | _MasksOnly
+        | _PartialMasks
+        | _DeltaMasks
+        | None,
     ) -> str | None:
         clear_prompts = False
         max_objects_override: int | None = None
-        if isinstance(value, _ClearPrompts):
-            clear_prompts = True
-            max_objects_override = value.max_objects
+        known_hashes: frozenset[str] = frozenset()
+        # Wrappers may be nested in either order.
+        while isinstance(value, (_ClearPrompts, _DeltaMasks)):
+            if isinstance(value, _DeltaMasks):
+                known_hashes = value.known_hashes
+            else:
+                clear_prompts = True
+                max_objects_override = value.max_objects
             value = value.value
 
         if value is None:
@@ -176,51 +1001,134 @@ class SamPrompter(gr.HTML):
                 result: dict[str, Any] = {"clearPrompts": True}
                 if max_objects_override is not None:
                     result["maxObjects"] = max_objects_override
-                return json.dumps(result)
+                return _json_dumps(result)
             return None
 
+        payload = self._value_payload(value, known_hashes)
+        if clear_prompts:
+            payload["clearPrompts"] = True
+        if max_objects_override is not None:
+            payload["maxObjects"] = max_objects_override
+        return _json_dumps(payload)
+
+    def _build_payload(
+        self,
+        image_source: str | Path | Image.Image | np.ndarray | None,
+        masks_list: list[dict[str, Any]],
+        known_hashes: frozenset[str],
+    ) -> dict[str, Any]:
+        if image_source is None:
+            return {"masks": self._encode_masks(masks_list, known_hashes)}
+        if not masks_list or not self.encode_workers:
+            payload = self._image_payload(image_source)
+            payload["masks"] = self._encode_masks(masks_list, known_hashes, (payload["height"], payload["width"]))
+            return payload
+        # Encode the image on the shared pool while this thread encodes the
+        # masks; image encoding and the NumPy work both release the GIL.
+        image_job = _encode_pool(self.encode_workers).submit(self._image_payload, image_source)
+        width, height = _image_size(image_source)
+        masks = self._encode_masks(masks_list, known_hashes, (height, width))
+        payload = image_job.result()
+        payload["masks"] = masks
+        return payload
+
+    def _value_payload(
+        self,
+        value: str | Path | Image.Image | np.ndarray | tuple[Any, list[dict[str, Any]]] | _MasksOnly | _PartialMasks,
+        known_hashes: frozenset[str],
+    ) -> dict[str, Any]:
+        if isinstance(value, _PartialMasks):
+            return self._partial_payload(value.masks, known_hashes)
+        if isinstance(value, _MasksOnly):
+            return self._build_payload(None, value.masks, known_hashes)
         if isinstance(value, tuple):
             image_source, masks_list = value
-        else:
-            image_source, masks_list = value, []
-        img = _load_image(image_source)
-        image_url = _save_image_to_cache(img, self.GRADIO_CACHE)
+            return self._build_payload(image_source, masks_list, known_hashes)
+        return self._build_payload(value, [], known_hashes)
 
-        encoded_masks = []
+    def _partial_payload(self, masks: Mapping[int, dict[str, Any]], known_hashes: frozenset[str]) -> dict[str, Any]:
+        indices = sorted(masks)
+        # Default colors follow the object index, as in a full masks list.
+        masks_list = [{"color": _hex_to_rgb(_COLOR_PALETTE[i % len(_COLOR_PALETTE)]), **masks[i]} for i in indices]
+        return {"masks": self._encode_masks(masks_list, known_hashes), "objectIndices": indices, "partial": True}
+
+    def _image_payload(self, image_source: str | Path | Image.Image | np.ndarray) -> dict[str, Any]:
+        cached = _cache_display_image(
+            image_source, self.GRADIO_CACHE, self.image_format, self.image_quality, self.max_display_side
+        )
+        payload = {"image": cached.url, "imageId": cached.image_id, "width": cached.width, "height": cached.height}
+        if cached.full_path is not None:
+            payload["imagePath"] = str(cached.full_path)
+        return payload
+
+    def _encode_masks(
+        self,
+        masks_list: list[dict[str, Any]],
+        known_hashes: frozenset[str] = frozenset(),
+        image_size: tuple[int, int] | None = None,
+    ) -> list[dict[str, Any]]:
+        binary = [i for i, mask_info in enumerate(masks_list) if "logits" not in mask_info]
+        entries: list[dict[str, Any]] = [{} for _ in masks_list]
+        binary_entries = _encode_mask_entries(
+            [masks_list[i]["mask"] for i in binary],
+            self.max_display_side,
+            self.mask_encoding,
+            crop=self.crop_masks,
+            known_hashes=known_hashes,
+        )
+        for i, entry in zip(binary, binary_entries, strict=True):
+            entries[i] = entry
         for i, mask_info in enumerate(masks_list):
-            mask_array = mask_info["mask"]
-            if isinstance(mask_array, Image.Image):
-                mask_array = np.array(mask_array)
-            binary = (mask_array > 0).astype(np.uint8)
+            if "logits" not in mask_info:
+                continue
+            size = mask_info.get("size") or image_size
+            if size is None:
+                msg = "masks given as 'logits' need a 'size' (H, W) when no image is sent"
+                raise ValueError(msg)
+            height, width = size
+            entries[i] = _encode_logits(
+                mask_info["logits"],
+                _display_size(width, height, self.max_display_side)[::-1],
+                padded=mask_info.get("padded", False),
+                known_hashes=known_hashes,
+            )
+        encoded_masks = []
+        for i, (mask_info, entry) in enumerate(zip(masks_list, entries, strict=True)):
             color = mask_info.get("color") or _hex_to_rgb(_COLOR_PALETTE[i % len(_COLOR_PALETTE)])
             alpha = mask_info.get("alpha", self.mask_alpha)
             encoded_masks.append(
                 {
-                    "rle": _encode_mask_to_rle(binary),
+                    **entry,
                     "color": color,
                     "alpha": alpha,
                 }
             )
+        return encoded_masks
 
-        payload = {
-            "image": image_url,
-            "width": img.width,
-            "height": img.height,
-            "masks": encoded_masks,
-        }
-        if clear_prompts:
-            payload["clearPrompts"] = True
-        if max_objects_override is not None:
-            payload["maxObjects"] = max_objects_override
-        return json.dumps(payload)
-
-    def preprocess(self, payload: Any) -> dict[str, Any] | None:  # noqa: ANN401 - Gradio override
+    def preprocess(self, payload: Any) -> dict[str, Any] | PromptBatch | None:  # noqa: ANN401 - Gradio override
         """Parse the raw JSON string from the frontend into a dict.
 
         Delegates to :func:`parse_prompt_value` so that event handlers
-        receive a ready-to-use ``dict | None`` instead of a raw string.
+        receive a ready-to-use ``dict | None`` instead of a raw string,
+        or a :class:`PromptBatch` when the component was created with
+        ``as_arrays=True``.  With ``decode_images=True`` the dict also
+        carries the uploaded image as ``decodedImage``, a
+        :class:`DecodedImage` from the process-wide decode cache.  The
+        browser-sent ``imagePath`` is only decoded if it is a file inside
+        the Gradio cache; a path that is outside it, gone (e.g. removed by
+        ``delete_cache``) or not a readable image leaves ``decodedImage``
+        out, and the handler decides what to do.
         """
-        return parse_prompt_value(payload)
+        data = parse_prompt_value(payload)
+        if data is None:
+            return None
+        image_path = data.get("imagePath")
+        if self.decode_images and isinstance(image_path, str) and self._cached_file(image_path) is not None:
+            with contextlib.suppress(OSError):
+                data["decodedImage"] = decode_image(image_path)
+        if self.as_arrays:
+            return PromptBatch.from_dict(data)
+        return data
 
     def process_example(self, value: Any) -> str | None:  # noqa: ANN401 - Gradio override
         """Return an HTML ``<img>`` tag for the ``gr.Examples`` gallery.
@@ -231,11 +1139,12 @@ class SamPrompter(gr.HTML):
         payload — resulting in raw JSON text in the gallery.  This override
         produces a proper thumbnail instead.
         """
-        if value is None:
+        if value is None or isinstance(value, _MasksOnly):
             return None
         image_source = value[0] if isinstance(value, tuple) else value
-        img = _load_image(image_source)
-        url = _save_image_to_cache(img, self.GRADIO_CACHE)
+        url = _cache_display_image(
+            image_source, self.GRADIO_CACHE, self.image_format, self.image_quality, self.max_display_side
+        ).url
         safe_url = html.escape(url, quote=True)
         return f'<img src="{safe_url}" alt="example" style="max-width:100%;max-height:5rem;object-fit:contain;display:block;border-radius:4px;">'
 
@@ -244,24 +1153,45 @@ class SamPrompter(gr.HTML):
             "type": "object",
             "description": (
                 "JSON string with SAM prompter data. "
-                "Input from JS: {imagePath?: string, imageSize?: {width, height}, "
-                "prompts: [{points: [[x,y],...], labels: [1,0,...], boxes: [[x1,y1,x2,y2],...]},...]}. "
+                "Input from JS: {imagePath?: string, imageSize?: {width, height}, imageHash?: string, imageId?: string, "
+                "uploadScale?: float, originalSize?: {width, height}, "
+                "maskHashes?: [string,...], seq?: int, "
+                "prompts: [{id: string, rev: int, points: [[x,y],...], labels: [1,0,...], boxes: [[x1,y1,x2,y2],...]},...]}. "
                 "Output from Python: a plain image (str path, PIL Image, or ndarray) "
                 "or a tuple (image, masks_list) where masks_list is "
-                "[{rle: {counts: [int,...], size: [H,W]}, color: [R,G,B], alpha: float},...]. "
-                "Serialized as {image: string, width: int, height: int, masks: [...], colors: [...]}"
+                "[{rle: {counts: [int,...], size: [H,W]}, color: [R,G,B], alpha: float},...]; "
+                "with mask_encoding='coco' counts is a pycocotools compressed string; "
+                "with mask_encoding='bitmap'/'auto' a mask may instead carry "
+                "bitmap: {data: base64 zlib packbits (column-major), size: [H,W]}; "
+                "with crop_masks=True each mask is cropped to bbox: [x,y,w,h] within frame: [H,W]. "
+                "Masks given as {logits: ndarray, size?: (H,W), padded?: bool} are sent as "
+                "logits: {data: base64 zlib uint8 sigmoid grid (row-major), size: [h,w]} with frame: [H,W]. "
+                "Every mask carries a content hash; masks sent through SamPrompter.delta() "
+                "that the frontend already has (maskHashes in the input) carry only the hash. "
+                "Serialized as {image: string, imageId: string, width: int, height: int, imagePath?: string, "
+                "masks: [...]}, where imagePath is the full-resolution file behind a downscaled display image; "
+                "masks-only updates omit image, imageId, width and height. "
+                "SamPrompter.partial() yields {masks: [...], objectIndices: [int,...], partial: true}, "
+                "replacing only the masks of the listed objects while the request is still running."
             ),
         }
 
 
-def parse_prompt_value(value: str | None) -> dict[str, Any] | None:
+def parse_prompt_value(value: str | None, *, as_arrays: bool = False) -> dict[str, Any] | PromptBatch | None:
     """Parse the JSON string emitted by SamPrompter into a dict.
 
     Returns a dict with keys: ``prompts`` (always present),
     ``imagePath`` and ``imageSize`` (present when the user uploaded
-    an image directly into the component).  Returns ``None`` when
-    *value* is empty, unparseable, or missing the ``prompts`` key
-    (e.g. a round-trip echo of the postprocessed output).
+    an image directly into the component), and ``imageHash`` (the
+    SHA-256 hex digest of the uploaded file, where the browser offers
+    Web Crypto).  When ``max_upload_side`` made the browser upload a
+    downscaled copy, ``imagePath``, ``imageSize`` and the prompts refer
+    to that copy, and ``uploadScale`` (uploaded / original width) and
+    ``originalSize`` describe the file the user dropped.  ``seq``
+    numbers the prompt requests of one page in the order they were sent.
+    Returns ``None`` when *value* is empty, unparseable, or missing the
+    ``prompts`` key (e.g. a round-trip echo of the postprocessed output).
+    With *as_arrays*, the dict is wrapped in a :class:`PromptBatch`.
 
     .. note::
 
@@ -272,14 +1202,40 @@ def parse_prompt_value(value: str | None) -> dict[str, Any] | None:
     if not value:
         return None
     try:
-        data = json.loads(value)
+        data = _json_loads(value)
     except (json.JSONDecodeError, TypeError):
         return None
     if not isinstance(data, dict) or "prompts" not in data:
         return None
+    if as_arrays:
+        return PromptBatch.from_dict(data)
     return data
 
 
+def _json_default(obj: object) -> Any:  # noqa: ANN401 - JSON-compatible value
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    msg = f"Object of type {type(obj).__name__} is not JSON serializable"
+    raise TypeError(msg)
+
+
+def _json_dumps(obj: object) -> str:
+    """Serialize *obj* to compact JSON, writing NumPy arrays natively.
+
+    orjson is used when installed; otherwise the stdlib is called with the
+    same separators and ``ensure_ascii=False`` so both backends produce
+    the same text (see ``benchmarks/bench_json.py``).
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_json_default)
+
+
+def _json_loads(value: str) -> Any:  # noqa: ANN401 - any JSON value
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError.
+    return orjson.loads(value) if orjson is not None else json.loads(value)
+
+
 def _hex_to_rgb(hex_color: str) -> list[int]:
     h = hex_color.lstrip("#")
     return [int(h[i : i + 2], 16) for i in (0, 2, 4)]
@@ -0,0 +1,760 @@
+"""Process-wide caches for data that event handlers recompute on every click."""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from PIL import Image
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Sequence
+
+
+class DecodedImage:
+    """An image file decoded to RGB, shared by every handler that asks for it.
+
+    ``array`` is a read-only ``(H, W, 3)`` uint8 ndarray.  ``image`` is a
+    PIL copy of the same pixels, created on first access and then kept
+    alongside ``array`` (PIL stores RGB with 4 bytes per pixel, so the
+    entry grows from 3 to 7 bytes per pixel).  The same PIL object is
+    handed to every caller and PIL cannot mark it read-only: never draw
+    on it or change it in place (``image.copy()`` first).
+    """
+
+    __slots__ = ("_digest", "_image", "_lock", "array", "path")
+
+    def __init__(self, path: str, array: np.ndarray) -> None:
+        array.flags.writeable = False
+        self.path = path
+        self.array = array
+        self._image: Image.Image | None = None
+        self._digest: str | None = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"DecodedImage(path={self.path!r}, size={self.size})"
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """``(width, height)`` in pixels."""
+        return self.array.shape[1], self.array.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by ``array`` plus ``image`` once it has been created."""
+        if self._image is None:
+            return self.array.nbytes
+        width, height = self.size
+        return self.array.nbytes + 4 * width * height
+
+    @property
+    def image(self) -> Image.Image:
+        with self._lock:
+            if self._image is None:
+                self._image = Image.fromarray(self.array)
+            return self._image
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the decoded pixels, computed once; a key for per-image caches."""
+        with self._lock:
+            if self._digest is None:
+                digest = hashlib.sha256(f"RGB:{self.size}".encode(), usedforsecurity=False)
+                digest.update(np.ascontiguousarray(self.array))
+                self._digest = digest.hexdigest()
+            return self._digest
+
+
+class DecodedImageCache:
+    """Thread-safe LRU of decoded images keyed by path, mtime and file size.
+
+    A file that is replaced in place gets a new key, so stale pixels are
+    never returned.  Two threads missing on the same file may both decode
+    it; the second result simply replaces the first.
+
+    Entries are evicted least-recently-used first once there are more than
+    *maxsize* of them or their :attr:`DecodedImage.nbytes` add up to more
+    than *max_bytes*.  The most recently used image is always kept, however
+    large.
+
+    Args:
+        maxsize: Maximum number of decoded images kept in memory.
+        max_bytes: Memory budget for all decoded images together.
+    """
+
+    def __init__(self, maxsize: int = 8, max_bytes: int = 512 * 1024**2) -> None:
+        if maxsize < 1:
+            msg = f"maxsize must be a positive integer; got {maxsize!r}"
+            raise ValueError(msg)
+        if max_bytes < 1:
+            msg = f"max_bytes must be a positive integer; got {max_bytes!r}"
+            raise ValueError(msg)
+        self._maxsize = maxsize
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, int, int], DecodedImage] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """Total memory held by the cached images."""
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def get(self, path: str | Path) -> DecodedImage:
+        """Return the decoded image at *path*, decoding it on a miss.
+
+        Raises:
+            OSError: If the file cannot be read or decoded.
+        """
+        path = os.fspath(path)
+        stat = os.stat(path)  # noqa: PTH116 - path may be a plain str
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._evict()
+                return entry
+
+        with Image.open(path) as img:
+            rgb = img if img.mode == "RGB" else img.convert("RGB")
+            entry = DecodedImage(path, np.asarray(rgb))
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self) -> None:
+        # Sizes are summed on every call: an entry grows when its ``image``
+        # is first created, long after it was stored.
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while total > self._max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.nbytes
+
+
+_decoded_images = DecodedImageCache()
+
+
+def decode_image(path: str | Path) -> DecodedImage:
+    """Decode the image at *path* to RGB through a process-wide cache.
+
+    Handlers receive the same ``imagePath`` on every click of a session;
+    only the first call decodes the file.
+
+    Example usage::
+
+        def segment(data):
+            decoded = decode_image(data["imagePath"])
+            masks = run_model(decoded.image, data["prompts"])
+            return SamPrompter.masks_only([{"mask": m} for m in masks])
+    """
+    return _decoded_images.get(path)
+
+
+def _nbytes(value: object) -> int:
+    """Approximate memory footprint of NumPy arrays, tensors and containers of them."""
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _Pending:
+    """A computation in progress; other callers for the same key wait on it."""
+
+    __slots__ = ("done", "error", "value")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+
+
+class EmbeddingCache[T]:
+    """Thread-safe LRU for per-image results such as SAM image embeddings.
+
+    Entries are evicted least-recently-used first once their total size
+    exceeds *max_bytes* (sizes are read from ``nbytes`` of arrays and
+    tensors, including inside lists, tuples and dicts).  A value larger
+    than the whole budget is returned but not kept.
+
+    Computation is single-flight: when several requests miss on the same
+    key at once, one of them runs *compute* and the others wait for its
+    result (or its exception) instead of repeating the work.
+
+    Args:
+        max_bytes: Memory budget for all cached values.
+    """
+
+    def __init__(self, max_bytes: int = 2 * 1024**3) -> None:
+        if max_bytes < 1:
+            msg = f"max_bytes must be a positive integer; got {max_bytes!r}"
+            raise ValueError(msg)
+        self._max_bytes = max_bytes
+        self._nbytes = 0
+        self._entries: OrderedDict[str, tuple[T, int]] = OrderedDict()
+        self._pending: dict[str, _Pending] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the cached values."""
+        with self._lock:
+            return self._nbytes
+
+    def get(self, key: str) -> T | None:
+        with self._lock:
+            return self._lookup(key)
+
+    def put(self, key: str, value: T) -> None:
+        size = _nbytes(value)
+        with self._lock:
+            self._store(key, value, size)
+
+    def get_or_compute(self, key: str, compute: Callable[[], T]) -> T:
+        """Return the value cached under *key*, running *compute* on a miss.
+
+        Example usage::
+
+            embeddings = EmbeddingCache(max_bytes=4 * 1024**3)
+
+
+            def segment(data):
+                decoded = decode_image(data["imagePath"])
+                image_embeddings = embeddings.get_or_compute(decoded.digest, lambda: embed(decoded.image))
+                ...
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = _Pending()
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            value = compute()
+        except BaseException as e:
+            pending.error = e
+            raise
+        else:
+            pending.value = value
+            size = _nbytes(value)
+            with self._lock:
+                self._store(key, value, size)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def _lookup(self, key: str) -> T | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _store(self, key: str, value: T, size: int) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._nbytes -= old[1]
+        if size > self._max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self._nbytes += size
+        while self._nbytes > self._max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._nbytes -= evicted
+
+
+_STORE_KEY = re.compile(r"[0-9A-Za-z_-][0-9A-Za-z_.-]*")
+
+
+class EmbeddingStore:
+    """Disk-backed store of per-image arrays, shared across processes and restarts.
+
+    Each value is an ndarray or a sequence of ndarrays (e.g. multi-level
+    image features), written as ``.npy`` files under *root*: ``<key>.npy``
+    for a single array, ``<key>/<i>.npy`` for a sequence.  Writes go to a
+    temporary name and are renamed into place, so readers never see a
+    partial entry and need no locks; reads are memory-mapped.
+
+    Reading an entry refreshes its mtime, and once the store grows past
+    *max_bytes* the entries with the oldest mtime are deleted.  Several
+    worker processes can share one *root*.  Keys must be unique per model
+    (use a separate *root* per model), e.g. :attr:`DecodedImage.digest`.
+
+    Args:
+        root: Directory holding the entries; created if missing.
+        max_bytes: Size cap for all entries together.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int = 10 * 1024**3) -> None:
+        if max_bytes < 1:
+            msg = f"max_bytes must be a positive integer; got {max_bytes!r}"
+            raise ValueError(msg)
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._max_bytes = max_bytes
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        """Return the single-array file and the sequence directory for *key*."""
+        if not _STORE_KEY.fullmatch(key):
+            msg = f"invalid embedding store key: {key!r}"
+            raise ValueError(msg)
+        return self.root / f"{key}.npy", self.root / key
+
+    def __contains__(self, key: str) -> bool:
+        file, directory = self._paths(key)
+        return file.exists() or directory.is_dir()
+
+    def get(self, key: str) -> np.ndarray | list[np.ndarray] | None:
+        """Return the memory-mapped (read-only) value for *key*, or ``None``."""
+        file, directory = self._paths(key)
+        try:
+            if file.exists():
+                value: np.ndarray | list[np.ndarray] = np.load(file, mmap_mode="r")
+                os.utime(file)
+                return value
+            count = len(list(directory.glob("*.npy")))
+            value = [np.load(directory / f"{i}.npy", mmap_mode="r") for i in range(count)]
+            if not value:
+                return None
+            os.utime(directory)
+        except FileNotFoundError:
+            # Evicted by another process between the checks.
+            return None
+        return value
+
+    def put(self, key: str, value: np.ndarray | Sequence[np.ndarray]) -> None:
+        """Write *value* under *key* (a no-op if another writer got there first)."""
+        file, directory = self._paths(key)
+        if file.exists() or directory.is_dir():
+            return
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+        try:
+            if isinstance(value, np.ndarray):
+                np.save(tmp / "0.npy", value)
+                try:
+                    # Unlike a rename, a hard link never replaces an existing entry.
+                    os.link(tmp / "0.npy", file)
+                except FileExistsError:
+                    return  # already stored
+                except OSError:
+                    # No hard links on this filesystem; equal keys hold equal values anyway.
+                    (tmp / "0.npy").replace(file)
+            else:
+                for i, array in enumerate(value):
+                    np.save(tmp / f"{i}.npy", np.asarray(array))
+                try:
+                    tmp.rename(directory)
+                except OSError:
+                    return  # already stored
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict()
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the stored entries on disk."""
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.iterdir():
+            if path.name.startswith(".tmp-"):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in path.iterdir()) if path.is_dir() else path.stat().st_size
+                entries.append((path.stat().st_mtime, size, path))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda e: e[0])
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self._max_bytes:
+                break
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+            total -= size
+
+
+_SHA256_HEX = re.compile(r"[0-9a-f]{64}")
+
+
+class _UploadIndex:
+    """Thread-safe LRU mapping the SHA-256 of uploaded files to their server path.
+
+    A path is only handed out to a client that proves it holds the file's
+    bytes: :meth:`challenge` issues a random single-use salt and
+    :meth:`claim` checks the SHA-256 of salt + file content against the
+    stored file.  Knowing the plain hash (e.g. from a public dataset
+    listing) is therefore not enough to learn where another user's upload
+    lives.  Salts are issued for every well-formed hash, hit or miss, so
+    the challenge does not reveal whether a file was uploaded.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self._maxsize = maxsize
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._challenges: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, digest: str) -> str | None:
+        with self._lock:
+            path = self._entries.get(digest)
+            if path is None:
+                return None
+            self._entries.move_to_end(digest)
+        if not os.path.isfile(path):  # noqa: PTH113 - path is a plain str
+            # Deleted by Gradio's cache cleanup.
+            with self._lock:
+                if self._entries.get(digest) == path:
+                    del self._entries[digest]
+            return None
+        return path
+
+    def register(self, digest: str, path: str) -> None:
+        with self._lock:
+            self._entries[digest] = path
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def challenge(self, digest: str) -> str:
+        """Return a fresh salt (hex) that :meth:`claim` accepts once for *digest*."""
+        salt = secrets.token_hex(16)
+        with self._lock:
+            self._challenges[salt] = digest
+            while len(self._challenges) > self._maxsize:
+                self._challenges.popitem(last=False)
+        return salt
+
+    def claim(self, digest: str, salt: str, proof: str) -> str | None:
+        """Return the path for *digest* if *proof* is the SHA-256 of *salt* + the file's bytes."""
+        with self._lock:
+            if self._challenges.pop(salt, None) != digest:
+                return None
+        path = self.lookup(digest)
+        if path is None:
+            return None
+        try:
+            expected = _file_sha256(path, salt=bytes.fromhex(salt))
+        except OSError:
+            return None
+        return path if hmac.compare_digest(expected, proof) else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._challenges.clear()
+
+
+_upload_index = _UploadIndex()
+
+
+def _file_sha256(path: str | Path, salt: bytes = b"") -> str:
+    with open(path, "rb") as f:  # noqa: PTH123 - path may be a plain str
+        return hashlib.file_digest(f, lambda: hashlib.sha256(salt)).hexdigest()
+
+
+_MISSING = object()
+
+
+def _image_key(data: dict[str, Any]) -> str | None:
+    """Identity of the image a prompt dict refers to (hash when known, else path)."""
+    return data.get("imageHash") or data.get("imageId") or data.get("imagePath")
+
+
+def _pixel_key(data: dict[str, Any]) -> str | None:
+    """Server-computed :attr:`DecodedImage.digest` of the payload's image, if it can be decoded.
+
+    Unlike ``imageHash`` and ``imageId``, which the browser sends and the
+    server never checks, this cannot be chosen by the client, so it is
+    safe as a key for caches shared between users.
+    """
+    decoded = data.get("decodedImage")
+    if decoded is None and data.get("imagePath"):
+        try:
+            decoded = decode_image(data["imagePath"])
+        except OSError:
+            return None
+    return None if decoded is None else decoded.digest
+
+
+class ObjectMaskCache[T]:
+    """Remembers the last result of every object, so only changed objects are re-inferred.
+
+    The frontend gives each object a random ``id`` and a ``rev`` that it
+    bumps whenever the object's points or boxes change.  The cache keeps
+    one result per (image, object id) together with the revision it was
+    computed for.  Because ids are random per page load, this key is
+    already unique per browser session.
+
+    Args:
+        maxsize: Maximum number of objects remembered across all sessions.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        if maxsize < 1:
+            msg = f"maxsize must be a positive integer; got {maxsize!r}"
+            raise ValueError(msg)
+        self._maxsize = maxsize
+        self._entries: OrderedDict[tuple[str, str], tuple[int, T]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def resolve(self, data: dict[str, Any], compute: Callable[[dict[str, Any]], T]) -> list[T]:
+        """Return one result per object in ``data["prompts"]``.
+
+        *compute* runs only for objects that are new or whose ``rev``
+        changed since their last result; the others reuse it.  Objects
+        without ``id`` / ``rev`` (or data without an image) are always
+        computed.
+
+        Example usage::
+
+            object_masks = ObjectMaskCache()
+
+
+            def segment(data):
+                masks = object_masks.resolve(data, lambda obj: run_model(data["imagePath"], obj))
+                return SamPrompter.masks_only([{"mask": m} for m in masks if m is not None])
+        """
+        return list(self.iter_resolve(data, compute))
+
+    def iter_resolve(self, data: dict[str, Any], compute: Callable[[dict[str, Any]], T]) -> Iterator[T]:
+        """Like :meth:`resolve`, but yield each result as soon as it is available.
+
+        Lets a generator handler stream masks object by object with
+        :meth:`SamPrompter.partial`.
+        """
+        image = _image_key(data)
+        for obj in data.get("prompts") or []:
+            obj_id, rev = obj.get("id"), obj.get("rev")
+            if image is None or not isinstance(obj_id, str) or not isinstance(rev, int):
+                yield compute(obj)
+                continue
+            key = (image, obj_id)
+            with self._lock:
+                entry = self._entries.get(key)
+                value = entry[1] if entry is not None and entry[0] == rev else _MISSING
+                if value is not _MISSING:
+                    self._entries.move_to_end(key)
+            if value is _MISSING:
+                value = compute(obj)
+                with self._lock:
+                    self._entries[key] = (rev, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self._maxsize:
+                        self._entries.popitem(last=False)
+            yield value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def prompt_key(obj: dict[str, Any]) -> str:
+    """Canonical SHA-256 (hex) of one object's ``points``, ``labels`` and ``boxes``.
+
+    ``id`` and ``rev`` are ignored, so the same prompts give the same key
+    across objects, sessions and users.  Points without a label count as
+    foreground, as in the frontend.
+    """
+    points = [[float(x), float(y)] for x, y in obj.get("points") or []]
+    labels = [int(label) for label in obj.get("labels") or []][: len(points)]
+    labels += [1] * (len(points) - len(labels))
+    boxes = [[float(v) for v in box] for box in obj.get("boxes") or []]
+    canonical = json.dumps([points, labels, boxes], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CacheStats:
+    """Snapshot of a :class:`ResultCache`'s counters."""
+
+    __slots__ = ("entries", "hits", "misses", "nbytes")
+
+    def __init__(self, hits: int, misses: int, entries: int, nbytes: int) -> None:
+        self.hits = hits
+        self.misses = misses
+        self.entries = entries
+        self.nbytes = nbytes
+
+    def __repr__(self) -> str:
+        return (
+            f"CacheStats(hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate:.1%}, "
+            f"entries={self.entries}, nbytes={self.nbytes})"
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache (``0.0`` before the first lookup)."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResultCache[T]:
+    """Thread-safe LRU of per-object results keyed by image and prompts.
+
+    Where :class:`ObjectMaskCache` skips objects that did not change
+    within one session, this cache recognises *identical* prompts on the
+    same image from anywhere: an undo back to an earlier state, a repeated
+    click, or two annotators placing the same prompts on a dataset image.
+    A hit skips the mask decoder and any post-processing stored with the
+    result.
+
+    Entries are evicted least-recently-used first once their total size
+    exceeds *max_bytes*, measured like :class:`EmbeddingCache` (masks,
+    RLE dicts and tensors all count).  ``None`` results are cached too.
+
+    Args:
+        max_bytes: Memory budget for all cached results.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024**2) -> None:
+        if max_bytes < 1:
+            msg = f"max_bytes must be a positive integer; got {max_bytes!r}"
+            raise ValueError(msg)
+        self._max_bytes = max_bytes
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[T, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def stats(self) -> CacheStats:
+        """Hit / miss counters and current size."""
+        with self._lock:
+            return CacheStats(self._hits, self._misses, len(self._entries), self._nbytes)
+
+    def get_or_compute(self, image: str, obj: dict[str, Any], compute: Callable[[], T]) -> T:
+        """Return the result for *obj*'s prompts on *image*, running *compute* on a miss.
+
+        *image* is a string identifying the pixels, normally
+        :attr:`DecodedImage.digest`.  Results are shared with every user,
+        so do not pass client-supplied values such as ``imageHash``: a
+        client could pair another image's hash with its own upload and
+        plant results for that image.
+
+        Example usage::
+
+            results = ResultCache()
+
+
+            def segment(data):
+                decoded = decode_image(data["imagePath"])
+                masks = [
+                    results.get_or_compute(decoded.digest, obj, lambda obj=obj: run_decoder(decoded, obj))
+                    for obj in data["prompts"]
+                ]
+                ...
+        """
+        key = (image, prompt_key(obj))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+
+        value = compute()
+        size = _nbytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            if size <= self._max_bytes:
+                self._entries[key] = (value, size)
+                self._nbytes += size
+                while self._nbytes > self._max_bytes:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    self._nbytes -= evicted
+        return value
+
+    def resolve(self, data: dict[str, Any], compute: Callable[[dict[str, Any]], T]) -> list[T]:
+        """Return one result per object in ``data["prompts"]``, like :meth:`ObjectMaskCache.resolve`.
+
+        The image is identified by the :attr:`DecodedImage.digest` of
+        ``data["decodedImage"]`` (``decode_images=True``) or else of the
+        file at ``imagePath``; the client-sent ``imageHash`` and ``imageId``
+        are not trusted.  Without a decodable image, every object is computed.
+        """
+        image = _pixel_key(data)
+        prompts = data.get("prompts") or []
+        if image is None:
+            return [compute(obj) for obj in prompts]
+        return [self.get_or_compute(image, obj, lambda obj=obj: compute(obj)) for obj in prompts]
+
+    def clear(self) -> None:
+        """Drop all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self._hits = 0
+            self._misses = 0
@@ -0,0 +1,167 @@
+"""NumPy-backed prompt batches for feeding batched SAM decoders."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+
+LABEL_PAD_VALUE = -10
+"""Label of padding entries in :attr:`PromptBatch.labels` (SAM's "not a point")."""
+
+
+class PromptBatch:
+    """Prompts of all objects as padded NumPy arrays.
+
+    Built from the dict emitted by the frontend (see
+    :func:`sam_prompter.parse_prompt_value`).  With ``N`` objects, at most
+    ``P`` points and at most ``B`` boxes per object:
+
+    * ``points`` — ``(N, P, 2)`` float32 ``[x, y]`` pixel coordinates
+    * ``labels`` — ``(N, P)`` int64; ``1`` foreground, ``0`` background,
+      :data:`LABEL_PAD_VALUE` for padding
+    * ``boxes`` — ``(N, B, 4)`` float32 ``[x1, y1, x2, y2]``
+    * ``point_mask`` / ``box_mask`` — ``(N, P)`` / ``(N, B)`` bool, ``True``
+      where an entry is a real prompt
+
+    Padded coordinates are ``0``.  ``data`` is the parsed dict itself, for
+    ``imagePath``, ``imageSize`` and the other metadata.
+    """
+
+    __slots__ = ("box_mask", "boxes", "data", "labels", "point_mask", "points")
+
+    def __init__(
+        self,
+        points: np.ndarray,
+        labels: np.ndarray,
+        boxes: np.ndarray,
+        point_mask: np.ndarray,
+        box_mask: np.ndarray,
+        data: dict[str, Any],
+    ) -> None:
+        self.points = points
+        self.labels = labels
+        self.boxes = boxes
+        self.point_mask = point_mask
+        self.box_mask = box_mask
+        self.data = data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> PromptBatch:
+        """Build a batch from a parsed prompt dict (one row per object)."""
+        prompts = data.get("prompts") or []
+        n = len(prompts)
+        num_points = max((len(obj.get("points", [])) for obj in prompts), default=0)
+        num_boxes = max((len(obj.get("boxes", [])) for obj in prompts), default=0)
+
+        points = np.zeros((n, num_points, 2), dtype=np.float32)
+        labels = np.full((n, num_points), LABEL_PAD_VALUE, dtype=np.int64)
+        boxes = np.zeros((n, num_boxes, 4), dtype=np.float32)
+        point_mask = np.zeros((n, num_points), dtype=bool)
+        box_mask = np.zeros((n, num_boxes), dtype=bool)
+        for i, obj in enumerate(prompts):
+            obj_points = obj.get("points", [])
+            if obj_points:
+                k = len(obj_points)
+                points[i, :k] = obj_points
+                obj_labels = list(obj.get("labels", []))[:k]
+                # Points without a label are foreground, as in the frontend.
+                labels[i, :k] = obj_labels + [1] * (k - len(obj_labels))
+                point_mask[i, :k] = True
+            obj_boxes = obj.get("boxes", [])
+            if obj_boxes:
+                boxes[i, : len(obj_boxes)] = obj_boxes
+                box_mask[i, : len(obj_boxes)] = True
+        return cls(points, labels, boxes, point_mask, box_mask, data)
+
+    def __len__(self) -> int:
+        return self.points.shape[0]
+
+    def __repr__(self) -> str:
+        return (
+            f"PromptBatch(objects={len(self)}, points={self.points.shape[1]}, boxes={self.boxes.shape[1]}, "
+            f"image_path={self.image_path!r})"
+        )
+
+    @property
+    def image_path(self) -> str | None:
+        """Server path of the image the prompts refer to, if known."""
+        return self.data.get("imagePath")
+
+    @property
+    def image_hash(self) -> str | None:
+        """SHA-256 (hex) of the uploaded file, computed by the browser, if known.
+
+        The server does not verify it; key caches shared between users on
+        :attr:`DecodedImage.digest` instead.
+        """
+        return self.data.get("imageHash")
+
+    @property
+    def image_size(self) -> tuple[int, int] | None:
+        """``(width, height)`` of the image, if the frontend reported it."""
+        size = self.data.get("imageSize")
+        if not size:
+            return None
+        return int(size["width"]), int(size["height"])
+
+    @property
+    def object_ids(self) -> list[str | None]:
+        """Stable per-object ids from the frontend (``None`` for objects without one)."""
+        return [obj.get("id") for obj in self.data.get("prompts") or []]
+
+    @property
+    def revisions(self) -> np.ndarray:
+        """``(N,)`` int64 per-object revision, bumped on every prompt change (``-1`` if unknown)."""
+        return np.array([obj.get("rev", -1) for obj in self.data.get("prompts") or []], dtype=np.int64)
+
+    @property
+    def upload_scale(self) -> float:
+        """Uploaded / original width; below 1 when ``max_upload_side`` shrank the upload.
+
+        Divide coordinates by it to map them back to the file the user dropped.
+        """
+        return float(self.data.get("uploadScale", 1.0))
+
+    @property
+    def decoded_image(self) -> Any:  # noqa: ANN401 - DecodedImage, kept untyped to avoid a cycle
+        """The ``decodedImage`` attached by ``decode_images=True``, if any."""
+        return self.data.get("decodedImage")
+
+    @property
+    def has_prompts(self) -> np.ndarray:
+        """``(N,)`` bool, ``True`` for objects with at least one point or box."""
+        return self.point_mask.any(axis=1) | self.box_mask.any(axis=1)
+
+    def resize_longest_side(self, target_length: int, image_size: tuple[int, int] | None = None) -> PromptBatch:
+        """Return a copy with coordinates scaled to a model's input resolution.
+
+        Uses the same transform as SAM's ``ResizeLongestSide``: the image is
+        resized so that its longer side is *target_length* (e.g. ``1024``),
+        with the new size rounded to whole pixels.
+
+        Args:
+            target_length: Longer side of the model input, in pixels.
+            image_size: ``(width, height)`` of the original image; defaults
+                to :attr:`image_size`.
+
+        Raises:
+            ValueError: If the image size is unknown.
+        """
+        size = image_size or self.image_size
+        if size is None:
+            msg = "image_size is required when the prompt data has no imageSize"
+            raise ValueError(msg)
+        width, height = size
+        scale = target_length / max(width, height)
+        new_width, new_height = int(width * scale + 0.5), int(height * scale + 0.5)
+        factors = np.array([new_width / width, new_height / height], dtype=np.float32)
+        # Padded entries are 0 and stay 0 under scaling.
+        return PromptBatch(
+            self.points * factors,
+            self.labels.copy(),
+            self.boxes * np.tile(factors, 2),
+            self.point_mask.copy(),
+            self.box_mask.copy(),
+            self.data,
+        )
@@ -18,6 +18,7 @@
     var dropZone = container.querySelector(".drop-zone");
     var fileInput = container.querySelector(".file-input");
     var clearImageBtn = container.querySelector(".clear-image-btn");
+    var runBtn = container.querySelector(".run-btn");
     var settingsBar = container.querySelector(".settings-bar");
     var settingsBtn = container.querySelector(".settings-btn");
     var objColorSwatches = container.querySelector(".obj-color-swatches");
@@ -54,6 +55,14 @@
     var maxObjects = props.max_objects;
     var pointRadius = props.point_radius;
     var maskAlpha = props.mask_alpha;
+    var dedupeUploads = !!props.dedupe_uploads;
+    var maxUploadSide = props.max_upload_side || 0;
+    var maskMemoSize = props.mask_memo || 0;
+    // "lock": one request at a time, canvas locked meanwhile.
+    // "pipelined": edits stay possible; the latest state is sent when the
+    // in-flight response arrives.  "manual": sent only on Run / Enter.
+    var requestMode = props.request_mode || "lock";
+    var debounceMs = props.debounce_ms || 0;
     var boxLineWidth = 2;
 
     var _renderFrameId = null;
@@ -77,6 +86,7 @@
                 state.isProcessing = false;
                 updateCanvasCursor();
             }
+            flushQueuedSend();
         });
     }
 
@@ -91,8 +101,13 @@
     var state = {
         image: null,
         imageUrl: null,
+        imageId: null,  // content ID of a Python-provided image
+        imagePath: null,  // full-resolution file behind a downscaled Python image
         naturalWidth: 0,
         naturalHeight: 0,
+        // Canvas pixels per natural (original image) pixel; < 1 when
+        // Python sent a downscaled display image (max_display_side).
+        canvasScale: 1,
         objects: [createEmptyObject(0)],
         activeObjectIndex: 0,
         masks: [],
@@ -120,10 +135,26 @@
         showImage: true,
         settingsVisible: true,
         rawMasks: [],
+        sentPromptKeys: null,  // object id -> prompt state of the last request (mask_memo)
+        dataGeneration: 0,  // bumped on every value update; drops stale async decodes
         // Upload state
         objectUrl: null,
         filePath: null,
+        imageHash: null,  // SHA-256 (hex) of the uploaded file
+        // Uploaded / original size when max_upload_side shrank the file
+        uploadScale: 1,
+        originalWidth: 0,
+        originalHeight: 0,
+        loadGeneration: 0,  // bumped per dropped file; drops stale resizes
+        uploadAnnounced: false,  // "upload" event already fired for this file
+        hashPending: false,
         pendingEmit: false,
+        // Request pipelining (request_mode / debounce_ms)
+        requestSeq: 0,  // sequence number of the last request sent
+        editSeq: 0,  // bumped on every prompt edit
+        sentEditSeq: 0,  // editSeq of the prompts in the last request
+        sendQueued: false,  // latest prompts still need to be sent
+        unsentEdits: false,  // manual mode: edits made since the last Run
         imageSource: null,  // "upload" or "python"
         altHoverPointIndex: -1,
         altHoverBoxIndex: -1,
@@ -161,8 +192,15 @@
         return { canvas: _cutoutCanvas, ctx: _cutoutCtx };
     }
 
+    // Object IDs are random so they never collide across tabs or page
+    // reloads; the server can key per-object results on (id, rev).
+    var _objectIdPrefix = Math.random().toString(36).slice(2, 10);
+    var _nextObjectId = 0;
+
     function createEmptyObject(index) {
         return {
+            id: _objectIdPrefix + "-" + (_nextObjectId++).toString(36),
+            rev: 0,  // bumped on every change to points / boxes
             points: [],
             labels: [],
             boxes: [],
@@ -206,7 +244,7 @@
         if (index < state.rawMasks.length && state.rawMasks[index]) {
             var raw = state.rawMasks[index];
             var color = (index < state.objects.length) ? state.objects[index].color : raw.color;
-            state.maskCanvases[index] = decodeMask(raw.rle, color, 1.0);
+            state.maskCanvases[index] = decodeMask(raw, color, 1.0);
         }
     }
 
@@ -219,15 +257,17 @@
         var scaleDisplay = canvas.width / rect.width;
         var canvasX = displayX * scaleDisplay;
         var canvasY = displayY * scaleDisplay;
-        var natX = (canvasX - state.panX) / state.zoom;
-        var natY = (canvasY - state.panY) / state.zoom;
+        var k = state.zoom * state.canvasScale;
+        var natX = (canvasX - state.panX) / k;
+        var natY = (canvasY - state.panY) / k;
         return { x: natX, y: natY };
     }
 
     function naturalToCanvas(natX, natY) {
+        var k = state.zoom * state.canvasScale;
         return {
-            x: natX * state.zoom + state.panX,
-            y: natY * state.zoom + state.panY
+            x: natX * k + state.panX,
+            y: natY * k + state.panY
         };
     }
 
@@ -235,13 +275,13 @@
         return natX >= 0 && natX <= state.naturalWidth && natY >= 0 && natY <= state.naturalHeight;
     }
 
-    // Ratio of canvas internal pixels to CSS display pixels.
+    // Ratio of natural image pixels to CSS display pixels.
     // Multiplying a screen-pixel size by this factor gives the
-    // equivalent size in canvas (= natural image) coordinates.
+    // equivalent size in natural image coordinates.
     function getDisplayScale() {
         var rect = canvas.getBoundingClientRect();
         if (!rect.width) return 1;
-        return canvas.width / rect.width;
+        return canvas.width / rect.width / state.canvasScale;
     }
 
     // --- Zoom/Pan helpers ---
@@ -314,56 +354,215 @@
         }
     }
 
+    // Only "lock" mode blocks edits while a request is in flight.
+    function isLocked() {
+        return state.isProcessing && requestMode === "lock";
+    }
+
     function isMoveModeActive() {
         return state.moveMode || state.spaceHeld;
     }
 
     function updateCanvasCursor() {
-        element.classList.toggle("sp-processing", state.isProcessing);
+        element.classList.toggle("sp-processing", isLocked());
         element.classList.toggle("sp-move-mode", isMoveModeActive());
         element.classList.toggle("sp-panning", state.isPanning);
         element.classList.toggle("sp-zoom-1", state.zoom <= 1);
     }
 
-    // --- RLE mask decode ---
+    // --- Mask decode (RLE or packed bitmap) ---
+
+    function base64ToBytes(b64) {
+        var bin = atob(b64);
+        var bytes = new Uint8Array(bin.length);
+        for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+        return bytes;
+    }
+
+    // Compressed part of a mask entry (packed bitmap or logit grid), if any.
+    function compressedPart(mask) {
+        return mask.bitmap || mask.logits || null;
+    }
+
+    // Inflate the zlib-compressed bitmaps / logit grids of *masks* in place
+    // (stored as .bits) so that decodeMask can stay synchronous.
+    function inflateBitmaps(masks) {
+        var jobs = [];
+        for (var i = 0; i < masks.length; i++) {
+            (function (part) {
+                if (!part || part.bits) return;
+                var stream = new Blob([base64ToBytes(part.data)]).stream()
+                    .pipeThrough(new DecompressionStream("deflate"));
+                jobs.push(new Response(stream).arrayBuffer().then(function (buf) {
+                    part.bits = new Uint8Array(buf);
+                }, function (err) {
+                    console.error("SamPrompter: failed to inflate mask data", err);
+                    part.bits = new Uint8Array(0);
+                }));
+            })(compressedPart(masks[i]));
+        }
+        return Promise.all(jobs);
+    }
+
+    function needsInflate(masks) {
+        if (!masks) return false;
+        for (var i = 0; i < masks.length; i++) {
+            var part = compressedPart(masks[i]);
+            if (part && !part.bits) return true;
+        }
+        return false;
+    }
+
+    // Decode pycocotools' compressed RLE string into run lengths.
+    // Uses arithmetic rather than bit shifts so sign-extending the last
+    // 5-bit group cannot overflow 32-bit integers.
+    function decodeCocoCounts(str) {
+        var counts = new Int32Array(str.length);
+        var m = 0, p = 0;
+        while (p < str.length) {
+            var x = 0, scale = 1, c;
+            do {
+                c = str.charCodeAt(p++) - 48;
+                x += (c & 0x1f) * scale;
+                scale *= 32;
+            } while (c & 0x20);
+            if (c & 0x10) x -= scale;  // sign bit of the last 5-bit group
+            if (m > 2) x += counts[m - 2];
+            counts[m++] = x;
+        }
+        return counts.subarray(0, m);
+    }
+
+    function parseColor(color) {
+        if (Array.isArray(color)) return color;
+        return [
+            parseInt(color.slice(1, 3), 16),
+            parseInt(color.slice(3, 5), 16),
+            parseInt(color.slice(5, 7), 16)
+        ];
+    }
+
+    // Upsample a quantized low-res logit grid to its frame with the
+    // canvas' bilinear smoothing, then threshold at 128 (logit 0).
+    function decodeLogits(mask, color, alpha) {
+        var grid = mask.logits;
+        var gh = grid.size[0], gw = grid.size[1];
+        var fh = mask.frame[0], fw = mask.frame[1];
+        var rgb = parseColor(color);
+        var a = Math.round((alpha !== undefined ? alpha : maskAlpha) * 255);
+
+        var small = document.createElement("canvas");
+        small.width = gw;
+        small.height = gh;
+        var smallCtx = small.getContext("2d");
+        var smallData = smallCtx.createImageData(gw, gh);
+        var sd = smallData.data;
+        var bits = grid.bits || [];
+        for (var i = 0; i < bits.length && i < gw * gh; i++) {
+            sd[i * 4 + 3] = bits[i];
+        }
+        smallCtx.putImageData(smallData, 0, 0);
+
+        var out = document.createElement("canvas");
+        out.width = fw;
+        out.height = fh;
+        var outCtx = out.getContext("2d", { willReadFrequently: true });
+        outCtx.imageSmoothingEnabled = true;
+        outCtx.drawImage(small, 0, 0, fw, fh);
+        var img = outCtx.getImageData(0, 0, fw, fh);
+        var d = img.data;
+        for (var j = 0; j < d.length; j += 4) {
+            if (d[j + 3] >= 128) {
+                d[j] = rgb[0];
+                d[j + 1] = rgb[1];
+                d[j + 2] = rgb[2];
+                d[j + 3] = a;
+            } else {
+                d[j + 3] = 0;
+            }
+        }
+        outCtx.putImageData(img, 0, 0);
+        return out;
+    }
 
-    function decodeMask(rle, color, alpha) {
-        var h = rle.size[0], w = rle.size[1];
+    function decodeMask(mask, color, alpha) {
+        if (mask.logits) return decodeLogits(mask, color, alpha);
+        var rle = mask.rle;
+        var bitmap = mask.bitmap;
+        var size = (rle || bitmap).size;
+        var h = size[0], w = size[1];
         var offscreen = document.createElement("canvas");
+        // Cropped masks (crop_masks=True) only cover their bounding box;
+        // drawMaskCanvas places them within the full frame.
+        if (mask.bbox && mask.frame) {
+            offscreen.maskPlacement = { bbox: mask.bbox, frame: mask.frame };
+        }
+        if (!w || !h) {
+            // Empty crop: a 0x0 canvas cannot be drawn, keep a blank 1x1.
+            offscreen.width = 1;
+            offscreen.height = 1;
+            return offscreen;
+        }
         offscreen.width = w;
         offscreen.height = h;
         var offCtx = offscreen.getContext("2d");
         var imgData = offCtx.createImageData(w, h);
         var d = imgData.data;
-        var r, g, b;
-        if (Array.isArray(color)) {
-            r = color[0]; g = color[1]; b = color[2];
-        } else {
-            r = parseInt(color.slice(1, 3), 16);
-            g = parseInt(color.slice(3, 5), 16);
-            b = parseInt(color.slice(5, 7), 16);
-        }
+        var rgb = parseColor(color);
+        var r = rgb[0], g = rgb[1], b = rgb[2];
         var a = Math.round((alpha !== undefined ? alpha : maskAlpha) * 255);
-        var pos = 0;
-        for (var i = 0; i < rle.counts.length; i++) {
-            var c = rle.counts[i];
-            if (i % 2 === 1) {
-                for (var j = pos; j < pos + c; j++) {
-                    var row = j % h;
-                    var col = (j / h) | 0;
-                    var idx = (row * w + col) * 4;
-                    d[idx] = r;
-                    d[idx + 1] = g;
-                    d[idx + 2] = b;
-                    d[idx + 3] = a;
+        function paint(j) {
+            // j is a column-major pixel index
+            var row = j % h;
+            var col = (j / h) | 0;
+            var idx = (row * w + col) * 4;
+            d[idx] = r;
+            d[idx + 1] = g;
+            d[idx + 2] = b;
+            d[idx + 3] = a;
+        }
+        if (bitmap) {
+            var bits = bitmap.bits || [];
+            var total = h * w;
+            for (var k = 0; k < bits.length; k++) {
+                var v = bits[k];
+                if (!v) continue;
+                for (var bit = 0; bit < 8; bit++) {
+                    if (v & (128 >> bit)) {
+                        var p = k * 8 + bit;
+                        if (p < total) paint(p);
+                    }
                 }
             }
-            pos += c;
+        } else {
+            var counts = typeof rle.counts === "string" ? decodeCocoCounts(rle.counts) : rle.counts;
+            var pos = 0;
+            for (var i = 0; i < counts.length; i++) {
+                var c = counts[i];
+                if (i % 2 === 1) {
+                    for (var j = pos; j < pos + c; j++) paint(j);
+                }
+                pos += c;
+            }
         }
         offCtx.putImageData(imgData, 0, 0);
         return offscreen;
     }
 
+    // Draw a decoded mask so that its full frame spans width x height.
+    function drawMaskCanvas(targetCtx, maskCanvas, width, height) {
+        var placement = maskCanvas.maskPlacement;
+        if (!placement) {
+            targetCtx.drawImage(maskCanvas, 0, 0, width, height);
+            return;
+        }
+        var sx = width / placement.frame[1];
+        var sy = height / placement.frame[0];
+        var bbox = placement.bbox;
+        if (!bbox[2] || !bbox[3]) return;
+        targetCtx.drawImage(maskCanvas, bbox[0] * sx, bbox[1] * sy, bbox[2] * sx, bbox[3] * sy);
+    }
+
     // --- Canvas sizing ---
 
     function resizeCanvas() {
@@ -386,9 +585,11 @@
         // Only update internal dimensions when they actually changed;
         // setting canvas.width/height (even to the same value) clears
         // the pixel buffer which causes a visible flicker.
-        if (canvas.width !== state.naturalWidth || canvas.height !== state.naturalHeight) {
-            canvas.width = state.naturalWidth;
-            canvas.height = state.naturalHeight;
+        var bufferWidth = Math.round(state.naturalWidth * state.canvasScale);
+        var bufferHeight = Math.round(state.naturalHeight * state.canvasScale);
+        if (canvas.width !== bufferWidth || canvas.height !== bufferHeight) {
+            canvas.width = bufferWidth;
+            canvas.height = bufferHeight;
         }
         canvas.style.width = displayWidth + "px";
         canvas.style.height = displayHeight + "px";
@@ -401,6 +602,7 @@
         // Classes on element (outside morph scope) — survive DOM diffing
         element.classList.toggle("sp-has-image", !!state.image);
         element.classList.toggle("sp-settings-hidden", !state.settingsVisible);
+        element.classList.toggle("sp-manual-run", requestMode === "manual");
         // Restore maximized state
         var wasMaximized = element.classList.contains("sp-maximized");
         element.classList.toggle("sp-maximized", state.maximized);
@@ -436,7 +638,8 @@
 
         // Apply zoom+pan transform
         ctx.save();
-        ctx.setTransform(state.zoom, 0, 0, state.zoom, state.panX, state.panY);
+        var k = state.zoom * state.canvasScale;
+        ctx.setTransform(k, 0, 0, k, state.panX, state.panY);
 
         if (!state.cutoutMode) {
             // 1. Image (conditionally)
@@ -452,7 +655,7 @@
                 ctx.globalAlpha = maskAlpha;
                 for (var m = 0; m < state.maskCanvases.length; m++) {
                     if (state.maskCanvases[m] && m < state.objects.length && state.objects[m].visible) {
-                        ctx.drawImage(state.maskCanvases[m], 0, 0, state.naturalWidth, state.naturalHeight);
+                        drawMaskCanvas(ctx, state.maskCanvases[m], state.naturalWidth, state.naturalHeight);
                     }
                 }
                 ctx.globalAlpha = 1.0;
@@ -464,20 +667,22 @@
             ctx.fillRect(0, 0, state.naturalWidth, state.naturalHeight);
 
             // Composite visible masks then clip the original image
-            var co = getCutoutCanvas(state.naturalWidth, state.naturalHeight);
-            co.ctx.clearRect(0, 0, state.naturalWidth, state.naturalHeight);
+            // (at canvas resolution, which may be below natural size)
+            var cw = canvas.width, ch = canvas.height;
+            var co = getCutoutCanvas(cw, ch);
+            co.ctx.clearRect(0, 0, cw, ch);
 
             // Union all visible mask canvases (source-over)
             co.ctx.globalCompositeOperation = "source-over";
             for (var cm = 0; cm < state.maskCanvases.length; cm++) {
                 if (state.maskCanvases[cm] && cm < state.objects.length && state.objects[cm].visible) {
-                    co.ctx.drawImage(state.maskCanvases[cm], 0, 0, state.naturalWidth, state.naturalHeight);
+                    drawMaskCanvas(co.ctx, state.maskCanvases[cm], cw, ch);
                 }
             }
 
             // Keep image pixels only where mask alpha > 0
             co.ctx.globalCompositeOperation = "source-in";
-            co.ctx.drawImage(state.image, 0, 0, state.naturalWidth, state.naturalHeight);
+            co.ctx.drawImage(state.image, 0, 0, cw, ch);
             co.ctx.globalCompositeOperation = "source-over";
 
             ctx.drawImage(co.canvas, 0, 0, state.naturalWidth, state.naturalHeight);
@@ -522,7 +727,7 @@
 
         // 6. Rubber-band box (in canvas pixel space, not zoomed)
         if (state.isDrawingBox) {
-            drawRubberBand(ds);
+            drawRubberBand(ds * state.canvasScale);
         }
     }
 
@@ -676,6 +881,10 @@
         // Clear image button
         clearImageBtn.disabled = !state.image;
 
+        // Run button (manual mode): highlighted while edits are unsent
+        runBtn.disabled = !state.image;
+        runBtn.classList.toggle("active", state.unsentEdits);
+
         // Image toggle
         if (state.showImage) {
             imageToggleBtn.classList.add("active");
@@ -702,7 +911,7 @@
     // --- Object management ---
 
     function addObject() {
-        if (state.isProcessing) return;
+        if (isLocked()) return;
         if (state.objects.length >= maxObjects) return;
         var newObj = createEmptyObject(state.objects.length);
         state.objects.push(newObj);
@@ -712,7 +921,7 @@
     }
 
     function deleteObject(index) {
-        if (state.isProcessing) return;
+        if (isLocked()) return;
         if (state.objects.length <= 1) {
             clearActiveObject();
             return;
@@ -734,7 +943,7 @@
     }
 
     function clearActiveObject() {
-        if (state.isProcessing) return;
+        if (isLocked()) return;
         var obj = state.objects[state.activeObjectIndex];
         if (obj.points.length === 0 && obj.boxes.length === 0) return;
         obj.history.push({
@@ -743,6 +952,7 @@
             labels: obj.labels.slice(),
             boxes: obj.boxes.map(function (b) { return b.slice(); })
         });
+        obj.rev++;
         obj.points = [];
         obj.labels = [];
         obj.boxes = [];
@@ -759,7 +969,7 @@
     }
 
     function clearAll() {
-        if (state.isProcessing) return;
+        if (isLocked()) return;
         state.objects = [createEmptyObject(0)];
         state.activeObjectIndex = 0;
         state.rawMasks = [];
@@ -772,9 +982,10 @@
     // --- Prompt operations ---
 
     function addPoint(natX, natY, label) {
-        if (state.isProcessing) return;
+        if (isLocked()) return;
         var obj = state.objects[state.activeObjectIndex];
         obj.history.push({ type: "point" });
+        obj.rev++;
         obj.points.push([Math.round(natX), Math.round(natY)]);
         obj.labels.push(label);
         renderToolbar();
@@ -783,7 +994,7 @@
     }
 
     function addBox(x1, y1, x2, y2) {
-        if (state.isProcessing) return;
+        if (isLocked()) return;
         var bx1 = Math.round(Math.min(x1, x2));
         var by1 = Math.round(Math.min(y1, y2));
         var bx2 = Math.round(Math.max(x1, x2));
@@ -792,6 +1003,7 @@
         if (Math.abs(bx2 - bx1) < 3 && Math.abs(by2 - by1) < 3) return;
         var obj = state.objects[state.activeObjectIndex];
         obj.history.push({ type: "box" });
+        obj.rev++;
         obj.boxes.push([bx1, by1, bx2, by2]);
         renderToolbar();
         requestRender();
@@ -799,10 +1011,11 @@
     }
 
     function undoLastPrompt() {
-        if (state.isProcessing) return;
+        if (isLocked()) return;
         var obj = state.objects[state.activeObjectIndex];
         if (obj.history.length === 0) return;
         var last = obj.history.pop();
+        obj.rev++;
         if (last.type === "point") {
             obj.points.pop();
             obj.labels.pop();
@@ -842,12 +1055,13 @@
     }
 
     function deletePointAt(index) {
-        if (state.isProcessing) return;
+        if (isLocked()) return;
         var obj = state.objects[state.activeObjectIndex];
         if (index < 0 || index >= obj.points.length) return;
         var point = obj.points[index].slice();
         var label = obj.labels[index];
         obj.history.push({ type: "delete-point", index: index, point: point, label: label });
+        obj.rev++;
         obj.points.splice(index, 1);
         obj.labels.splice(index, 1);
         renderToolbar();
@@ -890,17 +1104,100 @@
     }
 
     function deleteBoxAt(index) {
-        if (state.isProcessing) return;
+        if (isLocked()) return;
         var obj = state.objects[state.activeObjectIndex];
         if (index < 0 || index >= obj.boxes.length) return;
         var box = obj.boxes[index].slice();
         obj.history.push({ type: "delete-box", index: index, box: box });
+        obj.rev++;
         obj.boxes.splice(index, 1);
         renderToolbar();
         requestRender();
         emitPromptData();
     }
 
+    // --- Mask memo (mask_memo) ---
+    // Remembers, per object, the masks the server returned for its most
+    // recent prompt states.  When an edit (typically an undo or an
+    // Alt-click delete) brings every object back to a remembered state,
+    // the masks are shown from the memo and no request is sent.
+
+    var _maskMemo = {};  // object id -> [{ key, raw }], most recent last
+    var _maskMemoImage = null;
+
+    function promptStateKey(obj) {
+        return JSON.stringify([obj.points, obj.labels, obj.boxes]);
+    }
+
+    function currentImageKey() {
+        return state.imageHash || state.filePath || state.imageId || state.imageUrl;
+    }
+
+    function memoizeMask(id, key, raw) {
+        var image = currentImageKey();
+        if (image !== _maskMemoImage) {
+            _maskMemo = {};
+            _maskMemoImage = image;
+        }
+        var entries = _maskMemo[id] || (_maskMemo[id] = []);
+        for (var i = 0; i < entries.length; i++) {
+            if (entries[i].key === key) {
+                entries.splice(i, 1);
+                break;
+            }
+        }
+        entries.push({ key: key, raw: raw });
+        if (entries.length > maskMemoSize) entries.shift();
+    }
+
+    function lookupMemoMask(obj) {
+        var entries = _maskMemoImage === currentImageKey() ? _maskMemo[obj.id] : null;
+        if (!entries) return null;
+        var key = promptStateKey(obj);
+        for (var i = entries.length - 1; i >= 0; i--) {
+            if (entries[i].key === key) return entries[i].raw;
+        }
+        return null;
+    }
+
+    // Record the masks of a server reply for the prompt states that were
+    // sent, as long as the object still has exactly those prompts.
+    function rememberMasks() {
+        var sent = state.sentPromptKeys;
+        if (maskMemoSize <= 0 || !sent) return;
+        for (var i = 0; i < state.objects.length && i < state.rawMasks.length; i++) {
+            var obj = state.objects[i];
+            var raw = state.rawMasks[i];
+            if (raw && sent[obj.id] !== undefined && sent[obj.id] === promptStateKey(obj)) {
+                memoizeMask(obj.id, sent[obj.id], raw);
+            }
+        }
+    }
+
+    // Show remembered masks for the current prompts.  Returns false,
+    // leaving the display untouched, if any prompted object has no
+    // remembered mask for its current state.
+    function applyMemoMasks() {
+        if (maskMemoSize <= 0) return false;
+        var raws = [];
+        for (var i = 0; i < state.objects.length; i++) {
+            var obj = state.objects[i];
+            var raw = null;
+            if (obj.points.length > 0 || obj.boxes.length > 0) {
+                raw = lookupMemoMask(obj);
+                if (!raw) return false;
+            }
+            raws.push(raw);
+        }
+        state.maskCanvases = raws.map(function (r, j) {
+            if (!r) return null;
+            if (state.rawMasks[j] === r && state.maskCanvases[j]) return state.maskCanvases[j];
+            return decodeMask(r, state.objects[j].color, 1.0);
+        });
+        state.rawMasks = raws;
+        return true;
+    }
+
     // --- JS → Python communication ---
 
     function hasAnyPrompts() {
@@ -909,34 +1206,123 @@
         });
     }
 
+    function addUploadFields(payload) {
+        payload.imagePath = state.filePath;
+        payload.imageSize = { width: state.naturalWidth, height: state.naturalHeight };
+        if (state.imageHash) payload.imageHash = state.imageHash;
+        if (state.uploadScale !== 1) {
+            payload.uploadScale = state.uploadScale;
+            payload.originalSize = { width: state.originalWidth, height: state.originalHeight };
+        }
+        return payload;
+    }
+
+    // Fire the "upload" event once per file, as soon as its server path
+    // (and hash) are known, so handlers can start per-image work such as
+    // computing embeddings before the first click.
+    function announceUpload() {
+        if (state.uploadAnnounced || state.imageSource !== "upload" || !state.image) return;
+        if (!state.filePath || state.hashPending) return;
+        state.uploadAnnounced = true;
+        props.value = JSON.stringify(addUploadFields({ prompts: [] }));
+        trigger("upload");
+    }
+
+    // Called after every prompt edit.  Depending on request_mode the new
+    // prompts are sent now, once the in-flight request is answered, or
+    // when the user presses Run.
+    var _debounceTimer = null;
     function emitPromptData() {
+        state.editSeq++;
+        if (requestMode === "manual") {
+            state.unsentEdits = true;
+            renderToolbar();
+            return;
+        }
+        state.sendQueued = true;
+        if (debounceMs > 0) {
+            if (_debounceTimer) clearTimeout(_debounceTimer);
+            _debounceTimer = setTimeout(function () {
+                _debounceTimer = null;
+                flushQueuedSend();
+            }, debounceMs);
+            return;
+        }
+        flushQueuedSend();
+    }
+
+    // Send the latest prompts unless a request is in flight (its
+    // response calls this again) or the debounce window is still open.
+    function flushQueuedSend() {
+        if (!state.sendQueued || state.isProcessing || _debounceTimer) return;
+        state.sendQueued = false;
+        sendPromptData();
+    }
+
+    function runPrompts() {
+        if (!state.image) return;
+        state.unsentEdits = false;
+        state.sendQueued = true;
+        renderToolbar();
+        flushQueuedSend();
+    }
+
+    function sendPromptData() {
         // Skip backend call when no object has actual prompts (points/boxes)
         if (!hasAnyPrompts()) return;
-        // Defer if user uploaded a file but server path not yet available
-        if (state.imageSource === "upload" && state.image && !state.filePath) {
+        // Defer if user uploaded a file but server path (or hash) not yet available
+        if (state.imageSource === "upload" && state.image && (!state.filePath || state.hashPending)) {
             state.pendingEmit = true;
             return;
         }
         var prompts = state.objects.map(function (obj) {
             return {
+                id: obj.id,
+                rev: obj.rev,
                 points: obj.points.slice(),
                 labels: obj.labels.slice(),
                 boxes: obj.boxes.map(function (b) { return b.slice(); })
             };
         });
-        var payload = { prompts: prompts };
+        var payload = { prompts: prompts, seq: ++state.requestSeq };
         if (state.imageSource === "upload" && state.filePath) {
-            payload.imagePath = state.filePath;
-            payload.imageSize = { width: state.naturalWidth, height: state.naturalHeight };
+            addUploadFields(payload);
         }
         if (state.imageSource === "python" && state.imageUrl) {
+            // A downscaled display image (max_display_side) does not match
+            // the prompt coordinates: send the full-resolution file the
+            // server named, or no path at all.
             var prefix = "/gradio_api/file=";
-            if (state.imageUrl.startsWith(prefix)) {
+            if (state.imagePath) {
+                payload.imagePath = state.imagePath;
+            } else if (state.canvasScale === 1 && state.imageUrl.startsWith(prefix)) {
                 payload.imagePath = state.imageUrl.slice(prefix.length);
             }
+            if (state.imageId) payload.imageId = state.imageId;
             payload.imageSize = { width: state.naturalWidth, height: state.naturalHeight };
         }
+        var fromMemo = applyMemoMasks();
+        // Content hashes of the masks on screen, so SamPrompter.delta()
+        // can skip re-sending masks that did not change.
+        var maskHashes = [];
+        for (var mh = 0; mh < state.rawMasks.length; mh++) {
+            if (state.rawMasks[mh] && state.rawMasks[mh].hash) maskHashes.push(state.rawMasks[mh].hash);
+        }
+        if (maskHashes.length) payload.maskHashes = maskHashes;
         props.value = JSON.stringify(payload);
+        if (fromMemo) {
+            // Keep the value current for other events reading it, but skip
+            // the round trip: the server already answered these prompts.
+            requestRender();
+            return;
+        }
+        if (maskMemoSize > 0) {
+            state.sentPromptKeys = {};
+            for (var sk = 0; sk < state.objects.length; sk++) {
+                state.sentPromptKeys[state.objects[sk].id] = promptStateKey(state.objects[sk]);
+            }
+        }
+        state.sentEditSeq = state.editSeq;
         trigger("input");
         state.isProcessing = true;
         updateCanvasCursor();
@@ -944,12 +1330,38 @@
 
     // --- Python → JS communication (via watch API) ---
 
+    function findRawMaskByHash(hash) {
+        for (var i = 0; i < state.rawMasks.length; i++) {
+            if (state.rawMasks[i] && state.rawMasks[i].hash === hash) return state.rawMasks[i];
+        }
+        return null;
+    }
+
+    // Decode mask entry *entry* for object *index*, reusing the current
+    // canvas when the mask content (hash) is unchanged.  Entries without
+    // rle/bitmap/logits are delta updates referring to a mask already on screen.
+    function resolveMask(entry, index) {
+        var current = index < state.rawMasks.length ? state.rawMasks[index] : null;
+        if (entry.hash && current && current.hash === entry.hash && state.maskCanvases[index]) {
+            return { raw: current, canvas: state.maskCanvases[index] };
+        }
+        var raw = entry;
+        if (!entry.rle && !entry.bitmap && !entry.logits) {
+            raw = entry.hash ? findRawMaskByHash(entry.hash) : null;
+            if (!raw) return { raw: null, canvas: null };
+        }
+        return { raw: raw, canvas: decodeMask(raw, state.objects[index].color, 1.0) };
+    }
+
     function handleDataUpdate() {
+        var generation = ++state.dataGeneration;
         var raw = typeof props.value === "string" ? props.value : "";
         if (!raw || raw === "null") {
             if (state.imageSource !== "upload") {
                 state.image = null;
                 state.imageUrl = null;
+                state.imageId = null;
+                state.imagePath = null;
                 state.rawMasks = [];
                 state.maskCanvases = [];
             }
@@ -969,8 +1381,54 @@
             return;
         }
 
+        // Bitmap masks are inflated asynchronously; the processing lock
+        // stays on until they are decoded and shown.
+        if (needsInflate(data.masks)) {
+            inflateBitmaps(data.masks).then(function () {
+                // A newer value arrived meanwhile and supersedes this one.
+                if (generation === state.dataGeneration) applyDataUpdate(data);
+            });
+            return;
+        }
+        applyDataUpdate(data);
+    }
+
+    // Unless the canvas is locked during requests (pipelined and manual
+    // mode), a reply is stale if the prompts were edited after the request
+    // was sent: its masks are dropped.  In pipelined mode the queued
+    // prompts go out as soon as the processing flag resets; in manual mode
+    // they wait for the next Run.
+    function isStaleReply() {
+        return state.isProcessing && requestMode !== "lock" && state.editSeq !== state.sentEditSeq;
+    }
+
+    // Partial reply of a generator handler (SamPrompter.partial): replace
+    // the masks of the listed objects only.  The request stays in
+    // progress until the final, non-partial reply.
+    function applyPartialMasks(data) {
+        if (isStaleReply()) return;
+        var masks = data.masks || [];
+        var indices = data.objectIndices || [];
+        for (var i = 0; i < masks.length && i < indices.length; i++) {
+            var idx = indices[i];
+            if (idx < 0 || idx >= state.objects.length) continue;
+            while (state.rawMasks.length <= idx) state.rawMasks.push(null);
+            while (state.maskCanvases.length <= idx) state.maskCanvases.push(null);
+            var res = resolveMask(masks[i], idx);
+            state.rawMasks[idx] = res.raw;
+            state.maskCanvases[idx] = res.canvas;
+        }
+        requestRender();
+    }
+
+    function applyDataUpdate(data) {
+        if (data.partial) {
+            applyPartialMasks(data);
+            return;
+        }
         // watch() only fires on backend (Python) responses, so every
         // invocation is a genuine server reply — no echo detection needed.
+        var stale = isStaleReply();
         if (state.isProcessing) {
             scheduleProcessingReset();
         }
@@ -991,8 +1449,8 @@
         if (data.clearPrompts) {
             state.objects = [createEmptyObject(0)];
             state.activeObjectIndex = 0;
-            // If this is a clear-only payload (no image), just re-render
-            if (!("image" in data)) {
+            // If this is a clear-only payload (no image, no masks), just re-render
+            if (!("image" in data) && !("masks" in data)) {
                 state.rawMasks = [];
                 state.maskCanvases = [];
                 if (state.image) {
@@ -1004,8 +1462,9 @@
             }
         }
 
-        // Decode masks (store raw for re-decoding, decode at alpha=1.0 for globalAlpha control)
-        if (data.masks && data.masks.length > 0) {
+        // Decode masks (store raw for re-decoding, decode at alpha=1.0 for globalAlpha control).
+        // Stale masks are skipped; the current ones stay until the next reply.
+        if (!stale && data.masks && data.masks.length > 0) {
             var numMasks = data.masks.length;
             // Ensure enough objects exist to hold all server-sent masks
             // (e.g. initial value with multiple masks on a fresh component).
@@ -1025,8 +1484,9 @@
             if (numMasks >= numObjects) {
                 // 1:1 (or more) mapping — direct index
                 for (var di = 0; di < numObjects; di++) {
-                    newRaw[di] = data.masks[di];
-                    newCanvases[di] = decodeMask(data.masks[di].rle, state.objects[di].color, 1.0);
+                    var dres = resolveMask(data.masks[di], di);
+                    newRaw[di] = dres.raw;
+                    newCanvases[di] = dres.canvas;
                 }
             } else {
                 // Fewer masks than objects — backend likely skipped empty
@@ -1043,21 +1503,24 @@
                     // Perfect match — assign each mask to its prompted object
                     for (var mi = 0; mi < numMasks; mi++) {
                         var idx = promptedIndices[mi];
-                        newRaw[idx] = data.masks[mi];
-                        newCanvases[idx] = decodeMask(data.masks[mi].rle, state.objects[idx].color, 1.0);
+                        var mres = resolveMask(data.masks[mi], idx);
+                        newRaw[idx] = mres.raw;
+                        newCanvases[idx] = mres.canvas;
                     }
                 } else {
                     // Fallback: direct index mapping (original behaviour)
                     for (var fi = 0; fi < numMasks && fi < numObjects; fi++) {
-                        newRaw[fi] = data.masks[fi];
-                        newCanvases[fi] = decodeMask(data.masks[fi].rle, state.objects[fi].color, 1.0);
+                        var fres = resolveMask(data.masks[fi], fi);
+                        newRaw[fi] = fres.raw;
+                        newCanvases[fi] = fres.canvas;
                     }
                 }
             }
 
             state.rawMasks = newRaw;
             state.maskCanvases = newCanvases;
-        } else if ("masks" in data) {
+            rememberMasks();
+        } else if (!stale && "masks" in data) {
             // Python explicitly returned empty masks — clear.
             state.rawMasks = [];
             state.maskCanvases = [];
@@ -1072,12 +1535,22 @@
             return;
         }
 
+        // Masks-only payload (SamPrompter.masks_only) or the same image
+        // content as the one on screen: keep the current bitmap as-is.
+        if (!("image" in data) || (data.imageId && data.imageId === state.imageId && state.image)) {
+            if (state.image) {
+                resizeCanvas();
+                renderToolbar();
+            }
+            requestRender();
+            return;
+        }
+
         // Load image if URL changed (Python-provided image)
         if (data.image && data.image !== state.imageUrl) {
-            // Detect mask-only updates for the same underlying image: lossy
-            // re-encoding produces a different cache URL each time, so we
-            // check whether the response is really just new masks rather
-            // than a genuinely new image.
+            // A different image of the same size returned in reply to
+            // prompts (e.g. an annotated render) replaces the bitmap but
+            // keeps the user's prompts.
             var isMaskUpdate = state.imageSource === "python" &&
                 state.image &&
                 data.masks && data.masks.length > 0 &&
@@ -1085,6 +1558,8 @@
                 (data.height || 0) === state.naturalHeight;
 
             state.imageUrl = data.image;
+            state.imageId = data.imageId || null;
+            state.imagePath = data.imagePath || null;
             state.imageSource = "python";
             // Clean up previous blob URL if any
             if (state.objectUrl) {
@@ -1098,6 +1573,7 @@
                 state.image = img;
                 state.naturalWidth = data.width || img.naturalWidth;
                 state.naturalHeight = data.height || img.naturalHeight;
+                state.canvasScale = img.naturalWidth / state.naturalWidth;
                 if (!isMaskUpdate) {
                     var initMasks = (data.masks && data.masks.length) || 0;
                     if (initMasks > 1) {
@@ -1142,7 +1618,7 @@
     // --- Mouse events ---
 
     canvas.addEventListener("mousedown", function (e) {
-        if (!state.image || state.isProcessing) return;
+        if (!state.image || isLocked()) return;
 
         // Middle button → always pan
         if (e.button === 1) {
@@ -1488,6 +1964,12 @@
                 undoLastPrompt();
                 e.preventDefault();
                 break;
+            case "enter":
+                if (requestMode === "manual") {
+                    runPrompts();
+                    e.preventDefault();
+                }
+                break;
             case "m":
                 state.showMasks = !state.showMasks;
                 renderToolbar();
@@ -1649,8 +2131,14 @@
         if (state.objectUrl) URL.revokeObjectURL(state.objectUrl);
         state.image = null;
         state.imageUrl = null;
+        state.imageId = null;
+        state.imagePath = null;
         state.objectUrl = null;
         state.filePath = null;
+        state.imageHash = null;
+        state.hashPending = false;
+        state.uploadScale = 1;
+        state.loadGeneration++;
         state.pendingEmit = false;
         state.imageSource = null;
         state.rawMasks = [];
@@ -1663,6 +2151,12 @@
         state.moveMode = false;
         state.cutoutMode = false;
         state.isProcessing = false;
+        state.sendQueued = false;
+        state.unsentEdits = false;
+        if (_debounceTimer) {
+            clearTimeout(_debounceTimer);
+            _debounceTimer = null;
+        }
         if (state.maximized) {
             toggleMaximize();
         }
@@ -1674,9 +2168,53 @@
     }
 
     clearImageBtn.addEventListener("click", function () { clearImage(); });
+    runBtn.addEventListener("click", function () { runPrompts(); });
 
     // --- File upload (input) ---
 
+    function flushPendingEmit() {
+        announceUpload();
+        if (state.pendingEmit && state.filePath && !state.hashPending) {
+            state.pendingEmit = false;
+            sendPromptData();
+        }
+    }
+
+    // SHA-256 of the file as hex, or null where Web Crypto is unavailable
+    // (crypto.subtle only exists in secure contexts: HTTPS or localhost).
+    // With a hex salt, the digest covers the salt bytes followed by the file.
+    function hashFile(file, salt) {
+        if (!window.crypto || !window.crypto.subtle || !file.arrayBuffer) return Promise.resolve(null);
+        return file.arrayBuffer()
+            .then(function (buf) {
+                if (!salt) return window.crypto.subtle.digest("SHA-256", buf);
+                var n = salt.length / 2;
+                var data = new Uint8Array(n + buf.byteLength);
+                for (var i = 0; i < n; i++) data[i] = parseInt(salt.substr(2 * i, 2), 16);
+                data.set(new Uint8Array(buf), n);
+                return window.crypto.subtle.digest("SHA-256", data);
+            })
+            .then(function (digest) {
+                var bytes = new Uint8Array(digest);
+                var hex = "";
+                for (var i = 0; i < bytes.length; i++) hex += (bytes[i] < 16 ? "0" : "") + bytes[i].toString(16);
+                return hex;
+            })
+            .catch(function () { return null; });
+    }
+
+    function hashUploadedFile(file) {
+        var capturedUrl = state.objectUrl;
+        state.hashPending = true;
+        return hashFile(file).then(function (hex) {
+            if (state.objectUrl !== capturedUrl) return null;
+            state.imageHash = hex;
+            state.hashPending = false;
+            flushPendingEmit();
+            return hex;
+        });
+    }
+
     function uploadToServer(file) {
         var capturedUrl = state.objectUrl;
 
@@ -1684,9 +2222,10 @@
             .then(function (result) {
                 if (state.objectUrl !== capturedUrl) return;
                 state.filePath = result.path;
-                if (state.pendingEmit) {
-                    state.pendingEmit = false;
-                    emitPromptData();
+                flushPendingEmit();
+                if (dedupeUploads && state.imageHash) {
+                    // The server re-hashes the file before trusting it.
+                    server.register_upload({ hash: state.imageHash, path: result.path }).catch(function () {});
                 }
             })
             .catch(function () {
@@ -1694,26 +2233,130 @@
             });
     }
 
+    // Hash first and ask the server for an earlier upload of the same
+    // bytes; the file is uploaded only on a miss.  The server hands out
+    // the path only against a hash of its salt + the file, proving the
+    // browser holds the bytes.  A pending emit resolves as soon as either
+    // path is known.
+    function uploadIfNew(file) {
+        var capturedUrl = state.objectUrl;
+        hashUploadedFile(file).then(function (hex) {
+            if (state.objectUrl !== capturedUrl) return;
+            if (!hex) {
+                uploadToServer(file);
+                return;
+            }
+            server.upload_challenge(hex).then(function (salt) {
+                if (!salt || state.objectUrl !== capturedUrl) return null;
+                return hashFile(file, salt).then(function (proof) {
+                    if (!proof || state.objectUrl !== capturedUrl) return null;
+                    return server.lookup_upload({ hash: hex, salt: salt, proof: proof });
+                });
+            }).then(function (path) {
+                if (state.objectUrl !== capturedUrl) return;
+                if (path) {
+                    state.filePath = path;
+                    flushPendingEmit();
+                } else {
+                    uploadToServer(file);
+                }
+            }, function () {
+                if (state.objectUrl === capturedUrl) uploadToServer(file);
+            });
+        });
+    }
+
+    // Resolve to {file, width, height, originalWidth, originalHeight} with
+    // the image re-encoded so its longer side is maxSide, or to null when it
+    // is already small enough or the browser cannot decode it.
+    function downscaleFile(file, maxSide) {
+        if (typeof createImageBitmap !== "function") return Promise.resolve(null);
+        return createImageBitmap(file).then(function (bitmap) {
+            var w = bitmap.width;
+            var h = bitmap.height;
+            if (Math.max(w, h) <= maxSide) {
+                bitmap.close();
+                return null;
+            }
+            var scale = maxSide / Math.max(w, h);
+            var tw = Math.max(1, Math.round(w * scale));
+            var th = Math.max(1, Math.round(h * scale));
+            return createImageBitmap(bitmap, { resizeWidth: tw, resizeHeight: th, resizeQuality: "high" })
+                .then(function (small) {
+                    bitmap.close();
+                    // PNG stays lossless (masks, screenshots); everything else becomes JPEG.
+                    var type = file.type === "image/png" ? "image/png" : "image/jpeg";
+                    var blobPromise;
+                    if (typeof OffscreenCanvas !== "undefined") {
+                        var off = new OffscreenCanvas(tw, th);
+                        off.getContext("2d").drawImage(small, 0, 0);
+                        blobPromise = off.convertToBlob({ type: type, quality: 0.92 });
+                    } else {
+                        var c = document.createElement("canvas");
+                        c.width = tw;
+                        c.height = th;
+                        c.getContext("2d").drawImage(small, 0, 0);
+                        blobPromise = new Promise(function (resolve) { c.toBlob(resolve, type, 0.92); });
+                    }
+                    small.close();
+                    return blobPromise;
+                })
+                .then(function (blob) {
+                    if (!blob) return null;
+                    var name = file.name.replace(/\.[^.]*$/, "") + (blob.type === "image/png" ? ".png" : ".jpg");
+                    return {
+                        file: new File([blob], name, { type: blob.type }),
+                        width: tw,
+                        height: th,
+                        originalWidth: w,
+                        originalHeight: h
+                    };
+                });
+        }).catch(function () { return null; });
+    }
+
     function loadImageFile(file) {
         if (!file || !file.type.startsWith("image/")) return;
+        var generation = ++state.loadGeneration;
+        if (maxUploadSide > 0) {
+            downscaleFile(file, maxUploadSide).then(function (resized) {
+                if (state.loadGeneration !== generation) return;
+                showUploadedFile(resized ? resized.file : file, resized);
+            });
+        } else {
+            showUploadedFile(file, null);
+        }
+    }
 
+    // Display *file* and upload it.  With max_upload_side, *file* is the
+    // downscaled copy: the canvas, the prompts and the masks all use its
+    // pixel grid, and the payload reports uploadScale / originalSize.
+    function showUploadedFile(file, resized) {
         // Revoke previous blob URL
         if (state.objectUrl) URL.revokeObjectURL(state.objectUrl);
 
         var url = URL.createObjectURL(file);
         state.objectUrl = url;
         state.filePath = null;
+        state.imageHash = null;
         state.pendingEmit = false;
         state.imageSource = "upload";
         state.imageUrl = null;
+        state.imageId = null;
+        state.imagePath = null;
         state.rawMasks = [];
         state.maskCanvases = [];
+        state.uploadScale = resized ? resized.width / resized.originalWidth : 1;
+        state.uploadAnnounced = false;
+        state.originalWidth = resized ? resized.originalWidth : 0;
+        state.originalHeight = resized ? resized.originalHeight : 0;
 
         var img = new Image();
         img.onload = function () {
             state.image = img;
             state.naturalWidth = img.naturalWidth;
             state.naturalHeight = img.naturalHeight;
+            state.canvasScale = 1;
             state.objects = [createEmptyObject(0)];
             state.activeObjectIndex = 0;
             state.zoom = 1;
@@ -1722,11 +2365,17 @@
             resizeCanvas();
             renderToolbar();
             requestRender();
+            announceUpload();
             emitPromptData();
         };
         img.src = url;
 
-        uploadToServer(file);
+        if (dedupeUploads && server && server.lookup_upload) {
+            uploadIfNew(file);
+        } else {
+            hashUploadedFile(file);
+            uploadToServer(file);
+        }
     }
 
     fileInput.addEventListener("change", function () {
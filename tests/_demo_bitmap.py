@@ -0,0 +1,15 @@
+"""Gradio demo that sends masks as packed, deflated bitmaps.
+
+Same mock inference as ``_demo.py`` but with ``mask_encoding="bitmap"`` so
+UI tests exercise the asynchronous bitmap decode path.
+"""
+
+import gradio as gr
+from _demo import mock_inference
+
+from sam_prompter import SamPrompter
+
+with gr.Blocks(title="SAM Prompter Bitmap Test") as demo:
+    prompter = SamPrompter(label="SAM Prompter", mask_encoding="bitmap")
+    debug_json = gr.JSON(label="Prompt Data (debug)")
+    prompter.input(fn=mock_inference, inputs=prompter, outputs=[prompter, debug_json])
@@ -0,0 +1,15 @@
+"""Gradio demo that sends masks cropped to their bounding boxes.
+
+Same mock inference as ``_demo.py`` but with ``crop_masks=True`` so UI
+tests exercise the offset drawing of cropped mask canvases.
+"""
+
+import gradio as gr
+from _demo import mock_inference
+
+from sam_prompter import SamPrompter
+
+with gr.Blocks(title="SAM Prompter Cropped Masks Test") as demo:
+    prompter = SamPrompter(label="SAM Prompter", crop_masks=True)
+    debug_json = gr.JSON(label="Prompt Data (debug)")
+    prompter.input(fn=mock_inference, inputs=prompter, outputs=[prompter, debug_json])
@@ -0,0 +1,17 @@
+"""Gradio demo with ``dedupe_uploads=True`` that records the received prompt dicts."""
+
+import gradio as gr
+
+from sam_prompter import SamPrompter
+
+received: list[dict] = []
+
+
+def record(data: dict | None) -> None:
+    if data is not None:
+        received.append(data)
+
+
+with gr.Blocks(title="SAM Prompter Upload Dedupe Test") as demo:
+    prompter = SamPrompter(label="SAM Prompter", dedupe_uploads=True)
+    prompter.input(fn=record, inputs=prompter, outputs=None)
@@ -0,0 +1,33 @@
+"""Gradio demo whose handler replies through ``SamPrompter.delta()``.
+
+Masks the frontend already displays are sent as a content hash only, so
+UI tests can verify that unchanged masks keep their decoded canvases.
+"""
+
+import gradio as gr
+import numpy as np
+from _mock_inference import apply_bg_points, apply_boxes, apply_fg_points
+from PIL import Image
+
+from sam_prompter import SamPrompter, _DeltaMasks
+
+
+def mock_inference(data: dict | None) -> _DeltaMasks | None:
+    if data is None or not data.get("imagePath"):
+        return None
+    image = Image.open(data["imagePath"]).convert("RGB")
+    w, h = image.size
+    masks = []
+    for obj in data.get("prompts", []):
+        mask = np.zeros((h, w), dtype=np.uint8)
+        has_fg = apply_fg_points(mask, obj, h, w)
+        has_box = apply_boxes(mask, obj, h, w)
+        apply_bg_points(mask, obj, h, w)
+        if has_fg or has_box:
+            masks.append({"mask": mask})
+    return SamPrompter.delta((image, masks), data)
+
+
+with gr.Blocks(title="SAM Prompter Delta Test") as demo:
+    prompter = SamPrompter(label="SAM Prompter")
+    prompter.input(fn=mock_inference, inputs=prompter, outputs=prompter)
@@ -0,0 +1,48 @@
+"""Gradio demo that displays a large Python image through ``max_display_side``.
+
+The image is sent downscaled to the browser, while prompts and masks stay
+in original-image coordinates.  The image is given as a file path, so the
+handler receives the full-resolution file as ``imagePath``; the received
+prompt dicts are recorded.
+"""
+
+import tempfile
+from pathlib import Path
+
+import gradio as gr
+import numpy as np
+from _mock_inference import apply_bg_points, apply_boxes, apply_fg_points
+from PIL import Image
+
+from sam_prompter import SamPrompter, _MasksOnly
+
+IMAGE_W, IMAGE_H = 800, 600
+MAX_DISPLAY_SIDE = 200
+
+IMAGE_PATH = Path(tempfile.mkdtemp(prefix="sam_prompter_proxy_")) / "image.png"
+Image.new("RGB", (IMAGE_W, IMAGE_H), color=(100, 150, 200)).save(IMAGE_PATH)
+
+received: list[dict] = []
+
+
+def mock_inference(data: dict | None) -> _MasksOnly:
+    if data is not None:
+        received.append(data)
+    masks = []
+    for obj in (data or {}).get("prompts", []):
+        mask = np.zeros((IMAGE_H, IMAGE_W), dtype=np.uint8)
+        has_fg = apply_fg_points(mask, obj, IMAGE_H, IMAGE_W)
+        has_box = apply_boxes(mask, obj, IMAGE_H, IMAGE_W)
+        apply_bg_points(mask, obj, IMAGE_H, IMAGE_W)
+        if has_fg or has_box:
+            masks.append({"mask": mask})
+    return SamPrompter.masks_only(masks)
+
+
+with gr.Blocks(title="SAM Prompter Display Proxy Test") as demo:
+    prompter = SamPrompter(
+        str(IMAGE_PATH),
+        label="SAM Prompter",
+        max_display_side=MAX_DISPLAY_SIDE,
+    )
+    prompter.input(fn=mock_inference, inputs=prompter, outputs=prompter)
@@ -0,0 +1,21 @@
+"""Gradio demo that records every prompt dict its handler receives.
+
+UI tests compare the ``imageHash`` the frontend computed with a hash of
+the uploaded file on the server.
+"""
+
+import gradio as gr
+
+from sam_prompter import SamPrompter
+
+received: list[dict] = []
+
+
+def record(data: dict | None) -> None:
+    if data is not None:
+        received.append(data)
+
+
+with gr.Blocks(title="SAM Prompter Image Hash Test") as demo:
+    prompter = SamPrompter(label="SAM Prompter")
+    prompter.input(fn=record, inputs=prompter, outputs=None)
@@ -0,0 +1,38 @@
+"""Gradio demo whose handler returns low-resolution logit grids.
+
+Each object's mask is a 64x64 logit grid that the frontend upsamples to
+the full image on the canvas.
+"""
+
+import gradio as gr
+import numpy as np
+from _mock_inference import apply_bg_points, apply_boxes, apply_fg_points
+from PIL import Image
+
+from sam_prompter import SamPrompter
+
+GRID = 64
+
+
+def mock_inference(data: dict | None) -> tuple[Image.Image, list[dict]] | None:
+    if data is None or not data.get("imagePath"):
+        return None
+    image = Image.open(data["imagePath"]).convert("RGB")
+    w, h = image.size
+    masks = []
+    for obj in data.get("prompts", []):
+        mask = np.zeros((h, w), dtype=np.uint8)
+        has_fg = apply_fg_points(mask, obj, h, w)
+        has_box = apply_boxes(mask, obj, h, w)
+        apply_bg_points(mask, obj, h, w)
+        if has_fg or has_box:
+            rows = np.arange(GRID) * h // GRID
+            cols = np.arange(GRID) * w // GRID
+            logits = np.where(mask[np.ix_(rows, cols)] > 0, 8.0, -8.0).astype(np.float32)
+            masks.append({"logits": logits})
+    return image, masks
+
+
+with gr.Blocks(title="SAM Prompter Logits Test") as demo:
+    prompter = SamPrompter(label="SAM Prompter")
+    prompter.input(fn=mock_inference, inputs=prompter, outputs=prompter)
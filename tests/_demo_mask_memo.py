@@ -0,0 +1,32 @@
+"""Gradio demo with ``mask_memo=8`` that counts handler calls."""
+
+import gradio as gr
+import numpy as np
+from _mock_inference import apply_bg_points, apply_boxes, apply_fg_points
+from PIL import Image
+
+from sam_prompter import SamPrompter
+
+calls: list[dict] = []
+
+
+def mock_inference(data: dict | None) -> tuple[Image.Image, list[dict]] | None:
+    if data is None or not data.get("imagePath"):
+        return None
+    calls.append(data)
+    image = Image.open(data["imagePath"]).convert("RGB")
+    w, h = image.size
+    masks = []
+    for obj in data.get("prompts", []):
+        mask = np.zeros((h, w), dtype=np.uint8)
+        has_fg = apply_fg_points(mask, obj, h, w)
+        has_box = apply_boxes(mask, obj, h, w)
+        apply_bg_points(mask, obj, h, w)
+        if has_fg or has_box:
+            masks.append({"mask": mask})
+    return image, masks
+
+
+with gr.Blocks(title="SAM Prompter Mask Memo Test") as demo:
+    prompter = SamPrompter(label="SAM Prompter", mask_memo=8)
+    prompter.input(fn=mock_inference, inputs=prompter, outputs=prompter)
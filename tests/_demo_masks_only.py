@@ -0,0 +1,34 @@
+"""Gradio demo whose handler replies with ``SamPrompter.masks_only()``.
+
+The component starts with a Python-provided image so tests can verify
+that mask-only replies keep the displayed bitmap and the user's prompts.
+"""
+
+import gradio as gr
+import numpy as np
+from _mock_inference import apply_bg_points, apply_boxes, apply_fg_points
+from PIL import Image
+
+from sam_prompter import SamPrompter, _MasksOnly
+
+IMAGE_W, IMAGE_H = 200, 150
+
+
+def mock_inference(data: dict | None) -> _MasksOnly:
+    masks = []
+    for obj in (data or {}).get("prompts", []):
+        mask = np.zeros((IMAGE_H, IMAGE_W), dtype=np.uint8)
+        has_fg = apply_fg_points(mask, obj, IMAGE_H, IMAGE_W)
+        has_box = apply_boxes(mask, obj, IMAGE_H, IMAGE_W)
+        apply_bg_points(mask, obj, IMAGE_H, IMAGE_W)
+        if has_fg or has_box:
+            masks.append({"mask": mask})
+    return SamPrompter.masks_only(masks)
+
+
+with gr.Blocks(title="SAM Prompter Masks-Only Test") as demo:
+    prompter = SamPrompter(
+        Image.new("RGB", (IMAGE_W, IMAGE_H), color=(100, 150, 200)),
+        label="SAM Prompter",
+    )
+    prompter.input(fn=mock_inference, inputs=prompter, outputs=prompter)
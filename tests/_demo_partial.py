@@ -0,0 +1,42 @@
+"""Gradio demo with a generator handler that streams masks via ``SamPrompter.partial()``.
+
+Each object takes a second to "infer", and the final yield follows the
+last partial one after another second, so UI tests can observe partial
+masks while the request is still being processed.
+"""
+
+import time
+from collections.abc import Iterator
+
+import gradio as gr
+import numpy as np
+from _mock_inference import apply_bg_points, apply_boxes, apply_fg_points
+from PIL import Image
+
+from sam_prompter import SamPrompter, _MasksOnly, _PartialMasks
+
+_OBJECT_DELAY = 1.0
+
+
+def mock_streaming_inference(data: dict | None) -> Iterator[_PartialMasks | _MasksOnly | None]:
+    if data is None or not data.get("imagePath"):
+        yield None
+        return
+    w, h = Image.open(data["imagePath"]).size
+    masks = []
+    for i, obj in enumerate(data.get("prompts", [])):
+        time.sleep(_OBJECT_DELAY)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        has_fg = apply_fg_points(mask, obj, h, w)
+        has_box = apply_boxes(mask, obj, h, w)
+        apply_bg_points(mask, obj, h, w)
+        if has_fg or has_box:
+            masks.append({"mask": mask})
+            yield SamPrompter.partial({i: masks[-1]})
+    time.sleep(_OBJECT_DELAY)
+    yield SamPrompter.masks_only(masks)
+
+
+with gr.Blocks(title="SAM Prompter Partial Test") as demo:
+    prompter = SamPrompter(label="SAM Prompter")
+    prompter.input(fn=mock_streaming_inference, inputs=prompter, outputs=prompter)
@@ -0,0 +1,45 @@
+"""Gradio demos with slow mock inference for ``request_mode`` tests.
+
+``demo`` uses ``request_mode="pipelined"`` and ``manual_demo`` uses
+``request_mode="manual"``.  Both record the prompt dicts they receive.
+"""
+
+import time
+
+import gradio as gr
+import numpy as np
+from _mock_inference import apply_bg_points, apply_boxes, apply_fg_points
+from PIL import Image
+
+from sam_prompter import SamPrompter
+
+_INFERENCE_DELAY = 1.0
+
+received: list[dict] = []
+
+
+def mock_slow_inference(data: dict | None) -> tuple[Image.Image, list[dict]] | None:
+    if data is None or not data.get("imagePath"):
+        return None
+    received.append(data)
+    time.sleep(_INFERENCE_DELAY)
+    image = Image.open(data["imagePath"]).convert("RGB")
+    w, h = image.size
+    masks = []
+    for obj in data.get("prompts", []):
+        mask = np.zeros((h, w), dtype=np.uint8)
+        has_fg = apply_fg_points(mask, obj, h, w)
+        has_box = apply_boxes(mask, obj, h, w)
+        apply_bg_points(mask, obj, h, w)
+        if has_fg or has_box:
+            masks.append({"mask": mask})
+    return image, masks
+
+
+with gr.Blocks(title="SAM Prompter Pipelined Test") as demo:
+    prompter = SamPrompter(label="SAM Prompter", request_mode="pipelined")
+    prompter.input(fn=mock_slow_inference, inputs=prompter, outputs=prompter)
+
+with gr.Blocks(title="SAM Prompter Manual Run Test") as manual_demo:
+    manual_prompter = SamPrompter(label="SAM Prompter", request_mode="manual")
+    manual_prompter.input(fn=mock_slow_inference, inputs=manual_prompter, outputs=manual_prompter)
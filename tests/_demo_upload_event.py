@@ -0,0 +1,23 @@
+"""Gradio demo that records the prompt dicts of ``upload`` and ``input`` events."""
+
+import gradio as gr
+
+from sam_prompter import SamPrompter
+
+events: list[tuple[str, dict]] = []
+
+
+def on_upload(data: dict | None) -> None:
+    if data is not None:
+        events.append(("upload", data))
+
+
+def on_input(data: dict | None) -> None:
+    if data is not None:
+        events.append(("input", data))
+
+
+with gr.Blocks(title="SAM Prompter Upload Event Test") as demo:
+    prompter = SamPrompter(label="SAM Prompter")
+    prompter.upload(fn=on_upload, inputs=prompter, outputs=None)
+    prompter.input(fn=on_input, inputs=prompter, outputs=None)
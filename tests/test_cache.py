@@ -0,0 +1,383 @@
+"""Tests for ``sam_prompter.cache``: decoded images and embeddings."""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from sam_prompter import (
+    DecodedImage,
+    DecodedImageCache,
+    EmbeddingCache,
+    EmbeddingStore,
+    PromptBatch,
+    ResultCache,
+    SamPrompter,
+    decode_image,
+    prompt_key,
+)
+
+
+def _write_image(path: Path, color: tuple[int, int, int], mode: str = "RGB") -> Path:
+    Image.new(mode, (16, 8), color if mode == "RGB" else (*color, 255)).save(path)
+    return path
+
+
+def test_decoded_image_is_read_only_rgb(tmp_path: Path):
+    path = _write_image(tmp_path / "a.png", (10, 20, 30), mode="RGBA")
+    decoded = DecodedImageCache().get(path)
+    assert isinstance(decoded, DecodedImage)
+    assert decoded.array.shape == (8, 16, 3)
+    assert decoded.array.dtype == np.uint8
+    assert not decoded.array.flags.writeable
+    with pytest.raises(ValueError, match="read-only"):
+        decoded.array[0, 0] = 0
+    assert decoded.size == (16, 8)
+    assert decoded.image.mode == "RGB"
+    assert decoded.image.getpixel((0, 0)) == (10, 20, 30)
+    assert decoded.image is decoded.image
+
+
+def test_cache_hit_returns_same_entry(tmp_path: Path):
+    path = _write_image(tmp_path / "a.png", (1, 2, 3))
+    cache = DecodedImageCache()
+    assert cache.get(path) is cache.get(str(path))
+    assert len(cache) == 1
+
+
+def test_modified_file_is_decoded_again(tmp_path: Path):
+    path = _write_image(tmp_path / "a.png", (1, 2, 3))
+    cache = DecodedImageCache()
+    first = cache.get(path)
+    _write_image(path, (200, 100, 50))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = cache.get(path)
+    assert second is not first
+    assert tuple(second.array[0, 0]) == (200, 100, 50)
+
+
+def test_lru_eviction(tmp_path: Path):
+    cache = DecodedImageCache(maxsize=2)
+    paths = [_write_image(tmp_path / f"{i}.png", (i, i, i)) for i in range(3)]
+    first = cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])  # refresh
+    cache.get(paths[2])  # evicts paths[1]
+    assert len(cache) == 2
+    assert cache.get(paths[0]) is first
+
+
+def test_invalid_maxsize_raises():
+    with pytest.raises(ValueError, match="maxsize"):
+        DecodedImageCache(maxsize=0)
+    with pytest.raises(ValueError, match="max_bytes"):
+        DecodedImageCache(max_bytes=0)
+
+
+def test_decoded_image_nbytes_counts_pil_copy(tmp_path: Path):
+    decoded = DecodedImageCache().get(_write_image(tmp_path / "a.png", (1, 2, 3)))
+    assert decoded.nbytes == 16 * 8 * 3
+    _ = decoded.image
+    assert decoded.nbytes == 16 * 8 * 7
+
+
+def test_byte_bound_eviction(tmp_path: Path):
+    paths = [_write_image(tmp_path / f"{i}.png", (i, i, i)) for i in range(3)]
+    cache = DecodedImageCache(max_bytes=2 * 16 * 8 * 3)
+    first = cache.get(paths[0])
+    cache.get(paths[1])
+    assert len(cache) == 2
+    assert cache.nbytes == 2 * 16 * 8 * 3
+
+    # Materialising the PIL copy grows the entry; the next access evicts the oldest.
+    _ = first.image
+    second = cache.get(paths[1])
+    assert len(cache) == 1
+    assert cache.nbytes == 16 * 8 * 3
+    assert cache.get(paths[1]) is second
+    assert cache.get(paths[0]) is not first
+
+    # A single image larger than the budget is still kept.
+    tiny = DecodedImageCache(max_bytes=1)
+    decoded = tiny.get(paths[0])
+    assert tiny.get(paths[0]) is decoded
+
+
+def _cache_dir() -> Path:
+    directory = Path(SamPrompter().GRADIO_CACHE) / "decode-test"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def test_preprocess_decode_images():
+    path = _write_image(_cache_dir() / "a.png", (5, 6, 7))
+    payload = json.dumps({"imagePath": str(path), "prompts": []})
+    assert "decodedImage" not in SamPrompter().preprocess(payload)
+
+    data = SamPrompter(decode_images=True).preprocess(payload)
+    assert data["decodedImage"] is decode_image(path)
+
+    batch = SamPrompter(decode_images=True, as_arrays=True).preprocess(payload)
+    assert isinstance(batch, PromptBatch)
+    assert batch.decoded_image is data["decodedImage"]
+
+    assert "decodedImage" not in SamPrompter(decode_images=True).preprocess('{"prompts": []}')
+
+
+def test_preprocess_decode_images_skips_unusable_paths(tmp_path: Path):
+    prompter = SamPrompter(decode_images=True)
+    not_an_image = _cache_dir() / "notes.txt"
+    not_an_image.write_text("not an image")
+    paths = [
+        _write_image(tmp_path / "outside.png", (5, 6, 7)),  # outside the Gradio cache
+        _cache_dir() / "missing.png",  # e.g. removed by delete_cache
+        not_an_image,
+        _cache_dir(),  # a directory
+        Path(f"{_cache_dir()}{'/..' * 32}{tmp_path / 'outside.png'}"),  # escapes the cache through ".."
+    ]
+    for path in paths:
+        data = prompter.preprocess(json.dumps({"imagePath": str(path), "prompts": []}))
+        assert "decodedImage" not in data, path
+        assert data["imagePath"] == str(path)
+
+
+def test_digest_depends_on_pixels_only(tmp_path: Path):
+    cache = DecodedImageCache()
+    a = cache.get(_write_image(tmp_path / "a.png", (1, 2, 3)))
+    b = cache.get(_write_image(tmp_path / "b.png", (1, 2, 3)))
+    c = cache.get(_write_image(tmp_path / "c.png", (3, 2, 1)))
+    assert a.digest == b.digest
+    assert a.digest != c.digest
+
+
+# ---------------------------------------------------------------------------
+# EmbeddingCache
+# ---------------------------------------------------------------------------
+
+
+def test_embedding_cache_computes_once():
+    cache = EmbeddingCache()
+    calls = []
+
+    def compute() -> np.ndarray:
+        calls.append(1)
+        return np.ones(4)
+
+    first = cache.get_or_compute("a", compute)
+    assert cache.get_or_compute("a", compute) is first
+    assert len(calls) == 1
+    assert "a" in cache
+    assert cache.nbytes == first.nbytes
+
+
+def test_embedding_cache_evicts_by_bytes():
+    cache = EmbeddingCache(max_bytes=100)
+    cache.put("a", np.zeros(5))  # 40 bytes
+    cache.put("b", [np.zeros(5), np.zeros(1)])  # 48 bytes
+    assert cache.get("a") is not None  # refresh "a"
+    cache.put("c", np.zeros(2))  # 16 bytes -> 104, evicts "b"
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.nbytes == 56
+
+    cache.put("huge", np.zeros(100))
+    assert "huge" not in cache
+    assert len(cache) == 2
+
+
+def test_embedding_cache_single_flight():
+    cache = EmbeddingCache()
+    calls = []
+    started = threading.Event()
+
+    def compute() -> np.ndarray:
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return np.arange(3)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(4)]
+    threads[0].start()
+    started.wait()
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_embedding_cache_propagates_errors_without_caching():
+    cache = EmbeddingCache()
+
+    def fail() -> np.ndarray:
+        msg = "boom"
+        raise RuntimeError(msg)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        cache.get_or_compute("k", fail)
+    assert "k" not in cache
+    assert cache.get_or_compute("k", lambda: np.zeros(1)) is not None
+
+
+def test_invalid_max_bytes_raises():
+    with pytest.raises(ValueError, match="max_bytes"):
+        EmbeddingCache(max_bytes=0)
+
+
+# ---------------------------------------------------------------------------
+# EmbeddingStore
+# ---------------------------------------------------------------------------
+
+
+def test_embedding_store_round_trip(tmp_path: Path):
+    store = EmbeddingStore(tmp_path / "store")
+    array = np.arange(12, dtype=np.float16).reshape(3, 4)
+    assert store.get("a") is None
+    store.put("a", array)
+    assert "a" in store
+    loaded = store.get("a")
+    assert isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, array)
+    assert not loaded.flags.writeable
+
+    store.put("b", (np.zeros((2, 2)), np.ones(3, dtype=np.int32)))
+    first, second = store.get("b")
+    np.testing.assert_array_equal(first, np.zeros((2, 2)))
+    np.testing.assert_array_equal(second, np.ones(3, dtype=np.int32))
+
+    # A second store on the same root (another process) sees the entries.
+    assert EmbeddingStore(tmp_path / "store").get("a") is not None
+    assert not [p for p in (tmp_path / "store").iterdir() if p.name.startswith(".tmp-")]
+
+
+def test_embedding_store_put_existing_key_is_noop(tmp_path: Path):
+    store = EmbeddingStore(tmp_path)
+    store.put("k", [np.zeros(2)])
+    store.put("k", [np.zeros(2)])
+    assert len(store.get("k")) == 1
+
+
+def test_embedding_store_put_existing_array_key_is_noop(tmp_path: Path):
+    store = EmbeddingStore(tmp_path)
+    store.put("k", np.zeros(2))
+    stat = (tmp_path / "k.npy").stat()
+    store.put("k", np.ones(3))
+    np.testing.assert_array_equal(store.get("k"), np.zeros(2))
+    assert (tmp_path / "k.npy").stat().st_ino == stat.st_ino
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".tmp-")]
+
+
+def test_embedding_store_evicts_least_recently_used(tmp_path: Path):
+    array = np.zeros(1000, dtype=np.uint8)
+    store = EmbeddingStore(tmp_path, max_bytes=2500)
+    store.put("a", array)
+    store.put("b", array)
+    for i, key in enumerate(("b", "a")):
+        path = tmp_path / f"{key}.npy"
+        os.utime(path, (1_000_000 + i, 1_000_000 + i))
+    store.get("b")  # refreshes "b"
+    store.put("c", array)
+    assert "a" not in store
+    assert "b" in store
+    assert "c" in store
+    assert store.nbytes <= 2500
+
+
+def test_embedding_store_rejects_path_keys(tmp_path: Path):
+    store = EmbeddingStore(tmp_path)
+    for key in ("../x", "a/b", ".hidden", ""):
+        with pytest.raises(ValueError, match="key"):
+            store.put(key, np.zeros(1))
+
+
+# ---------------------------------------------------------------------------
+# ResultCache
+# ---------------------------------------------------------------------------
+
+
+def test_prompt_key_is_canonical():
+    obj = {"id": "a", "rev": 3, "points": [[1, 2]], "labels": [1], "boxes": [[0, 0, 5, 5]]}
+    assert prompt_key(obj) == prompt_key({"points": [[1.0, 2.0]], "boxes": [[0, 0, 5, 5]]})
+    assert prompt_key(obj) != prompt_key({**obj, "labels": [0]})
+    assert prompt_key(obj) != prompt_key({**obj, "boxes": []})
+    assert prompt_key({}) == prompt_key({"points": [], "labels": [], "boxes": []})
+
+
+def test_result_cache_hits_on_identical_prompts(tmp_path: Path):
+    cache = ResultCache()
+    calls = []
+
+    def compute(obj: dict) -> np.ndarray:
+        calls.append(obj["id"])
+        return np.zeros((4, 4), dtype=bool)
+
+    path = str(_write_image(tmp_path / "a.png", (1, 2, 3)))
+    data = {"imagePath": path, "prompts": [{"id": "a", "rev": 1, "points": [[1, 2]], "labels": [1]}]}
+    first = cache.resolve(data, compute)
+    # Another object (e.g. another user) with the same prompts on the same pixels, under another path
+    copy = str(_write_image(tmp_path / "b.png", (1, 2, 3)))
+    other = {"imagePath": copy, "prompts": [{"id": "b", "rev": 7, "points": [[1, 2]], "labels": [1]}]}
+    assert cache.resolve(other, compute)[0] is first[0]
+    cache.resolve({**data, "imagePath": str(_write_image(tmp_path / "c.png", (3, 2, 1)))}, compute)
+    assert calls == ["a", "a"]
+
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.entries, stats.nbytes) == (1, 2, 2, 32)
+    assert stats.hit_rate == pytest.approx(1 / 3)
+    cache.clear()
+    assert cache.stats.hits == 0
+    assert len(cache) == 0
+
+
+def test_result_cache_caches_none_and_evicts_by_bytes():
+    cache = ResultCache(max_bytes=100)
+    calls = []
+
+    def compute() -> None:
+        calls.append(1)
+
+    assert cache.get_or_compute("img", {}, compute) is None
+    assert cache.get_or_compute("img", {}, compute) is None
+    assert len(calls) == 1
+
+    cache.get_or_compute("img", {"points": [[0, 0]]}, lambda: np.zeros(8))  # 64 bytes
+    cache.get_or_compute("img", {"points": [[1, 1]]}, lambda: np.zeros(8))  # evicts the oldest
+    assert cache.stats.nbytes <= 100
+    cache.get_or_compute("img", {"points": [[0, 0]]}, lambda: np.zeros(8))
+    assert cache.stats.misses == 4
+
+    with pytest.raises(ValueError, match="max_bytes"):
+        ResultCache(max_bytes=0)
+
+
+def test_result_cache_ignores_client_image_hash(tmp_path: Path):
+    cache = ResultCache()
+    victim = {"imageHash": "h", "imagePath": str(_write_image(tmp_path / "a.png", (1, 2, 3)))}
+    attacker = {"imageHash": "h", "imagePath": str(_write_image(tmp_path / "b.png", (3, 2, 1)))}
+    prompts = [{"id": "a", "points": [[1, 2]]}]
+    cache.resolve({**attacker, "prompts": prompts}, lambda _: "planted")
+    assert cache.resolve({**victim, "prompts": prompts}, lambda _: "genuine") == ["genuine"]
+
+
+def test_result_cache_uses_decoded_image(tmp_path: Path):
+    cache = ResultCache()
+    decoded = DecodedImageCache().get(_write_image(tmp_path / "a.png", (1, 2, 3)))
+    data = {"decodedImage": decoded, "prompts": [{"points": [[1, 2]]}]}
+    cache.resolve(data, lambda _: 1)
+    assert cache.resolve(data, lambda _: 2) == [1]
+
+
+def test_result_cache_without_image_always_computes():
+    cache = ResultCache()
+    data = {"prompts": [{"points": [[1, 2]]}]}
+    cache.resolve(data, lambda _: 1)
+    cache.resolve(data, lambda _: 1)
+    assert len(cache) == 0
@@ -0,0 +1,119 @@
+"""Tests for delta mask updates (``SamPrompter.delta``)."""
+
+import json
+
+import gradio as gr
+import numpy as np
+from _demo_delta import demo
+from _helpers import upload_test_image, wait_for_container, wait_for_inference_complete, wait_for_masks_present
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import SamPrompter, _encode_mask_entries
+
+
+def _masks() -> list[np.ndarray]:
+    a = np.zeros((30, 40), dtype=np.uint8)
+    a[5:10, 5:10] = 1
+    b = np.zeros((30, 40), dtype=np.uint8)
+    b[20:25, 20:30] = 1
+    return [a, b]
+
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+
+def test_entries_carry_content_hash():
+    a, b = _masks()
+    entries = _encode_mask_entries([a, b, a.astype(bool)], None, "rle")
+    assert entries[0]["hash"] == entries[2]["hash"]
+    assert entries[0]["hash"] != entries[1]["hash"]
+
+
+def test_known_masks_are_not_encoded():
+    a, b = _masks()
+    known = _encode_mask_entries([a], None, "rle")[0]["hash"]
+    first, second = _encode_mask_entries([a, b], None, "rle", known_hashes={known})
+    assert first == {"hash": known}
+    assert "rle" in second
+
+
+def test_postprocess_delta():
+    a, b = _masks()
+    with gr.Blocks():
+        comp = SamPrompter()
+    full = json.loads(comp.postprocess(SamPrompter.masks_only([{"mask": a}, {"mask": b}])))
+    data = {"prompts": [], "maskHashes": [full["masks"][0]["hash"]]}
+    payload = json.loads(comp.postprocess(SamPrompter.delta(SamPrompter.masks_only([{"mask": a}, {"mask": b}]), data)))
+    assert "rle" not in payload["masks"][0]
+    assert payload["masks"][0]["hash"] == full["masks"][0]["hash"]
+    assert payload["masks"][1]["rle"] == full["masks"][1]["rle"]
+
+
+def test_delta_without_hashes_sends_everything():
+    a, _ = _masks()
+    with gr.Blocks():
+        comp = SamPrompter()
+    payload = json.loads(comp.postprocess(SamPrompter.delta(SamPrompter.masks_only([{"mask": a}]), None)))
+    assert "rle" in payload["masks"][0]
+
+
+def test_delta_nests_with_clear():
+    a, _ = _masks()
+    with gr.Blocks():
+        comp = SamPrompter()
+    value = SamPrompter.clear(SamPrompter.delta(SamPrompter.masks_only([{"mask": a}]), {"prompts": []}))
+    payload = json.loads(comp.postprocess(value))
+    assert payload["clearPrompts"] is True
+    assert "rle" in payload["masks"][0]
+
+
+# ---------------------------------------------------------------------------
+# UI test
+# ---------------------------------------------------------------------------
+
+
+def test_unchanged_mask_keeps_its_canvas():
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 50, box["y"] + 40)
+            wait_for_inference_complete(page)
+            wait_for_masks_present(page)
+
+            page.evaluate("""() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                window.__firstMaskCanvas = s.maskCanvases[0];
+            }""")
+
+            # A prompt on a second object must not touch the first object's mask.
+            page.click(".sam-prompter-container .add-object-btn")
+            page.wait_for_timeout(300)
+            page.mouse.click(box["x"] + 130, box["y"] + 80)
+            wait_for_inference_complete(page)
+
+            state = page.evaluate("""() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                return {
+                    sameCanvas: s.maskCanvases[0] === window.__firstMaskCanvas,
+                    hasSecond: !!s.maskCanvases[1],
+                    firstHasRle: !!(s.rawMasks[0] && s.rawMasks[0].rle)
+                };
+            }""")
+            assert state["sameCanvas"], "Unchanged mask should keep its decoded canvas"
+            assert state["hasSecond"], "Second object should have a mask"
+            assert state["firstHasRle"], "Raw data of an unchanged mask is kept for re-decoding"
+
+            browser.close()
+    finally:
+        demo.close()
@@ -0,0 +1,140 @@
+"""Tests for the downscaled display proxy (``max_display_side``)."""
+
+import json
+from pathlib import Path
+
+import gradio as gr
+import numpy as np
+import pytest
+from _demo_display_proxy import IMAGE_H, IMAGE_W, MAX_DISPLAY_SIDE, demo, received
+from _helpers import wait_for_container, wait_for_image_loaded, wait_for_inference_complete, wait_for_masks_present
+from PIL import Image
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import SamPrompter, _display_size, _encode_masks_to_rle
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+
+def test_display_size_keeps_small_images():
+    assert _display_size(300, 200, 400) == (300, 200)
+    assert _display_size(300, 200, None) == (300, 200)
+
+
+def test_display_size_fits_longer_side():
+    assert _display_size(4000, 3000, 1000) == (1000, 750)
+    assert _display_size(3000, 4000, 1000) == (750, 1000)
+
+
+def test_batch_rle_max_side_downsamples():
+    mask = np.zeros((400, 800), dtype=bool)
+    mask[:, 400:] = True
+    for masks in (mask[None], [mask]):
+        (rle,) = _encode_masks_to_rle(masks, max_side=100)
+        assert rle["size"] == [50, 100]
+        # Left half (50 columns x 50 rows) is background, right half foreground.
+        assert rle["counts"] == [2500, 2500]
+
+
+def test_postprocess_max_display_side():
+    img = Image.new("RGB", (800, 600), color=(1, 2, 3))
+    mask = np.ones((600, 800), dtype=np.uint8)
+    with gr.Blocks():
+        comp = SamPrompter(max_display_side=200)
+    payload = json.loads(comp.postprocess((img, [{"mask": mask}])))
+    assert (payload["width"], payload["height"]) == (800, 600)
+    assert payload["masks"][0]["rle"]["size"] == [150, 200]
+    with Image.open(payload["image"].removeprefix("/gradio_api/file=")) as shown:
+        assert shown.size == (200, 150)
+
+
+def test_downscaled_file_source_sends_full_resolution_path(tmp_path: Path):
+    path = tmp_path / "big.png"
+    Image.new("RGB", (800, 600), color=(4, 5, 6)).save(path)
+    with gr.Blocks():
+        comp = SamPrompter(max_display_side=200)
+    payload = json.loads(comp.postprocess(str(path)))
+    with Image.open(payload["imagePath"]) as full:
+        assert full.size == (payload["width"], payload["height"]) == (800, 600)
+    assert Path(payload["imagePath"]).resolve().is_relative_to(Path(comp.GRADIO_CACHE).resolve())
+
+    # A second call hits the display cache and still names the full-resolution file.
+    assert json.loads(comp.postprocess(str(path)))["imagePath"] == payload["imagePath"]
+
+
+def test_image_path_only_for_downscaled_file_sources(tmp_path: Path):
+    path = tmp_path / "small.png"
+    Image.new("RGB", (100, 80), color=(4, 5, 6)).save(path)
+    with gr.Blocks():
+        comp = SamPrompter(max_display_side=200)
+    assert "imagePath" not in json.loads(comp.postprocess(str(path)))
+    assert "imagePath" not in json.loads(comp.postprocess(Image.new("RGB", (800, 600), color=(7, 8, 9))))
+
+
+def test_masks_only_max_display_side():
+    mask = np.ones((600, 800), dtype=np.uint8)
+    with gr.Blocks():
+        comp = SamPrompter(max_display_side=200)
+    payload = json.loads(comp.postprocess(SamPrompter.masks_only([{"mask": mask}])))
+    assert payload["masks"][0]["rle"]["size"] == [150, 200]
+
+
+def test_invalid_max_display_side_raises():
+    with gr.Blocks(), pytest.raises(ValueError, match="max_display_side"):
+        SamPrompter(max_display_side=0)
+
+
+# ---------------------------------------------------------------------------
+# UI test
+# ---------------------------------------------------------------------------
+
+
+def test_downscaled_display_keeps_original_coordinates():
+    received.clear()
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            wait_for_image_loaded(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + box["width"] / 2, box["y"] + box["height"] / 2)
+            wait_for_inference_complete(page)
+            wait_for_masks_present(page)
+
+            state = page.evaluate("""() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                var c = document.querySelector('.sam-prompter-container canvas');
+                return {
+                    naturalWidth: s.naturalWidth,
+                    naturalHeight: s.naturalHeight,
+                    imageWidth: s.image.naturalWidth,
+                    canvasWidth: c.width,
+                    maskWidth: s.maskCanvases[0].width,
+                    point: s.objects[0].points[0]
+                };
+            }""")
+            assert (state["naturalWidth"], state["naturalHeight"]) == (IMAGE_W, IMAGE_H)
+            assert state["imageWidth"] == MAX_DISPLAY_SIDE
+            assert state["canvasWidth"] == MAX_DISPLAY_SIDE
+            assert state["maskWidth"] == MAX_DISPLAY_SIDE
+            # The click at the canvas centre maps to the original image centre.
+            assert abs(state["point"][0] - IMAGE_W / 2) <= 8
+            assert abs(state["point"][1] - IMAGE_H / 2) <= 8
+
+            # The handler gets the full-resolution file, not the display copy.
+            data = received[-1]
+            assert (data["imageSize"]["width"], data["imageSize"]["height"]) == (IMAGE_W, IMAGE_H)
+            with Image.open(data["imagePath"]) as opened:
+                assert opened.size == (IMAGE_W, IMAGE_H)
+
+            browser.close()
+    finally:
+        demo.close()
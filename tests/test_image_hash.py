@@ -0,0 +1,55 @@
+"""Tests for the client-side content hash of uploaded images (``imageHash``)."""
+
+import hashlib
+from pathlib import Path
+
+from _demo_image_hash import demo, received
+from _helpers import upload_test_image, wait_for_container
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import PromptBatch
+
+# ---------------------------------------------------------------------------
+# Unit test
+# ---------------------------------------------------------------------------
+
+
+def test_prompt_batch_exposes_image_hash():
+    assert PromptBatch.from_dict({"prompts": [], "imageHash": "ab12"}).image_hash == "ab12"
+    assert PromptBatch.from_dict({"prompts": []}).image_hash is None
+
+
+# ---------------------------------------------------------------------------
+# UI test
+# ---------------------------------------------------------------------------
+
+
+def test_payload_carries_sha256_of_uploaded_file():
+    received.clear()
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 50, box["y"] + 40)
+            # The payload is deferred until both the upload and the hash are done.
+            for _ in range(100):
+                if received:
+                    break
+                page.wait_for_timeout(100)
+
+            assert received, "Handler should have received the prompt data"
+            data = received[-1]
+            expected = hashlib.sha256(Path(data["imagePath"]).read_bytes()).hexdigest()
+            assert data["imageHash"] == expected
+
+            browser.close()
+    finally:
+        demo.close()
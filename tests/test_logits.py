@@ -0,0 +1,119 @@
+"""Tests for low-resolution logit masks upsampled on the client."""
+
+import base64
+import json
+import zlib
+
+import gradio as gr
+import numpy as np
+import pytest
+from _demo_logits import demo
+from _helpers import upload_test_image, wait_for_container, wait_for_inference_complete, wait_for_masks_present
+from PIL import Image
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import SamPrompter, _encode_logits
+
+
+def _grid(entry: dict) -> np.ndarray:
+    h, w = entry["logits"]["size"]
+    data = zlib.decompress(base64.b64decode(entry["logits"]["data"]))
+    return np.frombuffer(data, dtype=np.uint8).reshape(h, w)
+
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+
+def test_logits_are_sigmoid_quantized():
+    logits = np.array([[-100.0, 0.0], [2.0, 100.0]], dtype=np.float32)
+    entry = _encode_logits(logits, (20, 20))
+    assert entry["frame"] == [20, 20]
+    np.testing.assert_array_equal(_grid(entry), [[0, 128], [225, 255]])
+
+
+def test_binary_low_res_mask():
+    entry = _encode_logits(np.array([[True, False]]), (10, 20))
+    np.testing.assert_array_equal(_grid(entry), [[255, 0]])
+
+
+def test_padded_grid_is_cropped_to_image_aspect():
+    logits = np.zeros((1, 256, 256), dtype=np.float32)
+    entry = _encode_logits(logits, (600, 800), padded=True)
+    assert entry["logits"]["size"] == [192, 256]
+
+
+def test_multimask_logits_raise():
+    with pytest.raises(ValueError, match="logits"):
+        _encode_logits(np.zeros((1, 3, 256, 256), dtype=np.float32), (600, 800))
+    with pytest.raises(ValueError, match="logits"):
+        _encode_logits(np.zeros(16, dtype=np.float32), (4, 4))
+    assert _encode_logits(np.zeros((1, 1, 4, 4), dtype=np.float32), (4, 4))["logits"]["size"] == [4, 4]
+
+
+def test_known_logits_are_not_sent():
+    logits = np.ones((8, 8), dtype=np.float32)
+    known = _encode_logits(logits, (16, 16))["hash"]
+    assert _encode_logits(logits, (16, 16), known_hashes={known}) == {"hash": known}
+
+
+def test_postprocess_logits_use_image_size():
+    img = Image.new("RGB", (80, 60))
+    with gr.Blocks():
+        comp = SamPrompter(max_display_side=40)
+    payload = json.loads(comp.postprocess((img, [{"logits": np.zeros((16, 16)), "alpha": 0.3}])))
+    (entry,) = payload["masks"]
+    assert entry["frame"] == [30, 40]
+    assert entry["alpha"] == 0.3
+
+
+def test_masks_only_logits_need_size():
+    with gr.Blocks():
+        comp = SamPrompter()
+    with pytest.raises(ValueError, match="size"):
+        comp.postprocess(SamPrompter.masks_only([{"logits": np.zeros((16, 16))}]))
+    payload = json.loads(comp.postprocess(SamPrompter.masks_only([{"logits": np.zeros((16, 16)), "size": (30, 40)}])))
+    assert payload["masks"][0]["frame"] == [30, 40]
+
+
+# ---------------------------------------------------------------------------
+# UI test
+# ---------------------------------------------------------------------------
+
+
+def test_logit_mask_is_upsampled_to_image():
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 50, box["y"] + 40)
+            wait_for_inference_complete(page)
+            wait_for_masks_present(page)
+
+            state = page.evaluate("""() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                var mc = s.maskCanvases[0];
+                var d = mc.getContext('2d').getImageData(0, 0, mc.width, mc.height).data;
+                var partial = 0, full = 0;
+                for (var i = 3; i < d.length; i += 4) {
+                    if (d[i] === 255) full++;
+                    else if (d[i] > 0) partial++;
+                }
+                return {width: mc.width, naturalWidth: s.naturalWidth, full: full, partial: partial};
+            }""")
+            assert state["width"] == state["naturalWidth"]
+            assert state["full"] > 0, "Upsampled mask should have foreground pixels"
+            assert state["partial"] == 0, "Upsampled mask should be thresholded"
+
+            browser.close()
+    finally:
+        demo.close()
@@ -0,0 +1,203 @@
+"""Tests for the mask transport encodings (``mask_encoding``)."""
+
+import base64
+import json
+import zlib
+
+import gradio as gr
+import numpy as np
+import pytest
+from _demo_bitmap import demo
+from _demo_cropped import demo as cropped_demo
+from _helpers import upload_test_image, wait_for_container, wait_for_inference_complete, wait_for_masks_present
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import SamPrompter, _encode_mask_entries, _encode_masks_to_rle
+
+
+def _decode_bitmap(bitmap: dict) -> np.ndarray:
+    h, w = bitmap["size"]
+    bits = np.frombuffer(zlib.decompress(base64.b64decode(bitmap["data"])), dtype=np.uint8)
+    return np.unpackbits(bits)[: h * w].reshape((h, w), order="F")
+
+
+def _noisy_mask(h: int = 64, w: int = 80) -> np.ndarray:
+    return np.random.default_rng(0).random((h, w)) > 0.5
+
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+
+def test_bitmap_round_trip():
+    mask = _noisy_mask()
+    (entry,) = _encode_mask_entries([mask], None, "bitmap")
+    assert entry["bitmap"]["size"] == [64, 80]
+    np.testing.assert_array_equal(_decode_bitmap(entry["bitmap"]), mask)
+
+
+def test_bitmap_round_trip_stacked_odd_size():
+    masks = np.zeros((2, 7, 5), dtype=np.uint8)
+    masks[0, 1:4, 2] = 1
+    masks[1, 6, 4] = 1
+    entries = _encode_mask_entries(masks, None, "bitmap")
+    for entry, mask in zip(entries, masks, strict=True):
+        np.testing.assert_array_equal(_decode_bitmap(entry["bitmap"]), mask)
+
+
+def test_auto_picks_encoding_per_mask():
+    simple = np.zeros((64, 80), dtype=bool)
+    simple[10:30, 10:30] = True
+    entries = _encode_mask_entries([simple, _noisy_mask()], None, "auto")
+    assert "rle" in entries[0]
+    assert "bitmap" in entries[1]
+
+
+def _coco_reference(counts: list[int]) -> str:
+    """Pure-Python port of pycocotools' ``rleToString``."""
+    out = []
+    for i, count in enumerate(counts):
+        x = count - counts[i - 2] if i > 2 else count
+        more = True
+        while more:
+            c = x & 0x1F
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            out.append(chr(c + 48))
+    return "".join(out)
+
+
+def test_coco_counts_match_reference():
+    masks = [_noisy_mask(), np.ones((300, 400), dtype=bool), np.zeros((3, 3), dtype=bool)]
+    coco = _encode_mask_entries(masks, None, "coco")
+    plain = _encode_masks_to_rle(masks)
+    for entry, rle in zip(coco, plain, strict=True):
+        assert entry["rle"]["size"] == rle["size"]
+        assert entry["rle"]["counts"] == _coco_reference(rle["counts"])
+
+
+def test_postprocess_bitmap_payload():
+    mask = _noisy_mask()
+    with gr.Blocks():
+        comp = SamPrompter(mask_encoding="bitmap")
+    payload = json.loads(comp.postprocess(SamPrompter.masks_only([{"mask": mask, "alpha": 0.5}])))
+    (entry,) = payload["masks"]
+    assert "rle" not in entry
+    assert entry["alpha"] == 0.5
+    np.testing.assert_array_equal(_decode_bitmap(entry["bitmap"]), mask)
+
+
+@pytest.mark.parametrize("encoding", ["rle", "coco", "bitmap"])
+def test_crop_to_bbox(encoding: str):
+    mask = np.zeros((60, 80), dtype=bool)
+    mask[10:20, 30:35] = True
+    mask[15, 40] = True
+    (entry,) = _encode_mask_entries([mask], None, encoding, crop=True)
+    assert entry["bbox"] == [30, 10, 11, 10]
+    assert entry["frame"] == [60, 80]
+    if encoding == "bitmap":
+        cropped = _decode_bitmap(entry["bitmap"])
+    else:
+        (expected,) = _encode_masks_to_rle([mask[10:20, 30:41]])
+        assert entry["rle"]["size"] == [10, 11]
+        if encoding == "rle":
+            assert list(entry["rle"]["counts"]) == expected["counts"]
+        cropped = mask[10:20, 30:41]
+    np.testing.assert_array_equal(cropped, mask[10:20, 30:41])
+
+
+def test_crop_empty_mask():
+    (entry,) = _encode_mask_entries([np.zeros((6, 8), dtype=bool)], None, "rle", crop=True)
+    assert entry["bbox"] == [0, 0, 0, 0]
+    assert entry["rle"]["size"] == [0, 0]
+
+
+def test_postprocess_crop_masks():
+    mask = np.zeros((40, 50), dtype=np.uint8)
+    mask[5:9, 7:10] = 1
+    with gr.Blocks():
+        comp = SamPrompter(crop_masks=True)
+    (entry,) = json.loads(comp.postprocess(SamPrompter.masks_only([{"mask": mask}])))["masks"]
+    assert entry["bbox"] == [7, 5, 3, 4]
+    assert entry["frame"] == [40, 50]
+
+
+def test_invalid_mask_encoding_raises():
+    with gr.Blocks(), pytest.raises(ValueError, match="mask_encoding"):
+        SamPrompter(mask_encoding="png")
+
+
+# ---------------------------------------------------------------------------
+# UI test
+# ---------------------------------------------------------------------------
+
+
+def test_bitmap_masks_are_decoded():
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 50, box["y"] + 40)
+            wait_for_inference_complete(page)
+            wait_for_masks_present(page)
+
+            painted = page.evaluate("""() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                var mc = s.maskCanvases[0];
+                var d = mc.getContext('2d').getImageData(0, 0, mc.width, mc.height).data;
+                var n = 0;
+                for (var i = 3; i < d.length; i += 4) if (d[i] > 0) n++;
+                return {n: n, hasBitmap: !!s.rawMasks[0].bitmap};
+            }""")
+            assert painted["hasBitmap"]
+            assert painted["n"] > 0, "Bitmap mask should paint foreground pixels"
+
+            browser.close()
+    finally:
+        demo.close()
+
+
+def test_cropped_mask_canvas_covers_bbox_only():
+    _, url, _ = cropped_demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 50, box["y"] + 40)
+            wait_for_inference_complete(page)
+            wait_for_masks_present(page)
+
+            state = page.evaluate("""() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                var mc = s.maskCanvases[0];
+                return {
+                    maskWidth: mc.width,
+                    naturalWidth: s.naturalWidth,
+                    bbox: mc.maskPlacement && mc.maskPlacement.bbox
+                };
+            }""")
+            assert state["bbox"], "Cropped mask canvas should carry its placement"
+            assert state["maskWidth"] == state["bbox"][2]
+            assert state["maskWidth"] < state["naturalWidth"]
+
+            browser.close()
+    finally:
+        cropped_demo.close()
@@ -0,0 +1,71 @@
+"""Tests for the browser-side mask memo (``mask_memo``)."""
+
+import pytest
+from _demo_mask_memo import calls, demo
+from _helpers import upload_test_image, wait_for_container, wait_for_inference_complete
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import SamPrompter
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+
+def test_invalid_mask_memo_raises():
+    with pytest.raises(ValueError, match="mask_memo"):
+        SamPrompter(mask_memo=-1)
+
+
+def test_mask_memo_is_passed_to_frontend():
+    assert SamPrompter(mask_memo=4).props["mask_memo"] == 4
+    assert SamPrompter().props["mask_memo"] == 0
+
+
+# ---------------------------------------------------------------------------
+# UI test
+# ---------------------------------------------------------------------------
+
+
+def test_undo_to_known_state_skips_request():
+    calls.clear()
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            get_state = """() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                return {
+                    processing: s.isProcessing,
+                    masks: s.rawMasks.map(function (m) { return m ? m.hash || JSON.stringify(m.rle) : null; }),
+                    points: s.objects[0].points.length,
+                };
+            }"""
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 50, box["y"] + 40)
+            wait_for_inference_complete(page)
+            first = page.evaluate(get_state)
+            page.mouse.click(box["x"] + 130, box["y"] + 80)
+            wait_for_inference_complete(page)
+            second = page.evaluate(get_state)
+            assert len(calls) == 2
+            assert second["masks"] != first["masks"]
+
+            page.keyboard.press("z")
+            after_undo = page.evaluate(get_state)
+            assert not after_undo["processing"], "A remembered state must not lock the canvas"
+            assert after_undo["masks"] == first["masks"]
+            assert after_undo["points"] == 1
+            page.wait_for_timeout(500)
+            assert len(calls) == 2, "Undo to a remembered state must not call the handler"
+
+            browser.close()
+    finally:
+        demo.close()
@@ -0,0 +1,104 @@
+"""Tests for SamPrompter.masks_only() and the image-identity protocol."""
+
+import json
+
+import gradio as gr
+import numpy as np
+from _demo_masks_only import demo
+from _helpers import wait_for_container, wait_for_image_loaded, wait_for_inference_complete, wait_for_masks_present
+from PIL import Image
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import SamPrompter
+
+# ---------------------------------------------------------------------------
+# Unit tests — postprocess payload
+# ---------------------------------------------------------------------------
+
+
+def test_masks_only_payload_has_no_image():
+    mask = np.ones((40, 50), dtype=np.uint8)
+    with gr.Blocks():
+        comp = SamPrompter()
+    payload = json.loads(comp.postprocess(SamPrompter.masks_only([{"mask": mask}])))
+    assert set(payload) == {"masks"}
+    assert payload["masks"][0]["rle"]["size"] == [40, 50]
+
+
+def test_masks_only_empty_list():
+    with gr.Blocks():
+        comp = SamPrompter()
+    payload = json.loads(comp.postprocess(SamPrompter.masks_only([])))
+    assert payload == {"masks": []}
+
+
+def test_clear_with_masks_only():
+    mask = np.ones((40, 50), dtype=np.uint8)
+    with gr.Blocks():
+        comp = SamPrompter()
+    payload = json.loads(comp.postprocess(SamPrompter.clear(SamPrompter.masks_only([{"mask": mask}]))))
+    assert payload["clearPrompts"] is True
+    assert "image" not in payload
+    assert len(payload["masks"]) == 1
+
+
+def test_image_id_is_stable_for_same_content():
+    with gr.Blocks():
+        comp = SamPrompter()
+    first = json.loads(comp.postprocess(Image.new("RGB", (60, 40), color=(1, 2, 3))))
+    second = json.loads(comp.postprocess(Image.new("RGB", (60, 40), color=(1, 2, 3))))
+    other = json.loads(comp.postprocess(Image.new("RGB", (60, 40), color=(3, 2, 1))))
+    assert first["imageId"] == second["imageId"]
+    assert first["imageId"] != other["imageId"]
+
+
+def test_process_example_masks_only_returns_none():
+    with gr.Blocks():
+        comp = SamPrompter()
+    assert comp.process_example(SamPrompter.masks_only([])) is None
+
+
+# ---------------------------------------------------------------------------
+# UI test — masks-only reply keeps the Python-provided image
+# ---------------------------------------------------------------------------
+
+
+def test_masks_only_reply_keeps_image_and_prompts():
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            wait_for_image_loaded(page)
+
+            page.evaluate("""() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                window.__initialImage = s.image;
+            }""")
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + box["width"] / 2, box["y"] + box["height"] / 2)
+            wait_for_inference_complete(page)
+            wait_for_masks_present(page)
+
+            state = page.evaluate("""() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                return {
+                    sameImage: s.image === window.__initialImage,
+                    imageSource: s.imageSource,
+                    imageId: s.imageId,
+                    points: s.objects[0].points.length
+                };
+            }""")
+            assert state["sameImage"], "Masks-only reply must not reload the image"
+            assert state["imageSource"] == "python"
+            assert state["imageId"], "Python-provided image should carry an imageId"
+            assert state["points"] == 1, "Prompts must survive a masks-only reply"
+
+            browser.close()
+    finally:
+        demo.close()
@@ -0,0 +1,123 @@
+"""Tests for stable object ids / revisions and ``ObjectMaskCache``."""
+
+import numpy as np
+import pytest
+from _demo import demo
+from _helpers import upload_test_image, wait_for_container, wait_for_inference_complete
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import ObjectMaskCache, PromptBatch
+
+
+def _data(*objects: tuple[str, int], image: str = "img") -> dict:
+    return {
+        "imagePath": image,
+        "prompts": [{"id": i, "rev": r, "points": [[r, r]], "labels": [1], "boxes": []} for i, r in objects],
+    }
+
+
+class _Counter:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, int]] = []
+
+    def __call__(self, obj: dict) -> np.ndarray:
+        self.calls.append((obj.get("id"), obj["rev"]))
+        return np.full((2, 2), obj["rev"])
+
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+
+def test_only_dirty_objects_are_computed():
+    cache = ObjectMaskCache()
+    compute = _Counter()
+    first = cache.resolve(_data(("a", 1), ("b", 1)), compute)
+    second = cache.resolve(_data(("a", 1), ("b", 2)), compute)
+    assert compute.calls == [("a", 1), ("b", 1), ("b", 2)]
+    assert second[0] is first[0]
+    assert second[1][0, 0] == 2
+
+
+def test_other_image_is_recomputed():
+    cache = ObjectMaskCache()
+    compute = _Counter()
+    cache.resolve(_data(("a", 1)), compute)
+    cache.resolve(_data(("a", 1), image="other"), compute)
+    cache.resolve({**_data(("a", 1)), "imageHash": "h"}, compute)
+    assert len(compute.calls) == 3
+
+
+def test_objects_without_id_are_always_computed():
+    cache = ObjectMaskCache()
+    compute = _Counter()
+    data = {"imagePath": "img", "prompts": [{"id": "a", "rev": 0}, {"id": "b", "rev": 0}]}
+    del data["prompts"][1]["id"]
+    cache.resolve(data, compute)
+    cache.resolve(data, compute)
+    cache.resolve({"prompts": data["prompts"]}, compute)  # no image
+    assert len(compute.calls) == 5
+
+
+def test_maxsize_evicts_oldest_object():
+    cache = ObjectMaskCache(maxsize=2)
+    compute = _Counter()
+    cache.resolve(_data(("a", 0), ("b", 0), ("c", 0)), compute)
+    assert len(cache) == 2
+    cache.resolve(_data(("a", 0)), compute)
+    assert compute.calls[-1] == ("a", 0)
+    with pytest.raises(ValueError, match="maxsize"):
+        ObjectMaskCache(maxsize=0)
+
+
+def test_prompt_batch_ids_and_revisions():
+    batch = PromptBatch.from_dict(_data(("a", 3), ("b", 0)))
+    assert batch.object_ids == ["a", "b"]
+    np.testing.assert_array_equal(batch.revisions, [3, 0])
+    assert PromptBatch.from_dict({"prompts": [{"points": []}]}).object_ids == [None]
+
+
+# ---------------------------------------------------------------------------
+# UI test
+# ---------------------------------------------------------------------------
+
+
+def test_object_ids_are_stable_and_revisions_increase():
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            get_objects = """() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                return s.objects.map(function (o) { return {id: o.id, rev: o.rev}; });
+            }"""
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 50, box["y"] + 40)
+            wait_for_inference_complete(page)
+            (first,) = page.evaluate(get_objects)
+            assert first["rev"] == 1
+
+            page.click(".sam-prompter-container .add-object-btn")
+            page.mouse.click(box["x"] + 130, box["y"] + 80)
+            wait_for_inference_complete(page)
+            a, b = page.evaluate(get_objects)
+            assert a == first, "An untouched object keeps its id and revision"
+            assert b["id"] != a["id"]
+            assert b["rev"] == 1
+
+            page.keyboard.press("z")
+            wait_for_inference_complete(page)
+            _, b_after_undo = page.evaluate(get_objects)
+            assert b_after_undo == {"id": b["id"], "rev": 2}
+
+            browser.close()
+    finally:
+        demo.close()
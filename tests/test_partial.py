@@ -0,0 +1,104 @@
+"""Tests for streaming partial mask updates (``SamPrompter.partial()``)."""
+
+import json
+
+import gradio as gr
+import numpy as np
+from _demo_partial import demo
+from _helpers import upload_test_image, wait_for_container, wait_for_inference_complete
+from playwright.sync_api import Page, sync_playwright
+
+from sam_prompter import ObjectMaskCache, SamPrompter
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+
+def test_partial_payload_lists_object_indices():
+    mask = np.ones((40, 50), dtype=np.uint8)
+    with gr.Blocks():
+        comp = SamPrompter()
+    payload = json.loads(comp.postprocess(SamPrompter.partial({2: {"mask": mask}, 0: {"mask": mask}})))
+    assert set(payload) == {"masks", "objectIndices", "partial"}
+    assert payload["partial"] is True
+    assert payload["objectIndices"] == [0, 2]
+    assert payload["masks"][0]["rle"]["size"] == [40, 50]
+    # Default colors follow the object index, not the position in the payload.
+    full = json.loads(comp.postprocess(SamPrompter.masks_only([{"mask": mask}] * 3)))
+    assert payload["masks"][1]["color"] == full["masks"][2]["color"]
+
+
+def test_partial_with_delta_sends_hash_only():
+    mask = np.ones((40, 50), dtype=np.uint8)
+    with gr.Blocks():
+        comp = SamPrompter()
+    first = json.loads(comp.postprocess(SamPrompter.partial({0: {"mask": mask}})))
+    known = {"prompts": [], "maskHashes": [first["masks"][0]["hash"]]}
+    again = json.loads(comp.postprocess(SamPrompter.delta(SamPrompter.partial({0: {"mask": mask}}), known)))
+    assert "rle" not in again["masks"][0]
+    assert again["partial"] is True
+
+
+def test_iter_resolve_is_lazy():
+    cache = ObjectMaskCache()
+    calls = []
+    data = {"imagePath": "img", "prompts": [{"id": "a", "rev": 0}, {"id": "b", "rev": 0}]}
+    results = cache.iter_resolve(data, lambda obj: calls.append(obj["id"]) or obj["id"])
+    assert next(results) == "a"
+    assert calls == ["a"]
+    assert list(results) == ["b"]
+    assert cache.resolve(data, lambda _: "x") == ["a", "b"]
+
+
+# ---------------------------------------------------------------------------
+# UI test
+# ---------------------------------------------------------------------------
+
+
+def _state(page: Page) -> dict:
+    return page.evaluate("""() => {
+        var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+        return {
+            processing: s.isProcessing,
+            masks: s.maskCanvases.map(function (c) { return !!c; }),
+        };
+    }""")
+
+
+def test_partial_masks_appear_before_final_yield():
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 50, box["y"] + 40)
+            wait_for_inference_complete(page)
+            page.click(".sam-prompter-container .add-object-btn")
+            page.mouse.click(box["x"] + 130, box["y"] + 80)
+
+            # The second object's mask arrives after ~2 s, the final yield after ~3 s.
+            seen_partial = False
+            for _ in range(60):
+                state = _state(page)
+                if state["processing"] and state["masks"] == [True, True]:
+                    seen_partial = True
+                    break
+                page.wait_for_timeout(50)
+            assert seen_partial, "The second mask must be shown while the request is still running"
+
+            wait_for_inference_complete(page)
+            final = _state(page)
+            assert not final["processing"]
+            assert final["masks"] == [True, True]
+
+            browser.close()
+    finally:
+        demo.close()
@@ -0,0 +1,85 @@
+"""Tests for ``PromptBatch`` (``as_arrays=True``)."""
+
+import json
+
+import numpy as np
+import pytest
+
+from sam_prompter import PromptBatch, SamPrompter, parse_prompt_value
+from sam_prompter.prompts import LABEL_PAD_VALUE
+
+_DATA = {
+    "imagePath": "/cache/image.png",
+    "imageSize": {"width": 200, "height": 100},
+    "prompts": [
+        {"points": [[10, 20], [30, 40], [50, 60]], "labels": [1, 0, 1], "boxes": []},
+        {"points": [], "labels": [], "boxes": [[5, 5, 100, 50]]},
+        {"points": [[1, 2]], "labels": [0], "boxes": [[0, 0, 10, 10], [20, 20, 40, 40]]},
+    ],
+}
+
+
+def test_from_dict_pads_to_largest_object():
+    batch = PromptBatch.from_dict(_DATA)
+    assert len(batch) == 3
+    assert batch.points.shape == (3, 3, 2)
+    assert batch.points.dtype == np.float32
+    assert batch.labels.shape == (3, 3)
+    assert batch.boxes.shape == (3, 2, 4)
+    np.testing.assert_array_equal(batch.labels[0], [1, 0, 1])
+    np.testing.assert_array_equal(batch.labels[1], [LABEL_PAD_VALUE] * 3)
+    np.testing.assert_array_equal(batch.labels[2], [0, LABEL_PAD_VALUE, LABEL_PAD_VALUE])
+    np.testing.assert_array_equal(batch.point_mask, [[True, True, True], [False, False, False], [True, False, False]])
+    np.testing.assert_array_equal(batch.box_mask, [[False, False], [True, False], [True, True]])
+    np.testing.assert_array_equal(batch.points[2, 0], [1, 2])
+    np.testing.assert_array_equal(batch.boxes[1, 0], [5, 5, 100, 50])
+    assert not batch.points[~batch.point_mask].any()
+    assert not batch.boxes[~batch.box_mask].any()
+
+
+def test_from_dict_without_prompts():
+    batch = PromptBatch.from_dict({"prompts": [{"points": [], "labels": [], "boxes": []}]})
+    assert batch.points.shape == (1, 0, 2)
+    assert batch.boxes.shape == (1, 0, 4)
+    np.testing.assert_array_equal(batch.has_prompts, [False])
+    assert batch.image_size is None
+
+
+def test_metadata_properties():
+    batch = PromptBatch.from_dict(_DATA)
+    assert batch.image_path == "/cache/image.png"
+    assert batch.image_size == (200, 100)
+    np.testing.assert_array_equal(batch.has_prompts, [True, True, True])
+
+
+def test_resize_longest_side_matches_sam_transform():
+    batch = PromptBatch.from_dict(_DATA).resize_longest_side(1024)
+    # 200x100 -> 1024x512
+    np.testing.assert_allclose(batch.points[0, 0], [10 * 5.12, 20 * 5.12])
+    np.testing.assert_allclose(batch.boxes[1, 0], [5 * 5.12, 5 * 5.12, 100 * 5.12, 50 * 5.12])
+    assert not batch.points[~batch.point_mask].any()
+
+    # 3x7 -> round(1024 * 3 / 7) = 439 wide, 1024 high
+    odd = PromptBatch.from_dict({"prompts": [{"points": [[3, 7]], "labels": [1], "boxes": []}]})
+    np.testing.assert_allclose(odd.resize_longest_side(1024, (3, 7)).points[0, 0], [439, 1024], rtol=1e-6)
+
+
+def test_resize_longest_side_requires_size():
+    batch = PromptBatch.from_dict({"prompts": []})
+    with pytest.raises(ValueError, match="image_size"):
+        batch.resize_longest_side(1024)
+
+
+def test_preprocess_as_arrays():
+    payload = json.dumps(_DATA)
+    assert isinstance(SamPrompter().preprocess(payload), dict)
+    batch = SamPrompter(as_arrays=True).preprocess(payload)
+    assert isinstance(batch, PromptBatch)
+    assert batch.data == _DATA
+    assert SamPrompter(as_arrays=True).preprocess(None) is None
+    assert parse_prompt_value('{"image": "x"}', as_arrays=True) is None
+
+
+def test_delta_accepts_prompt_batch():
+    batch = PromptBatch.from_dict({**_DATA, "maskHashes": ["abc"]})
+    assert SamPrompter.delta(None, batch).known_hashes == frozenset({"abc"})
@@ -0,0 +1,152 @@
+"""Tests for ``request_mode`` ("pipelined" / "manual") and ``debounce_ms``."""
+
+import time
+
+import pytest
+from _demo_pipelined import demo, manual_demo, received
+from _helpers import upload_test_image, wait_for_container, wait_for_inference_complete
+from playwright.sync_api import Page, sync_playwright
+
+from sam_prompter import SamPrompter, parse_prompt_value
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+
+def test_invalid_request_mode_raises():
+    with pytest.raises(ValueError, match="request_mode"):
+        SamPrompter(request_mode="eager")
+    with pytest.raises(ValueError, match="debounce_ms"):
+        SamPrompter(debounce_ms=-1)
+
+
+def test_request_options_are_passed_to_frontend():
+    props = SamPrompter(request_mode="pipelined", debounce_ms=150).props
+    assert props["request_mode"] == "pipelined"
+    assert props["debounce_ms"] == 150
+    assert SamPrompter().props["request_mode"] == "lock"
+
+
+def test_seq_is_passed_through():
+    assert parse_prompt_value('{"prompts": [], "seq": 3}')["seq"] == 3
+
+
+# ---------------------------------------------------------------------------
+# UI tests
+# ---------------------------------------------------------------------------
+
+
+def _num_points(page: Page) -> int:
+    return page.evaluate("""() => {
+        var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+        return s.objects[0].points.length;
+    }""")
+
+
+def _wait_for_requests(count: int) -> None:
+    for _ in range(100):
+        if len(received) >= count:
+            return
+        time.sleep(0.1)
+
+
+def test_pipelined_clicks_are_coalesced():
+    received.clear()
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            # The first click is sent at once; the next three arrive while it
+            # is in flight and must be accepted, then sent as one request.
+            for i in range(4):
+                page.mouse.click(box["x"] + 20 + 20 * i, box["y"] + 40)
+                page.wait_for_timeout(100)
+            assert _num_points(page) == 4, "Clicks must not be blocked while a request is in flight"
+
+            _wait_for_requests(2)
+            wait_for_inference_complete(page)
+            page.wait_for_timeout(500)
+            assert len(received) == 2
+            assert [len(d["prompts"][0]["points"]) for d in received] == [1, 4]
+            assert received[1]["seq"] > received[0]["seq"]
+
+            browser.close()
+    finally:
+        demo.close()
+
+
+def test_manual_mode_sends_on_run():
+    received.clear()
+    _, url, _ = manual_demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 30, box["y"] + 40)
+            page.mouse.click(box["x"] + 60, box["y"] + 40)
+            page.wait_for_timeout(500)
+            assert not received, "Manual mode must not send before Run"
+
+            run_btn = page.locator(".sam-prompter-container .run-btn")
+            assert run_btn.is_visible()
+            run_btn.click()
+            _wait_for_requests(1)
+            assert len(received) == 1
+            assert len(received[0]["prompts"][0]["points"]) == 2
+
+            browser.close()
+    finally:
+        manual_demo.close()
+
+
+def test_manual_mode_drops_reply_after_clear_all():
+    received.clear()
+    _, url, _ = manual_demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 30, box["y"] + 40)
+            page.locator(".sam-prompter-container .run-btn").click()
+            _wait_for_requests(1)
+            # Clear everything while the run is still in flight.
+            page.locator(".sam-prompter-container .clear-all-btn").click()
+            assert _num_points(page) == 0
+
+            wait_for_inference_complete(page)
+            page.wait_for_timeout(500)
+            state = page.evaluate("""() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                return {
+                    objects: s.objects.length,
+                    masks: s.rawMasks.filter(function (m) { return m; }).length
+                };
+            }""")
+            assert state == {"objects": 1, "masks": 0}, "The reply to the cleared prompts must be dropped"
+
+            browser.close()
+    finally:
+        manual_demo.close()
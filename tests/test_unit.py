@@ -2,17 +2,27 @@
 
 import json
 import tempfile
+import threading
+from pathlib import Path
+from typing import NoReturn
 
 import gradio as gr
 import numpy as np
+import pytest
 from _helpers import make_test_image
-from PIL import Image
+from PIL import Image, ImageDraw
 
+import sam_prompter
 from sam_prompter import (
     _COLOR_PALETTE,
     SamPrompter,
+    _cache_display_image,
+    _copy_file_to_cache,
     _encode_mask_to_rle,
+    _encode_masks_to_rle,
+    _encode_pool,
     _hex_to_rgb,
+    _json_dumps,
     _load_image,
     parse_prompt_value,
 )
@@ -74,6 +84,174 @@ def test_load_image_from_numpy():
     assert img.size == (50, 40)
 
 
+# ===========================================================================
+# _cache_display_image
+# ===========================================================================
+
+
+def _fail_load_image(source: object) -> NoReturn:
+    msg = f"image was decoded again: {source!r}"
+    raise AssertionError(msg)
+
+
+def test_cache_display_image_reuses_url_for_same_content(monkeypatch: pytest.MonkeyPatch):
+    arr = np.full((30, 40, 3), [10, 20, 30], dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as d:
+        first = _cache_display_image(arr, d)
+        monkeypatch.setattr(sam_prompter, "_load_image", _fail_load_image)
+        second = _cache_display_image(arr.copy(), d)
+    assert second.url == first.url
+    assert (second.width, second.height) == (40, 30)
+
+
+def test_cache_display_image_distinct_content_distinct_url():
+    a = Image.new("RGB", (20, 10), color=(1, 2, 3))
+    b = Image.new("RGB", (20, 10), color=(3, 2, 1))
+    with tempfile.TemporaryDirectory() as d:
+        assert _cache_display_image(a, d).url != _cache_display_image(b, d).url
+
+
+def test_cache_display_image_url_is_content_addressed():
+    img = Image.new("RGB", (20, 10), color=(5, 6, 7))
+    with tempfile.TemporaryDirectory() as d1, tempfile.TemporaryDirectory() as d2:
+        url1 = _cache_display_image(img, d1).url
+        url2 = _cache_display_image(img, d2).url
+    assert url1.rsplit("/", 2)[-2] == url2.rsplit("/", 2)[-2]
+
+
+def test_cache_display_image_path_detects_modification():
+    with tempfile.TemporaryDirectory() as d:
+        p = make_test_image(d, w=30, h=20)
+        first = _cache_display_image(p, d)
+        Image.new("RGB", (30, 20), color=(0, 0, 0)).save(p)
+        second = _cache_display_image(p, d)
+    assert first.url != second.url
+
+
+def test_cache_display_image_same_object_is_not_rehashed(monkeypatch: pytest.MonkeyPatch):
+    img = Image.new("RGB", (20, 10), color=(9, 8, 7))
+    with tempfile.TemporaryDirectory() as d:
+        first = _cache_display_image(img, d)
+
+        def fail_tobytes(*_args: object) -> NoReturn:
+            msg = "pixels were hashed again"
+            raise AssertionError(msg)
+
+        monkeypatch.setattr(img, "tobytes", fail_tobytes)
+        assert _cache_display_image(img, d).url == first.url
+
+
+def test_cache_display_image_notices_in_place_edits():
+    img = Image.new("RGB", (40, 30), color=(9, 8, 7))
+    with tempfile.TemporaryDirectory() as d:
+        first = _cache_display_image(img, d)
+        ImageDraw.Draw(img).rectangle((10, 10, 12, 12), fill=(255, 0, 0))
+        second = _cache_display_image(img, d)
+        assert second.image_id != first.image_id
+        with Image.open(second.path) as shown:
+            assert shown.convert("RGB").getpixel((11, 11))[0] > 200
+
+        # Modes that PIL cannot box-reduce are checked in full.
+        pal = Image.new("P", (40, 30), color=1)
+        before = _cache_display_image(pal, d)
+        pal.putpixel((5, 5), 2)
+        assert _cache_display_image(pal, d).image_id != before.image_id
+
+
+def test_cache_display_image_recreates_deleted_file():
+    img = Image.new("RGB", (20, 10), color=(4, 5, 6))
+    with tempfile.TemporaryDirectory() as d:
+        first = _cache_display_image(img, d)
+        first.path.unlink()
+        second = _cache_display_image(img, d)
+        assert second.url == first.url
+        assert second.path.exists()
+
+
+@pytest.mark.parametrize(("image_format", "suffix", "pil_format"), [("jpeg", ".jpg", "JPEG"), ("png", ".png", "PNG")])
+def test_cache_display_image_format(image_format: str, suffix: str, pil_format: str):
+    img = Image.new("RGB", (20, 10), color=(5, 6, 7))
+    with tempfile.TemporaryDirectory() as d:
+        url = _cache_display_image(img, d, image_format).url
+        path = url.removeprefix("/gradio_api/file=")
+        assert path.endswith(suffix)
+        with Image.open(path) as saved:
+            assert saved.format == pil_format
+
+
+def test_cache_display_image_original_passthrough_in_cache_dir():
+    with tempfile.TemporaryDirectory() as d:
+        p = make_test_image(d, w=30, h=20)
+        cached = _cache_display_image(p, d, "original")
+    assert cached.url == f"/gradio_api/file={p.resolve()}"
+    assert (cached.width, cached.height) == (30, 20)
+
+
+def test_cache_display_image_original_outside_cache_dir_is_copied():
+    with tempfile.TemporaryDirectory() as src, tempfile.TemporaryDirectory() as d:
+        p = make_test_image(src, w=30, h=20)
+        path = _cache_display_image(p, d, "original").url.removeprefix("/gradio_api/file=")
+        assert path.startswith(str(Path(d).resolve()))
+        assert Path(path).read_bytes() == p.read_bytes()
+
+
+def test_copy_file_to_cache_concurrent_writers(tmp_path: Path):
+    source = make_test_image(tmp_path, w=30, h=20)
+    target = tmp_path / "cache" / "copy.png"
+    threads = [threading.Thread(target=_copy_file_to_cache, args=(source, target)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert target.read_bytes() == source.read_bytes()
+    assert [p.name for p in target.parent.iterdir()] == ["copy.png"]
+
+
+def test_cache_display_image_original_in_memory_falls_back_to_webp():
+    img = Image.new("RGB", (20, 10), color=(5, 6, 7))
+    with tempfile.TemporaryDirectory() as d:
+        assert _cache_display_image(img, d, "original").url.endswith(".webp")
+
+
+def test_load_image_keeps_rgb_image():
+    img = Image.new("RGB", (4, 4))
+    assert _load_image(img) is img
+
+
+@pytest.mark.parametrize("kwargs", [{"image_format": "gif"}, {"image_quality": 0}, {"image_quality": 101}])
+def test_invalid_image_options_raise(kwargs: dict):
+    with gr.Blocks(), pytest.raises(ValueError, match="image_"):
+        SamPrompter(**kwargs)
+
+
+# ===========================================================================
+# _json_dumps
+# ===========================================================================
+
+
+def test_json_dumps_backends_are_byte_identical(monkeypatch: pytest.MonkeyPatch):
+    payload = {
+        "image": "/gradio_api/file=/tmp/\u00e9/image.webp",
+        "masks": [{"rle": {"counts": np.arange(5, dtype=np.intp), "size": [2, 3]}, "color": [1, 2, 3], "alpha": 0.4}],
+        "flag": True,
+    }
+    fast = _json_dumps(payload)
+    monkeypatch.setattr(sam_prompter, "orjson", None)
+    assert _json_dumps(payload) == fast
+    assert json.loads(fast)["masks"][0]["rle"]["counts"] == [0, 1, 2, 3, 4]
+
+
+def test_json_dumps_non_contiguous_array():
+    arr = np.arange(10)[::2]
+    assert json.loads(_json_dumps({"a": arr})) == {"a": [0, 2, 4, 6, 8]}
+
+
+def test_parse_prompt_value_stdlib_fallback(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sam_prompter, "orjson", None)
+    assert parse_prompt_value('{"prompts": []}') == {"prompts": []}
+    assert parse_prompt_value("{bad") is None
+
+
 # ===========================================================================
 # _hex_to_rgb
 # ===========================================================================
@@ -143,6 +321,52 @@ def test_rle_round_trip_random():
     np.testing.assert_array_equal(decoded, mask)
 
 
+# ===========================================================================
+# _encode_masks_to_rle
+# ===========================================================================
+
+
+def test_batch_rle_matches_single_mask_encoding():
+    rng = np.random.default_rng(0)
+    masks = [(rng.random((32, 24)) > 0.5).astype(np.uint8) for _ in range(4)]
+    assert _encode_masks_to_rle(masks) == [_encode_mask_to_rle(m) for m in masks]
+
+
+def test_batch_rle_accepts_stacked_array():
+    rng = np.random.default_rng(1)
+    stack = (rng.random((3, 16, 20)) > 0.5).astype(np.uint8)
+    rles = _encode_masks_to_rle(stack)
+    assert len(rles) == 3
+    for mask, rle in zip(stack, rles, strict=True):
+        np.testing.assert_array_equal(_decode_rle(rle), mask)
+
+
+def test_batch_rle_thresholds_any_dtype():
+    base = np.zeros((6, 5), dtype=np.uint8)
+    base[1:4, 2:5] = 1
+    variants = [
+        base.astype(bool),
+        base * 255,
+        base.astype(np.float32) * 0.7 - 0.1,
+        Image.fromarray(base * 255),
+    ]
+    expected = _encode_mask_to_rle(base)
+    assert _encode_masks_to_rle(variants) == [expected] * len(variants)
+
+
+def test_batch_rle_mixed_shapes_keep_order():
+    a = np.ones((4, 4), dtype=np.uint8)
+    b = np.zeros((2, 3), dtype=np.uint8)
+    c = np.eye(4, dtype=np.uint8)
+    rles = _encode_masks_to_rle([a, b, c])
+    assert [r["size"] for r in rles] == [[4, 4], [2, 3], [4, 4]]
+    np.testing.assert_array_equal(_decode_rle(rles[2]), c)
+
+
+def test_batch_rle_empty():
+    assert _encode_masks_to_rle([]) == []
+
+
 # ===========================================================================
 # parse_prompt_value
 # ===========================================================================
@@ -221,6 +445,35 @@ def test_preprocess_valid():
 # ===========================================================================
 
 
+def test_postprocess_repeated_image_keeps_url():
+    img = Image.new("RGB", (60, 40), color=(9, 8, 7))
+    mask = np.ones((40, 60), dtype=np.uint8)
+    with gr.Blocks():
+        comp = SamPrompter()
+    first = json.loads(comp.postprocess(img))
+    second = json.loads(comp.postprocess((img, [{"mask": mask}])))
+    assert first["image"] == second["image"]
+
+
+def test_postprocess_parallel_matches_sequential():
+    img = Image.new("RGB", (60, 40), color=(4, 5, 6))
+    masks = [{"mask": np.eye(40, 60, dtype=np.uint8)}, {"mask": np.ones((40, 60), dtype=bool)}]
+    with gr.Blocks():
+        sequential = SamPrompter(encode_workers=0)
+        parallel = SamPrompter(encode_workers=2)
+    assert parallel.postprocess((img, masks)) == sequential.postprocess((img, masks))
+
+
+def test_encode_pool_is_shared():
+    assert _encode_pool(2) is _encode_pool(2)
+    assert _encode_pool(3) is not _encode_pool(2)
+
+
+def test_invalid_encode_workers_raises():
+    with gr.Blocks(), pytest.raises(ValueError, match="encode_workers"):
+        SamPrompter(encode_workers=-1)
+
+
 def test_postprocess_none():
     with gr.Blocks():
         comp = SamPrompter()
@@ -0,0 +1,152 @@
+"""Tests for hash-first upload deduplication (``dedupe_uploads=True``)."""
+
+import hashlib
+from pathlib import Path
+
+import gradio as gr
+import pytest
+from _demo_dedupe import demo, received
+from _helpers import make_test_image, upload_test_image, wait_for_container
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import SamPrompter
+from sam_prompter.cache import _upload_index
+
+
+@pytest.fixture
+def prompter() -> SamPrompter:
+    _upload_index.clear()
+    with gr.Blocks():
+        return SamPrompter(dedupe_uploads=True)
+
+
+def _cached_file(prompter: SamPrompter, name: str) -> tuple[Path, str]:
+    directory = Path(prompter.GRADIO_CACHE) / "dedupe-test"
+    directory.mkdir(parents=True, exist_ok=True)
+    path = make_test_image(directory, name)
+    return path, hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _lookup(prompter: SamPrompter, digest: str, content: bytes) -> str | None:
+    """Run the challenge / proof exchange the frontend performs."""
+    salt = prompter.upload_challenge(digest)
+    if salt is None:
+        return None
+    proof = hashlib.sha256(bytes.fromhex(salt) + content).hexdigest()
+    return prompter.lookup_upload({"hash": digest, "salt": salt, "proof": proof})
+
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+
+def test_register_then_lookup(prompter: SamPrompter):
+    path, digest = _cached_file(prompter, "a.png")
+    assert _lookup(prompter, digest, path.read_bytes()) is None
+    assert prompter.register_upload({"hash": digest, "path": str(path)})
+    assert _lookup(prompter, digest, path.read_bytes()) == str(path.resolve())
+
+
+def test_lookup_requires_proof_of_possession(prompter: SamPrompter):
+    path, digest = _cached_file(prompter, "e.png")
+    assert prompter.register_upload({"hash": digest, "path": str(path)})
+    # Knowing only the hash is not enough.
+    assert _lookup(prompter, digest, b"other bytes") is None
+    salt = prompter.upload_challenge(digest)
+    assert prompter.lookup_upload({"hash": digest, "salt": salt, "proof": digest}) is None
+    # Salts are single-use and bound to the hash they were issued for.
+    salt = prompter.upload_challenge(digest)
+    proof = hashlib.sha256(bytes.fromhex(salt) + path.read_bytes()).hexdigest()
+    assert prompter.lookup_upload({"hash": digest, "salt": salt, "proof": proof}) == str(path.resolve())
+    assert prompter.lookup_upload({"hash": digest, "salt": salt, "proof": proof}) is None
+    other = prompter.upload_challenge("f" * 64)
+    proof = hashlib.sha256(bytes.fromhex(other) + path.read_bytes()).hexdigest()
+    assert prompter.lookup_upload({"hash": digest, "salt": other, "proof": proof}) is None
+    assert prompter.lookup_upload({"hash": digest, "salt": "made-up", "proof": proof}) is None
+    assert prompter.lookup_upload(digest) is None
+
+
+def test_challenge_does_not_reveal_membership(prompter: SamPrompter):
+    path, digest = _cached_file(prompter, "f.png")
+    assert prompter.register_upload({"hash": digest, "path": str(path)})
+    assert prompter.upload_challenge(digest)
+    assert prompter.upload_challenge("0" * 64)
+    assert prompter.upload_challenge("not-a-hash") is None
+
+
+def test_register_rejects_wrong_hash(prompter: SamPrompter):
+    path, _ = _cached_file(prompter, "b.png")
+    forged = "0" * 64
+    assert not prompter.register_upload({"hash": forged, "path": str(path)})
+    assert _lookup(prompter, forged, path.read_bytes()) is None
+
+
+def test_register_rejects_files_outside_cache(prompter: SamPrompter, tmp_path: Path):
+    path = make_test_image(tmp_path)
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    assert not prompter.register_upload({"hash": digest, "path": str(path)})
+    assert not prompter.register_upload({"hash": digest, "path": str(Path(prompter.GRADIO_CACHE) / ".." / path)})
+    assert not prompter.register_upload({"hash": "not-a-hash", "path": str(path)})
+    assert not prompter.register_upload("garbage")
+
+
+def test_deleted_file_is_forgotten(prompter: SamPrompter):
+    path, digest = _cached_file(prompter, "c.png")
+    assert prompter.register_upload({"hash": digest, "path": str(path)})
+    content = path.read_bytes()
+    path.unlink()
+    assert _lookup(prompter, digest, content) is None
+
+
+def test_disabled_by_default():
+    _upload_index.clear()
+    with gr.Blocks():
+        prompter = SamPrompter()
+    path, digest = _cached_file(prompter, "d.png")
+    assert not prompter.register_upload({"hash": digest, "path": str(path)})
+    assert prompter.upload_challenge(digest) is None
+    assert prompter.lookup_upload({"hash": digest, "salt": "00", "proof": digest}) is None
+
+
+# ---------------------------------------------------------------------------
+# UI test
+# ---------------------------------------------------------------------------
+
+
+def test_second_upload_of_same_file_is_skipped():
+    _upload_index.clear()
+    received.clear()
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            uploads = []
+            page.on("request", lambda r: uploads.append(r.url) if "/upload" in r.url else None)
+            page.goto(url)
+            wait_for_container(page)
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            for _ in range(2):
+                count = len(received)
+                upload_test_image(page)
+                box = canvas.bounding_box()
+                page.mouse.click(box["x"] + 50, box["y"] + 40)
+                for _ in range(100):
+                    if len(received) > count:
+                        break
+                    page.wait_for_timeout(100)
+                assert len(received) == count + 1
+                # Give the register_upload call time to finish.
+                page.wait_for_timeout(500)
+
+            assert len(uploads) == 1, "The same file should be uploaded only once"
+            first, second = (Path(d["imagePath"]).resolve() for d in received)
+            assert first == second
+            assert received[0]["imageHash"] == received[1]["imageHash"]
+
+            browser.close()
+    finally:
+        demo.close()
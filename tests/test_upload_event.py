@@ -0,0 +1,53 @@
+"""Tests for the eager ``upload`` event fired when an image upload finishes."""
+
+import hashlib
+from pathlib import Path
+
+from _demo_upload_event import demo, events
+from _helpers import upload_test_image, wait_for_container
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import SamPrompter
+
+
+def test_upload_event_listener_exists():
+    assert hasattr(SamPrompter, "upload")
+
+
+def test_upload_event_fires_before_first_click():
+    events.clear()
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)
+
+            for _ in range(100):
+                if events:
+                    break
+                page.wait_for_timeout(100)
+
+            assert [name for name, _ in events] == ["upload"], "Only the upload event should fire before a click"
+            data = events[0][1]
+            assert data["prompts"] == []
+            assert data["imageSize"] == {"width": 200, "height": 150}
+            assert data["imageHash"] == hashlib.sha256(Path(data["imagePath"]).read_bytes()).hexdigest()
+
+            # A click sends the usual input event; the upload event is not repeated.
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + 50, box["y"] + 40)
+            for _ in range(100):
+                if len(events) > 1:
+                    break
+                page.wait_for_timeout(100)
+            page.wait_for_timeout(300)
+            assert [name for name, _ in events] == ["upload", "input"]
+
+            browser.close()
+    finally:
+        demo.close()
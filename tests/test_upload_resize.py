@@ -0,0 +1,70 @@
+"""Tests for client-side downscaling before upload (``max_upload_side``)."""
+
+import pytest
+from _demo_upload_resize import demo, received
+from _helpers import upload_test_image, wait_for_container
+from PIL import Image
+from playwright.sync_api import sync_playwright
+
+from sam_prompter import PromptBatch, SamPrompter
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+
+def test_invalid_max_upload_side_raises():
+    with pytest.raises(ValueError, match="max_upload_side"):
+        SamPrompter(max_upload_side=0)
+
+
+def test_prompt_batch_upload_scale():
+    assert PromptBatch.from_dict({"prompts": [], "uploadScale": 0.25}).upload_scale == 0.25
+    assert PromptBatch.from_dict({"prompts": []}).upload_scale == 1.0
+
+
+# ---------------------------------------------------------------------------
+# UI test
+# ---------------------------------------------------------------------------
+
+
+def test_large_upload_is_downscaled_in_browser():
+    received.clear()
+    _, url, _ = demo.launch(prevent_thread_lock=True)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            page = browser.new_page()
+            page.set_default_timeout(10000)
+            page.goto(url)
+            wait_for_container(page)
+            upload_test_image(page)  # 200x150
+
+            natural = page.evaluate("""() => {
+                var s = document.querySelector('.sam-prompter-container').__samPrompterState;
+                return [s.naturalWidth, s.naturalHeight];
+            }""")
+            assert natural == [100, 75]
+
+            canvas = page.locator(".sam-prompter-container canvas")
+            box = canvas.bounding_box()
+            page.mouse.click(box["x"] + box["width"] / 2, box["y"] + box["height"] / 2)
+            for _ in range(100):
+                if received:
+                    break
+                page.wait_for_timeout(100)
+
+            assert received, "Handler should have received the prompt data"
+            data = received[-1]
+            assert data["imageSize"] == {"width": 100, "height": 75}
+            assert data["originalSize"] == {"width": 200, "height": 150}
+            assert data["uploadScale"] == pytest.approx(0.5)
+            with Image.open(data["imagePath"]) as img:
+                assert img.size == (100, 75)
+            x, y = data["prompts"][0]["points"][0]
+            assert 0 <= x <= 100
+            assert 0 <= y <= 75
+
+            browser.close()
+    finally:
+        demo.close()